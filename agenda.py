@@ -0,0 +1,55 @@
+import bisect
+import logging
+from datetime import datetime
+
+# 시작 시각 문자열을 오늘 날짜의 datetime으로 변환
+def parse_start_time(start_time_str, now):
+    st = datetime.strptime(start_time_str, "%H:%M:%S").time()
+    return datetime.combine(now.date(), st)
+
+class Agenda:
+    # 오늘 루틴의 시작 시각을 한 번만 파싱해 정렬된 배열로 들고 있고,
+    # "다음 루틴까지 몇 분" 질의를 이분 탐색으로 답한다.
+    # 날짜가 바뀌면 질의할 때 스스로 다시 읽고, 동기화 후에는 load() 로 갱신한다
+    def __init__(self, load_routines=None):
+        self.load_routines = load_routines
+        self.starts = []
+        self.routines = []
+        self.date = None
+
+    def load(self, routines, now=None):
+        now = now or datetime.now()
+        entries = sorted(
+            ((parse_start_time(routine[1], now), routine) for routine in routines),
+            key=lambda entry: entry[0],
+        )
+        self.starts = [start for start, _ in entries]
+        self.routines = [routine for _, routine in entries]
+        self.date = now.date()
+
+    def rebuild(self, now=None):
+        if self.load_routines is None:
+            return
+        self.load(self.load_routines(), now)
+        logging.info(f"[AGENDA] {self.date} 루틴 {len(self.starts)}건")
+
+    def ensure_today(self, now):
+        if self.date != now.date():
+            self.rebuild(now)
+
+    def next_index(self, now):
+        # now 보다 뒤에 시작하는 첫 루틴의 위치
+        return bisect.bisect_right(self.starts, now)
+
+    def next_start(self, now=None):
+        now = now or datetime.now()
+        self.ensure_today(now)
+        i = self.next_index(now)
+        return self.starts[i] if i < len(self.starts) else None
+
+    def minutes_until_next(self, now=None):
+        now = now or datetime.now()
+        start = self.next_start(now)
+        if start is None:
+            return float('inf')
+        return (start - now).total_seconds() / 60
@@ -0,0 +1,175 @@
+import os
+import sys
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+from datetime import date, datetime, timedelta
+import metrics
+from routine_db import DB_PATH, ARCHIVE_COLUMNS, ROUTINE_SKIPPED, get_repository
+
+# 월별 보관 DB 위치 (routines-YYYY-MM.db, 다 옮긴 달은 routines-YYYY-MM.db.gz)
+ARCHIVE_DIR = os.environ.get("ROUTINE_ARCHIVE_DIR", "/home/pi/LCD_final/archive")
+# 결과가 확정되고 이 기간(일)이 지난 루틴만 옮긴다. 요약/연속 기록은 운영 DB 에 남는다
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ROUTINE_ARCHIVE_AFTER_DAYS", 90))
+# 한 트랜잭션에서 옮기는 행 수 (BLE 수신 쪽 쓰기를 오래 막지 않도록)
+ARCHIVE_BATCH_SIZE = 500
+# 증분 VACUUM 한 번에 돌려주는 페이지 수
+VACUUM_STEP_PAGES = 256
+# 유휴 시간 한 번에 보관/압축에 쓰는 최대 시간(초)
+MAINTENANCE_BUDGET = 20
+# 다 옮긴 달의 보관 DB gzip 압축 수준 (Pi 에서 압축률과 시간의 절충)
+ARCHIVE_COMPRESS_LEVEL = 6
+
+def archive_path(month, directory=ARCHIVE_DIR):
+    return os.path.join(directory, f"routines-{month}.db")
+
+def open_archive(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, isolation_level=None)
+    # 보관 DB 는 쓰고 나면 거의 읽지 않는다: 인덱스 없이 id 만 키로
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS routines (
+            id INTEGER PRIMARY KEY,
+            date TEXT,
+            start_time TEXT,
+            routine_minutes INTEGER,
+            icon TEXT,
+            routine_name TEXT,
+            group_routine_name TEXT,
+            completed INTEGER,
+            late_seconds REAL,
+            template_id INTEGER
+        )
+    """)
+    return conn
+
+def month_range(month):
+    start = datetime.strptime(month, "%Y-%m").date()
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start.isoformat(), end.isoformat()
+
+def pack_archive(path):
+    # 다 옮긴 달: 보관 DB 를 .gz 로 압축하고, 압축 파일이 온전히 생긴 뒤에만 원본을 지운다
+    packed = path + ".gz"
+    with open(path, "rb") as src, gzip.open(packed + ".tmp", "wb", ARCHIVE_COMPRESS_LEVEL) as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(packed + ".tmp", packed)
+    os.remove(path)
+    return packed
+
+def unpack_archive(path):
+    # 이미 압축한 달에 옮길 행이 다시 생기면(늦게 확정된 루틴) 풀어서 이어 쓴다
+    packed = path + ".gz"
+    if os.path.exists(path) or not os.path.exists(packed):
+        return
+    with gzip.open(packed, "rb") as src, open(path + ".tmp", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(path + ".tmp", path)
+    os.remove(packed)
+
+class ArchiveJob:
+    # 오래된 루틴을 월별 보관 DB 로 옮기고 운영 DB 의 빈 공간을 조금씩 돌려준다.
+    # 스케줄러 루프가 다음 루틴까지 비어 있을 때 run() 을 부르고, 시간이 다 되거나
+    # 변경 알림이 오면 멈췄다가 다음 유휴 시간에 이어 간다 (하루 한 번 끝까지)
+    def __init__(self, repo=None, directory=ARCHIVE_DIR, keep_days=ARCHIVE_AFTER_DAYS):
+        self.repo = repo or get_repository(DB_PATH)
+        self.directory = directory
+        self.keep_days = keep_days
+
+    def due(self, today=None):
+        today = (today or date.today()).isoformat()
+        return self.repo.get_archive_state()[1] != today
+
+    def close_past_days(self, today, should_stop, send_reports=None):
+        # 결과 없이 날짜가 지난 루틴을 건너뜀으로 확정한다. 상태 갱신 경로를 그대로 타므로 그룹 카운터/
+        # 통계/그룹 보고가 함께 처리되고, 그 뒤 보관 대상이 된다 (루틴 루프가 쉬는 동안에만 불린다)
+        closed = 0
+        while not should_stop():
+            ids = self.repo.past_pending(today.isoformat(), ARCHIVE_BATCH_SIZE)
+            if not ids:
+                return closed, True
+            reports = self.repo.update_routine_statuses([(routine_id, ROUTINE_SKIPPED) for routine_id in ids])
+            closed += len(ids)
+            if reports and send_reports is not None:
+                send_reports(reports)
+        return closed, False
+
+    def archive_month(self, month, before, should_stop):
+        # 보관 DB 에 먼저 커밋하고 운영 DB 에서 지운다. 그 사이에 죽어도 다음 실행이
+        # INSERT OR IGNORE 로 이어서 지우므로 행을 잃지 않는다
+        start, end = month_range(month)
+        end = min(end, before)
+        moved = 0
+        path = archive_path(month, self.directory)
+        unpack_archive(path)
+        archive = open_archive(path)
+        try:
+            while not should_stop():
+                rows = self.repo.archive_candidates(start, end, ARCHIVE_BATCH_SIZE)
+                if not rows:
+                    return moved, True
+                archive.execute("BEGIN")
+                archive.executemany(
+                    f"INSERT OR IGNORE INTO routines ({', '.join(ARCHIVE_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(ARCHIVE_COLUMNS))})", rows
+                )
+                archive.execute("COMMIT")
+                moved += self.repo.remove_archived([row[0] for row in rows])
+            return moved, False
+        finally:
+            archive.close()
+
+    def pack_closed_months(self, before):
+        # before 이전으로 다 지나간 달의 보관 DB 를 압축한다 (마지막 며칠에 옮길 루틴이 없던 달도)
+        if not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith("routines-") and name.endswith(".db"):
+                month = name[len("routines-"):-len(".db")]
+                if month_range(month)[1] <= before:
+                    pack_archive(os.path.join(self.directory, name))
+                    logging.info(f"[ARCHIVE] {month} 보관 DB 압축")
+
+    def run(self, budget=MAINTENANCE_BUDGET, should_stop=None, today=None, send_reports=None):
+        # 끝까지 마쳤으면 True. send_reports: 지난 날짜를 확정하며 생긴 그룹 보고를 보낼 곳
+        # (없으면 송신함에 남아 송신 스레드가 다음에 시작할 때 보낸다)
+        today = today or date.today()
+        deadline = time.monotonic() + budget
+
+        def stop():
+            return time.monotonic() >= deadline or (should_stop is not None and should_stop())
+
+        before = (today - timedelta(days=self.keep_days)).isoformat()
+        moved = 0
+        with metrics.timed("archive.run"):
+            closed, done = self.close_past_days(today, stop, send_reports)
+            if closed:
+                logging.info(f"[ARCHIVE] 결과 없이 지난 루틴 {closed}건 건너뜀으로 확정")
+            for month in self.repo.archive_months(before) if done else ():
+                count, done = self.archive_month(month, before, stop)
+                moved += count
+                if count:
+                    logging.info(f"[ARCHIVE] {month}: {count}건 보관")
+                if not done:
+                    break
+            if done:
+                self.pack_closed_months(before)
+                done = self.repo.compact(VACUUM_STEP_PAGES, stop)
+        metrics.incr("archive.rows", moved)
+        if not done:
+            logging.info(f"[ARCHIVE] 유휴 시간 종료 - 다음에 이어서 ({moved}건 보관)")
+            return False
+        self.repo.finish_archive(before, today.isoformat())
+        logging.info(f"[ARCHIVE] 완료: {before} 이전 {moved}건 보관, DB 정리")
+        return True
+
+if __name__ == "__main__":
+    # 서비스를 멈춘 상태에서 한 번에 끝까지 보관한다.
+    # --vacuum: 예전 DB 를 증분 VACUUM 방식으로 바꾸는 전체 VACUUM 도 함께 (보관 뒤라 DB 가 작을 때)
+    logging.basicConfig(level=logging.INFO)
+    job = ArchiveJob()
+    job.run(budget=float("inf"))
+    if "--vacuum" in sys.argv[1:]:
+        job.repo.vacuum()
@@ -0,0 +1,346 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+# 가짜 하드웨어(ROUTINE_HW=sim) 위에서 핫패스 성능을 재고 결과를 JSON 으로 남긴다.
+#   python benchmark.py                  # 전체 실행, bench_results/ 에 저장
+#   python benchmark.py --only db,icon   # 일부만 실행
+#   python benchmark.py --compare        # 직전 결과와 비교 출력
+import os
+import sys
+import json
+import glob
+import time
+import random
+import argparse
+import logging
+import platform
+import tempfile
+import statistics
+import subprocess
+import threading
+from datetime import datetime, timedelta
+
+WORK_DIR = tempfile.mkdtemp(prefix="routine_bench_")
+os.environ.setdefault("ROUTINE_HW", "sim")
+os.environ.setdefault("ROUTINE_DB_PATH", os.path.join(WORK_DIR, "routine_db.db"))
+os.environ.setdefault("ROUTINE_ICON_CACHE", os.path.join(WORK_DIR, "icon_cache"))
+os.environ.setdefault("ROUTINE_METRICS_DIR", os.path.join(WORK_DIR, "metrics"))
+os.environ.setdefault("ROUTINE_SIM_RFCOMM_PORT", str(random.randint(20000, 40000)))
+
+import hardware
+from routine_db import RoutineRepository, get_repository
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results")
+BENCH_DATE = datetime.now().strftime("%Y-%m-%d")
+
+def summarize(samples, scale=1000.0):
+    # 초 단위 측정값 → ms 단위 통계
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "mean_ms": statistics.fmean(samples) * scale,
+        "p50_ms": samples[len(samples) // 2] * scale,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * scale,
+        "max_ms": samples[-1] * scale,
+    }
+
+def make_routine(i, date):
+    return {
+        "type": "routine", "id": i, "date": date,
+        "start_time": f"{(i // 60) % 24:02d}:{i % 60:02d}:00",
+        "routine_minutes": 10, "icon": "dog.JPG",
+        "routine_name": f"routine {i}", "group_routine_name": f"group {i % 5}",
+    }
+
+# ------------------ DB ------------------ #
+def bench_db(sizes, repeat=200):
+    results = {}
+    today = datetime.now()
+    for size in sizes:
+        repo = RoutineRepository(os.path.join(WORK_DIR, f"db_{size}.db"))
+        # 오늘 루틴은 최대 20개, 나머지는 과거 날짜로 채운다
+        rows = [make_routine(i, BENCH_DATE) for i in range(min(size, 20))]
+        rows += [
+            make_routine(i, (today - timedelta(days=1 + i // 20)).strftime("%Y-%m-%d"))
+            for i in range(len(rows), size)
+        ]
+        for i in range(0, len(rows), 10000):
+            repo.insert_batch(routines=rows[i:i + 10000])
+        samples = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            repo.get_today_routines(BENCH_DATE)
+            samples.append(time.perf_counter() - t)
+        results[str(size)] = summarize(samples)
+        repo.close()
+    return results
+
+# ------------------ BLE 수신 → 커밋 ------------------ #
+def bench_ble_ingest(messages=2000, timeout=60):
+    import ble_receiver
+    from ble_protocol import encode_frame
+
+    repo = get_repository()
+    start_count = repo.query("SELECT COUNT(*) FROM routines")[0][0]
+    server = threading.Thread(target=ble_receiver.receive_bluetooth_data, daemon=True)
+    server.start()
+
+    client = hardware.rfcomm_socket()
+    for _ in range(100):
+        try:
+            client.connect(("00:00:00:00:00:00", 1))
+            break
+        except OSError:
+            time.sleep(0.05)
+    payload = b"".join(
+        encode_frame(make_routine(1_000_000 + i, BENCH_DATE)) for i in range(messages)
+    )
+    t = time.perf_counter()
+    client.sendall(payload)
+    deadline = t + timeout
+    while time.perf_counter() < deadline:
+        if repo.query("SELECT COUNT(*) FROM routines")[0][0] - start_count >= messages:
+            break
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - t
+    client.close()
+    stored = repo.query("SELECT COUNT(*) FROM routines")[0][0] - start_count
+    return {
+        "messages": messages,
+        "stored": stored,
+        "bytes": len(payload),
+        "seconds": elapsed,
+        "messages_per_s": stored / elapsed if elapsed else 0,
+    }
+
+# ------------------ 아이콘 ------------------ #
+def bench_icon(icon_dir, repeat=50):
+    from PIL import Image
+    from icon_cache import IconCache
+    from lcd_frame import image_to_rgb565
+
+    icons = sorted(os.path.basename(p) for p in glob.glob(os.path.join(icon_dir, "*.JPG")))
+    if not icons:
+        return {"skipped": f"no icons in {icon_dir}"}
+
+    def uncached():
+        samples = []
+        for i in range(repeat):
+            path = os.path.join(icon_dir, icons[i % len(icons)])
+            t = time.perf_counter()
+            image_to_rgb565(Image.open(path).resize((240, 240)).rotate(90))
+            samples.append(time.perf_counter() - t)
+        return summarize(samples)
+
+    def cached(cache):
+        samples = []
+        for i in range(repeat):
+            t = time.perf_counter()
+            cache.get(icons[i % len(icons)], 90)
+            samples.append(time.perf_counter() - t)
+        return summarize(samples)
+
+    cache_dir = os.path.join(WORK_DIR, "icon_bench_cache")
+    memory = IconCache(icon_dir, cache_dir, capacity=len(icons))
+    memory.preload(icons)
+    disk = IconCache(icon_dir, cache_dir, capacity=1)  # LRU 1장 → 대부분 디스크에서 읽음
+    return {
+        "icons": len(icons),
+        "decode_resize_rotate": uncached(),
+        "cache_memory_hit": cached(memory),
+        "cache_disk_hit": cached(disk),
+    }
+
+# ------------------ 화면 전송 fps ------------------ #
+def legacy_show_image(disp, image):
+    # 변경 전 경로: Waveshare ShowImage 와 같은 변환 + 파이썬 리스트로 4KB씩 전송
+    import numpy as np
+    img = np.asarray(image)
+    pix = np.zeros((240, 240, 2), dtype=np.uint8)
+    pix[..., [0]] = np.add(np.bitwise_and(img[..., [0]], 0xF8), np.right_shift(img[..., [1]], 5))
+    pix[..., [1]] = np.add(np.bitwise_and(np.left_shift(img[..., [1]], 3), 0xE0), np.right_shift(img[..., [2]], 3))
+    pix = pix.flatten().tolist()
+    disp.SetWindows(0, 0, 240, 240)
+    disp.digital_write(disp.DC_PIN, True)
+    for i in range(0, len(pix), 4096):
+        disp.spi_writebyte(pix[i:i + 4096])
+
+def bench_fps(icon_dir, frames=60):
+    from PIL import Image
+    from icon_cache import IconCache
+    from lcd_frame import FrameConverter, show_image, show_frame
+    from lcd_render import LcdRenderer, format_remaining
+
+    paths = sorted(glob.glob(os.path.join(icon_dir, "*.JPG")))
+    if not paths:
+        return {"skipped": f"no icons in {icon_dir}"}
+    images = [Image.open(p).convert("RGB").resize((240, 240)) for p in paths[:8]]
+    disp = hardware.SimLCD()
+    converter = FrameConverter()
+    cache = IconCache(icon_dir, os.path.join(WORK_DIR, "fps_icons"))
+    cached = [cache.get(os.path.basename(p), 90) for p in paths[:8]]
+    renderer = LcdRenderer(disp, max_fps=1_000_000)
+
+    def fps(draw):
+        t = time.perf_counter()
+        for i in range(frames):
+            draw(i)
+        return frames / (time.perf_counter() - t)
+
+    results = {
+        "legacy_show_image": fps(lambda i: legacy_show_image(disp, images[i % len(images)])),
+        "vectorized_show_image": fps(lambda i: show_image(disp, images[i % len(images)], converter)),
+        "cached_frame": fps(lambda i: show_frame(disp, cached[i % len(cached)])),
+    }
+    renderer.show(cached[0], 90, 1.0, format_remaining(frames))
+    results["countdown_tick"] = fps(lambda i: renderer.update(1 - i / frames, format_remaining(frames - i)))
+    return results
+
+# ------------------ 모터 ------------------ #
+def bench_motor(steps=2000):
+    import motor_control
+
+    gpio = hardware.gpio()
+    engine = motor_control.MotorEngine(motor_control.GpioStepper())
+    start = len(gpio.outputs)
+    t = time.perf_counter()
+    engine.move_to(steps, motor_control.step_sleep_fast)
+    engine.wait_idle()
+    elapsed = time.perf_counter() - t
+    times = [ts for ts, _ in gpio.outputs[start:]]
+    intervals = [b - a for a, b in zip(times, times[1:])]
+    expected = motor_control.step_sleep_fast
+    jitter = [abs(i - expected) for i in intervals]
+    return {
+        "steps": steps,
+        "seconds": elapsed,
+        "expected_seconds": steps * expected,
+        "interval": summarize(intervals),
+        "jitter": summarize(jitter),
+    }
+
+# ------------------ 루틴 시작 지연 ------------------ #
+def bench_wakeup(icon_dir, routines=3, spacing=2):
+    if not glob.glob(os.path.join(icon_dir, "*.JPG")):
+        return {"skipped": f"no icons in {icon_dir}"}
+    import routine_runner
+    from icon_cache import IconCache
+
+    # 다른 벤치마크가 넣은 오늘 루틴이 섞이지 않도록 별도 DB 를 쓴다
+    repo = RoutineRepository(os.path.join(WORK_DIR, "wakeup.db"))
+    routine_runner.repo = repo
+    routine_runner.icons = IconCache(icon_dir, os.path.join(WORK_DIR, "wakeup_icons"))
+
+    lcd = hardware.create_lcd()
+    shown = []
+    touch = lcd.touch
+
+    def record():
+        touch()
+        shown.append(time.time())
+    lcd.touch = record
+
+    icon = os.path.basename(glob.glob(os.path.join(icon_dir, "*.JPG"))[0])
+    base = int(time.time()) + 2
+    due = []
+    for i in range(routines):
+        start = base + i * spacing
+        due.append(start)
+        repo.insert_batch(routines=[{
+            **make_routine(2_000_000 + i, BENCH_DATE),
+            "start_time": datetime.fromtimestamp(start).strftime("%H:%M:%S"),
+            "icon": icon, "routine_minutes": 1,
+        }])
+    routine_runner.buzz = lambda duration=1: None
+    threading.Thread(target=routine_runner.run_routine_loop, daemon=True).start()
+
+    button1 = hardware.button(routine_runner.BUTTON1_PIN)
+    latencies = []
+    for start in due:
+        # 예정 시각 이후 첫 화면 갱신까지의 시간
+        while time.time() < start + spacing - 0.2:
+            hits = [s for s in shown if s >= start]
+            if hits:
+                latencies.append(hits[0] - start)
+                break
+            time.sleep(0.001)
+        button1.tap()
+    return {"routines": routines, "latency": summarize(latencies) if latencies else None}
+
+BENCHES = ("db", "ble", "icon", "fps", "motor", "wakeup")
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\n비교 대상: {previous_path} ({previous['meta'].get('git')})")
+
+    def walk(cur, prev, prefix=""):
+        for key, value in cur.items():
+            if isinstance(value, dict) and isinstance(prev.get(key), dict):
+                walk(value, prev[key], f"{prefix}{key}.")
+            elif isinstance(value, (int, float)) and isinstance(prev.get(key), (int, float)) and prev[key]:
+                change = (value - prev[key]) / prev[key] * 100
+                if abs(change) >= 10:
+                    print(f"  {prefix}{key}: {prev[key]:.4g} -> {value:.4g} ({change:+.0f}%)")
+    walk(current["results"], previous["results"])
+
+def main():
+    parser = argparse.ArgumentParser(description="routine app benchmarks (simulated hardware)")
+    parser.add_argument("--only", default=",".join(BENCHES))
+    parser.add_argument("--sizes", default="10,1000,100000")
+    parser.add_argument("--icons", default=os.environ.get("ROUTINE_ICON_PATH", "/home/pi/APP_icon/"))
+    parser.add_argument("--output", default=RESULTS_DIR)
+    parser.add_argument("--compare", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    selected = [name for name in args.only.split(",") if name]
+    previous = sorted(glob.glob(os.path.join(args.output, "bench-*.json")))
+    results = {}
+    for name in selected:
+        print(f"[bench] {name} ...", flush=True)
+        if name == "db":
+            results[name] = bench_db([int(s) for s in args.sizes.split(",")])
+        elif name == "ble":
+            results[name] = bench_ble_ingest()
+        elif name == "icon":
+            results[name] = bench_icon(args.icons)
+        elif name == "fps":
+            results[name] = bench_fps(args.icons)
+        elif name == "motor":
+            results[name] = bench_motor()
+        elif name == "wakeup":
+            results[name] = bench_wakeup(args.icons)
+        else:
+            print(f"unknown benchmark: {name}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "backend": hardware.HARDWARE_BACKEND,
+        },
+        "results": results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"결과 저장: {path}")
+    if args.compare and previous:
+        compare(report, previous[-1])
+
+if __name__ == "__main__":
+    main()
+    os._exit(0)
@@ -0,0 +1,97 @@
+import re
+import json
+import logging
+
+# 한 프레임이 이 크기를 넘도록 끝나지 않으면 버퍼를 비운다
+MAX_FRAME_BYTES = 1024 * 1024
+
+# 줄바꿈 없이 붙어 오는 JSON 의 끝을 찾을 때 건너뛰며 보는 글자 (문자열 밖 / 안)
+VALUE_TOKENS = re.compile(rb'["{}\[\]]')
+STRING_TOKENS = re.compile(rb'["\\]')
+NON_SPACE = re.compile(r"\S")
+
+# 송신: JSON 한 줄 = 프레임 하나 (줄바꿈 구분).
+# 그룹 보고/sync_ack 의 루틴 "completed" 는 0/1(완료 여부) 그대로이고, 결과 구분은
+# "status" 필드("pending" / "completed" / "skipped" / "failed" / "timeout")에 더해 보낸다
+def encode_frame(data):
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+
+class FrameDecoder:
+    # recv() 단위와 상관없이 스트림에 이어 붙여 완성된 JSON 메시지만 꺼낸다.
+    # 줄바꿈으로 구분된 프레임이 기본이고, 줄바꿈 없이 붙어 오는 JSON 은 괄호 깊이를
+    # 저장된 위치부터 이어서 세어 닫힌 부분만 디코드한다 (각 바이트는 한 번만 훑는다)
+    def __init__(self, max_frame_bytes=MAX_FRAME_BYTES):
+        self.max_frame_bytes = max_frame_bytes
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = bytearray()
+        self.reset_scan()
+
+    def reset_scan(self):
+        # 버퍼 앞에서부터 어디까지 훑었는지와 그 위치의 괄호 깊이/문자열 상태
+        self.scan = 0
+        self.depth = 0
+        self.in_string = False
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        # 이미 훑은 부분에는 줄바꿈이 없으므로 그 뒤에서만 찾는다
+        newline = self.buffer.find(b"\n", self.scan)
+        while newline >= 0:
+            self.decode_frame(self.buffer[:newline], messages)
+            del self.buffer[:newline + 1]
+            self.reset_scan()
+            newline = self.buffer.find(b"\n")
+        self.scan_values(messages)
+        self.check_overflow()
+        return messages
+
+    def decode_frame(self, frame, messages):
+        # 한 프레임에 JSON 이 여러 개 붙어 있을 수 있다. 잘못된 곳부터 프레임 끝까지는 버린다
+        text = frame.decode("utf-8", errors="replace")
+        pos = 0
+        while True:
+            match = NON_SPACE.search(text, pos)
+            if match is None:
+                return
+            try:
+                message, pos = self.json_decoder.raw_decode(text, match.start())
+            except json.JSONDecodeError as e:
+                logging.error(f"[BLE] 잘못된 프레임 버림: {e}")
+                return
+            messages.append(message)
+
+    def scan_values(self, messages):
+        # 줄바꿈이 아직 없는 꼬리: 최상위 {…} / […] 가 닫히는 순간 그 부분만 꺼낸다
+        buffer = self.buffer
+        while True:
+            pattern = STRING_TOKENS if self.in_string else VALUE_TOKENS
+            match = pattern.search(buffer, self.scan)
+            if match is None:
+                # 이스케이프 바로 뒤 글자가 아직 안 왔으면 scan 이 버퍼 끝을 넘어 있다
+                self.scan = max(self.scan, len(buffer))
+                return
+            token = match.group()
+            self.scan = match.end()
+            if self.in_string:
+                if token == b"\\":
+                    self.scan += 1
+                else:
+                    self.in_string = False
+            elif token == b'"':
+                self.in_string = True
+            elif token in b"{[":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth <= 0:
+                    end = self.scan
+                    self.decode_frame(buffer[:end], messages)
+                    del buffer[:end]
+                    self.reset_scan()
+
+    def check_overflow(self):
+        if len(self.buffer) > self.max_frame_bytes:
+            logging.error(f"[BLE] 프레임이 너무 큼 ({len(self.buffer)} bytes) - 버퍼 초기화")
+            self.buffer = bytearray()
+            self.reset_scan()
@@ -1,77 +1,302 @@
-import json
+import asyncio
 import sqlite3
-import bluetooth
-import time
+import itertools
+import hardware
 import logging
+import metrics
+from routine_db import DB_PATH, get_repository
+from ble_protocol import FrameDecoder, encode_frame
 
-DB_PATH = "/home/pi/LCD_final/routine_db.db"
+RECV_SIZE = 4096
+RFCOMM_PORT = 1
+# 쓰기 단계가 한 트랜잭션에 모아 저장하는 최대 메시지 수
+WRITE_BATCH_SIZE = 256
+# 동시에 받는 휴대폰 수 (넘으면 하나가 끊길 때까지 accept 하지 않는다)
+BLE_MAX_CLIENTS = 8
+# 클라이언트별 쓰기 대기열 크기: 가득 차면 그 클라이언트만 읽기를 멈춘다
+CLIENT_QUEUE_SIZE = 512
+
+repo = get_repository(DB_PATH)
 logging.basicConfig(level=logging.INFO)
 
-def save_to_db(data):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+# 한 항목 저장 실패로 볼 오류 (타입이 잘못된 값은 바인딩에서 ProgrammingError/TypeError)
+SAVE_ERRORS = (sqlite3.Error, KeyError, TypeError, ValueError)
+
+# 메시지(단일 객체 또는 리스트)를 루틴/타이머/반복 템플릿 목록으로 펼친다.
+# items: [(message, reply)] → 종류별 [(entry, reply)]
+def split_entries(items):
+    routines, timers, templates = [], [], []
+    for message, reply in items:
+        entries = message if isinstance(message, list) else [message]
+        for entry in entries:
+            if not isinstance(entry, dict):
+                logging.warning(f"[BLE] 알 수 없는 항목 무시: {entry!r}")
+            elif entry.get("type") == "timer":
+                timers.append((entry, reply))
+            elif entry.get("type") == "routine":
+                routines.append((entry, reply))
+            elif entry.get("type") == "template":
+                templates.append((entry, reply))
+            elif entry.get("type") in REQUEST_TYPES:
+                logging.warning(f"[BLE] {entry.get('type')} 메시지는 리스트에 담을 수 없음 - 무시")
+            else:
+                logging.warning(f"[BLE] 알 수 없는 type 무시: {entry.get('type')}")
+    return routines, timers, templates
+
+def save_batch(items):
+    routines, timers, templates = split_entries(items)
+    if not routines and not timers and not templates:
+        return
+    try:
+        repo.insert_batch(
+            [e for e, _ in routines], [e for e, _ in timers], [e for e, _ in templates]
+        )
+    except SAVE_ERRORS as e:
+        # 한 항목 때문에 묶음 전체(다른 휴대폰의 메시지 포함)를 잃지 않도록 항목별로 다시 저장하고,
+        # 실패한 항목은 보낸 클라이언트에게만 알린다
+        logging.warning(f"[BLE] 일괄 저장 실패, 항목별 저장으로 재시도: {e}")
+        for entry, reply in routines + timers + templates:
+            try:
+                save_to_db(entry)
+            except SAVE_ERRORS as e:
+                logging.error(f"[BLE] 저장 실패: {entry.get('id')} ({e})")
+                metrics.incr("ble.save_errors")
+                if reply is not None:
+                    reply({"type": "save_error", "id": entry.get("id"), "error": str(e)})
+        return
+    logging.info(f"[BLE] 저장 완료: 루틴 {len(routines)}건, 타이머 {len(timers)}건, 반복 템플릿 {len(templates)}건")
+
+# 응답을 돌려주는 요청 메시지 (앞서 온 일반 메시지를 먼저 저장한 뒤 처리)
+REQUEST_TYPES = ("sync", "stats")
+
+def is_request(message):
+    return isinstance(message, dict) and message.get("type") in REQUEST_TYPES
+
+# 동기화 요청 반영 후 변경분을 응답으로 돌려준다
+def handle_sync(message, reply=None):
+    try:
+        response = repo.apply_sync(
+            message.get("device", "unknown"),
+            routines=message.get("routines", []),
+            timers=message.get("timers", []),
+            templates=message.get("templates", []),
+            deleted=message.get("deleted"),
+            full=message.get("mode") == "full",
+            since=message.get("since"),
+        )
+        logging.info(
+            f"[BLE] 동기화 완료: device={message.get('device')} v{response['version']} "
+            f"(변경 루틴 {len(response['routines'])}건, 타이머 {len(response['timers'])}건)"
+        )
+    except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
+        logging.error(f"[BLE] 동기화 실패: {e}")
+        response = {"type": "sync_error", "error": str(e)}
+    if reply is not None:
+        reply(response)
+
+# 통계 요청: 요약 테이블에서 바로 답한다 (routines 를 훑지 않음)
+def handle_stats(message, reply=None):
+    try:
+        response = repo.stats_report(message.get("scope", "day"), message.get("key"), message.get("days"))
+        logging.info(f"[BLE] 통계 응답: {response['scope']} {message.get('key') or ''}")
+    except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
+        logging.error(f"[BLE] 통계 요청 실패: {e}")
+        response = {"type": "stats_error", "error": str(e)}
+    if reply is not None:
+        reply(response)
+
+REQUEST_HANDLERS = {"sync": handle_sync, "stats": handle_stats}
 
+def save_to_db(data):
     if data["type"] == "timer":
-        cursor.execute("""
-            INSERT INTO timers (id, timer_minutes, rest, repeat_count, icon)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            data["id"], data["timer_minutes"], data["rest"],
-            data["repeat_count"], data["icon"]
-        ))
+        repo.insert_timers([data])
         logging.info(f"[BLE] 타이머 저장 완료: ID={data['id']}")
 
+    elif data["type"] == "template":
+        repo.insert_templates([data])
+        logging.info(f"[BLE] 반복 템플릿 저장 완료: ID={data['id']}")
+
     elif data["type"] == "routine":
         routines = data if isinstance(data, list) else [data]
+        repo.insert_routines(routines)
         for r in routines:
-            cursor.execute("""
-                INSERT INTO routines (id, date, start_time, routine_minutes,
-                                      icon, routine_name, group_routine_name)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                r["id"], r["date"], r["start_time"], r["routine_minutes"],
-                r["icon"], r["routine_name"], r["group_routine_name"]
-            ))
-            logging.info(f"[BLE] 루틴 저장 완료: {r['routine_name']}")
-
-    conn.commit()
-    conn.close()
-
-def receive_bluetooth_data():
+            logging.debug(f"[BLE] 루틴 저장 완료: {r['routine_name']}")
+
+def write_batch(batch):
+    # 쓰기 단계: 모인 메시지를 순서대로 저장한다. 성공하면 True
+    try:
+        with metrics.timed("ble.batch_write"):
+            # 순서를 지키기 위해 요청 메시지 앞에 쌓인 일반 메시지를 먼저 저장한다
+            pending = []
+            for message, reply in batch:
+                if is_request(message):
+                    save_batch(pending)
+                    pending = []
+                    REQUEST_HANDLERS[message["type"]](message, reply)
+                else:
+                    pending.append((message, reply))
+            save_batch(pending)
+        return True
+    except Exception as e:
+        logging.error(f"[BLE 저장 오류] {e}")
+        metrics.incr("ble.write_errors")
+        return False
+
+class WriteScheduler:
+    # 클라이언트마다 대기열을 두고, 쓰기 단계가 돌아가며 하나씩 꺼내 한 묶음을 만든다 (라운드 로빈).
+    # 한 휴대폰이 전체 동기화를 쏟아부어도 다른 휴대폰의 메시지가 그 뒤에 줄 서지 않고,
+    # 같은 클라이언트 안에서는 받은 순서가 유지된다
+    def __init__(self, client_queue_size=CLIENT_QUEUE_SIZE):
+        self.client_queue_size = client_queue_size
+        self.queues = {}
+        self.closed = set()
+        self.ready = asyncio.Event()
+
+    def register(self, client_id):
+        self.queues[client_id] = asyncio.Queue(self.client_queue_size)
+
+    def unregister(self, client_id):
+        # 이미 받은 메시지는 마저 저장하고, 비면 대기열을 치운다
+        self.closed.add(client_id)
+        self.ready.set()
+
+    async def put(self, client_id, item):
+        await self.queues[client_id].put(item)
+        self.ready.set()
+
+    def take(self, limit):
+        batch = []
+        while len(batch) < limit:
+            taken = len(batch)
+            for client_id, queue in list(self.queues.items()):
+                if len(batch) >= limit:
+                    break
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                elif client_id in self.closed:
+                    del self.queues[client_id]
+                    self.closed.discard(client_id)
+            if len(batch) == taken:
+                break
+        if self.queues:
+            # 다음 묶음은 다른 클라이언트부터 시작한다
+            first = next(iter(self.queues))
+            self.queues[first] = self.queues.pop(first)
+        return batch
+
+    async def next_batch(self, limit=WRITE_BATCH_SIZE):
+        while True:
+            batch = self.take(limit)
+            if batch:
+                return batch
+            self.ready.clear()
+            await self.ready.wait()
+
+async def write_messages(writer, run_blocking, on_change=None):
+    # 수신 태스크와 분리된 쓰기 태스크: 모든 클라이언트의 메시지를 모아 한 트랜잭션으로 커밋한다.
+    # DB 쓰기는 이벤트 루프를 막지 않도록 run_blocking(실행기)에서 한다
     while True:
+        batch = await writer.next_batch(WRITE_BATCH_SIZE)
+        if await run_blocking(write_batch, batch) and on_change is not None:
+            on_change()
+
+def make_reply(loop, client_sock):
+    # handle_sync 는 실행기 스레드에서 불리므로 전송은 이벤트 루프에 넘긴다
+    async def send(frame):
         try:
-            server_sock = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-            port = 1
-            server_sock.bind(("", port))
-            server_sock.listen(1)
+            await loop.sock_sendall(client_sock, frame)
+        except (OSError, ValueError) as e:
+            logging.warning(f"[BLE] 응답 전송 실패: {e}")
 
-            logging.info("[BLE] 연결 대기 중...")
-            client_sock, address = server_sock.accept()
-            logging.info(f"[BLE] 연결됨: {address}")
+    def reply(response):
+        frame = encode_frame(response)
+        loop.call_soon_threadsafe(lambda: loop.create_task(send(frame)))
+    return reply
+
+async def serve_client(loop, writer, client_sock, address, client_id):
+    # 클라이언트 하나: 자기 FrameDecoder 로 프레임을 나누고 자기 대기열에 넣는다
+    client_sock.setblocking(False)
+    decoder = FrameDecoder()
+    reply = make_reply(loop, client_sock)
+    writer.register(client_id)
+    try:
+        while True:
+            data = await loop.sock_recv(client_sock, RECV_SIZE)
+            if not data:
+                logging.info(f"[BLE] 클라이언트 연결 종료됨: {address}")
+                break
+
+            messages_in = decoder.feed(data)
+            metrics.incr("ble.rx_bytes", len(data))
+            metrics.incr("ble.rx_messages", len(messages_in))
+            metrics.log_sampled("ble.rx", f"[BLE] 수신 데이터: {len(data)} bytes, 메시지 {len(messages_in)}건")
+            for message in messages_in:
+                await writer.put(client_id, (message, reply))
+
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"[BLE 내부 수신 오류] {address}: {e}")
+    finally:
+        writer.unregister(client_id)
+        client_sock.close()
 
+async def serve_bluetooth(writer, max_clients=BLE_MAX_CLIENTS):
+    # 듣는 소켓 하나로 여러 휴대폰을 동시에 받는다. 소켓은 연결이 끊겨도 그대로 두고
+    # 듣는 소켓 자체에 오류가 났을 때만 다시 만든다
+    loop = asyncio.get_running_loop()
+    client_ids = itertools.count(1)
+    while True:
+        server_sock = None
+        clients = set()
+        try:
+            server_sock = hardware.rfcomm_socket()
+            server_sock.bind(("", RFCOMM_PORT))
+            server_sock.listen(max_clients)
+            server_sock.setblocking(False)
+            slots = asyncio.Semaphore(max_clients)
+
+            logging.info("[BLE] 연결 대기 중...")
             while True:
+                await slots.acquire()
                 try:
-                    data = client_sock.recv(4096).decode('utf-8')
-                    if not data:
-                        logging.info("[BLE] 클라이언트 연결 종료됨")
-                        break
-
-                    logging.info(f"[BLE] 수신 데이터: {data}")
-                    json_data = json.loads(data)
-
-                    if isinstance(json_data, list):
-                        for entry in json_data:
-                            save_to_db(entry)
-                    else:
-                        save_to_db(json_data)
-
-                except Exception as e:
-                    logging.error(f"[BLE 내부 수신 오류] {e}")
-                    break
+                    client_sock, address = await loop.sock_accept(server_sock)
+                except BaseException:
+                    slots.release()
+                    raise
+                logging.info(f"[BLE] 연결됨: {address} (동시 연결 {len(clients) + 1})")
+                metrics.incr("ble.connections")
+                task = loop.create_task(serve_client(loop, writer, client_sock, address, next(client_ids)))
+                clients.add(task)
 
-            client_sock.close()
-            server_sock.close()
+                def finished(task, slots=slots):
+                    clients.discard(task)
+                    slots.release()
+                task.add_done_callback(finished)
 
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logging.error(f"[BLE 연결 오류] {e}")
-            time.sleep(1)
+            await asyncio.sleep(1)
+        finally:
+            for task in clients:
+                task.cancel()
+            if server_sock is not None:
+                server_sock.close()
+
+async def run_receiver(db_changed=None):
+    writer = WriteScheduler()
+    on_change = db_changed.set if db_changed is not None else None
+    await asyncio.gather(
+        serve_bluetooth(writer),
+        write_messages(writer, asyncio.to_thread, on_change),
+    )
+
+# 수신만 단독으로 실행할 때 (통합 실행은 runtime.py)
+def receive_bluetooth_data(db_changed=None):
+    metrics.start_exporter("receiver")
+    asyncio.run(run_receiver(db_changed))
+
+if __name__ == "__main__":
+    receive_bluetooth_data()
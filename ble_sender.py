@@ -1,41 +1,153 @@
-
-import bluetooth
-import json
+import hardware
+import time
+import queue
 import logging
+import metrics
+import threading
+from routine_db import DB_PATH, get_repository
+from ble_protocol import encode_frame
 
 TARGET_MAC_ADDRESS = 'A4:75:B9:BB:51:3B'
-client_sock = None
 
-def ensure_connection():
-    global client_sock
-    if client_sock and is_connected():
-        return True
-    try:
-        client_sock = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-        client_sock.connect((TARGET_MAC_ADDRESS, 1))
+# 메모리 대기열 크기 (넘치면 송신함(DB)에만 남기고 나중에 다시 읽는다)
+SEND_QUEUE_SIZE = 64
+# 한 프레임으로 묶어 보내는 최대 보고 수
+SEND_BATCH_SIZE = 16
+# 재연결 대기 시간(초): 실패할 때마다 두 배, 최대값까지
+RECONNECT_BACKOFF_INITIAL = 1
+RECONNECT_BACKOFF_MAX = 300
+
+class BleSender(threading.Thread):
+    # 루틴 루프는 송신함에 기록만 하고 바로 돌아가고, 연결/전송/재시도는 이 스레드가 맡는다
+    def __init__(self, repo, address=TARGET_MAC_ADDRESS):
+        super().__init__(daemon=True)
+        self.repo = repo
+        self.address = address
+        self.queue = queue.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.overflowed = True  # 시작 시 이전 실행에서 남은 송신함을 읽는다
+        self.pending = {}
+        self.sock = None
+        self.backoff = RECONNECT_BACKOFF_INITIAL
+
+    def submit(self, data):
+        self.enqueue(self.repo.outbox_add(data), data)
+
+    def enqueue(self, outbox_id, data):
+        # 이미 송신함에 기록된 보고를 대기열에 올린다
+        try:
+            self.queue.put_nowait((outbox_id, data))
+        except queue.Full:
+            self.overflowed = True
+            logging.warning("[BLE 송신] 대기열 가득 참 - 송신함에서 나중에 전송")
+
+    def drain(self, timeout=None):
+        items = []
+        try:
+            items.append(self.queue.get(timeout=timeout))
+            while True:
+                items.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        if not items:
+            return
+        # submit 은 송신함에 커밋한 뒤 대기열에 올리므로, 그 사이 reload_outbox 가 같은 행을 읽어
+        # 이미 보내고 지웠을 수 있다. 송신함에 아직 남아 있는 보고만 받는다
+        remaining = self.repo.outbox_existing([outbox_id for outbox_id, _ in items])
+        for outbox_id, data in items:
+            if outbox_id in remaining:
+                self.pending[outbox_id] = data
+
+    def reload_outbox(self):
+        # 대기열 크기만큼씩 읽는다. 꽉 차게 읽혔으면 더 남아 있을 수 있으므로
+        # overflowed 를 그대로 두고 전송으로 자리가 날 때마다 다시 읽는다
+        self.overflowed = False
+        rows = self.repo.outbox_pending(limit=SEND_QUEUE_SIZE)
+        if len(rows) >= SEND_QUEUE_SIZE:
+            self.overflowed = True
+        for outbox_id, data in rows:
+            self.pending.setdefault(outbox_id, data)
+
+    def connect(self):
+        if self.sock is not None:
+            return True
+        try:
+            sock = hardware.rfcomm_socket()
+            sock.connect((self.address, 1))
+        except Exception as e:
+            logging.error(f"[BLE] 연결 실패: {e} ({self.backoff}초 후 재시도)")
+            return False
+        self.sock = sock
+        self.backoff = RECONNECT_BACKOFF_INITIAL
         logging.info("[BLE] 재연결 성공")
         return True
-    except Exception as e:
-        logging.error(f"[BLE] 연결 실패: {e}")
-        client_sock = None
-        return False
 
-def is_connected():
-    try:
-        client_sock.send(b'')  # 테스트 전송
+    def disconnect(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except Exception:
+                pass
+        self.sock = None
+
+    def send_batch(self):
+        ids = sorted(self.pending)[:SEND_BATCH_SIZE]
+        reports = [self.pending[i] for i in ids]
+        # 여러 그룹 보고는 리스트 하나로 묶어 한 프레임으로 보낸다
+        frame = encode_frame(reports[0] if len(reports) == 1 else reports)
+        try:
+            self.sock.sendall(frame)
+        except Exception as e:
+            logging.error(f"[BLE 송신] 오류: {e}")
+            metrics.incr("ble.tx_errors")
+            self.disconnect()
+            return False
+        self.repo.outbox_remove(ids)
+        for i in ids:
+            del self.pending[i]
+        metrics.incr("ble.tx_bytes", len(frame))
+        metrics.incr("ble.tx_messages", len(ids))
+        logging.info(f"[BLE 송신] 전송 완료: 보고 {len(ids)}건, {len(frame)} bytes")
         return True
-    except:
-        return False
+
+    def run(self):
+        while True:
+            if self.overflowed and len(self.pending) < SEND_QUEUE_SIZE:
+                self.reload_outbox()
+            if not self.pending:
+                self.drain()
+                continue
+            self.drain(timeout=0)
+            if not self.connect():
+                # 기다리는 동안 새 보고가 오면 같이 모아 둔다
+                deadline = time.monotonic() + self.backoff
+                while (left := deadline - time.monotonic()) > 0:
+                    self.drain(timeout=left)
+                self.backoff = min(self.backoff * 2, RECONNECT_BACKOFF_MAX)
+                continue
+            self.send_batch()
+
+_sender = None
+_sender_lock = threading.Lock()
+
+def get_sender():
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = BleSender(get_repository(DB_PATH))
+            _sender.start()
+        return _sender
+
+def send_outbox_entries(entries):
+    # 다른 트랜잭션(루틴 상태 갱신)이 송신함에 함께 넣은 보고 [(outbox_id, data)]
+    try:
+        sender = get_sender()
+        for outbox_id, data in entries:
+            sender.enqueue(outbox_id, data)
+    except Exception as e:
+        logging.error(f"[BLE 송신] 대기열 오류: {e}")
 
 def send_json_via_ble(data):
-    global client_sock
     try:
-        if not ensure_connection():
-            logging.warning("[BLE] 연결되지 않아 전송 생략")
-            return
-        json_str = json.dumps(data) + "\n"
-        client_sock.send(json_str.encode('utf-8'))
-        logging.info(f"[BLE 송신] 전송 완료: {json_str.strip()}")
+        get_sender().submit(data)
     except Exception as e:
-        logging.error(f"[BLE 송신] 오류: {e}")
-        client_sock = None
+        logging.error(f"[BLE 송신] 송신함 저장 오류: {e}")
@@ -0,0 +1,125 @@
+import os
+import mmap
+import json
+import time
+import zlib
+import struct
+import logging
+import threading
+
+# 진행 중인 루틴/타이머와 모터 위치를 담는 작은 상태 파일 (mmap)
+CHECKPOINT_PATH = os.environ.get("ROUTINE_CHECKPOINT_PATH", "/home/pi/LCD_final/session.state")
+# 슬롯 두 개를 번갈아 써서 쓰다가 죽어도 직전 상태 하나는 항상 온전하다
+SLOT_SIZE = 4096
+# 매 tick 은 페이지 캐시(mmap)에만 쓰고, 디스크 동기화는 이 주기나 상태 전환 때만 한다(초)
+SYNC_INTERVAL = 10
+
+HEADER = struct.Struct("<4sQII")  # magic, seq, 길이, crc32
+MAGIC = b"RTJ1"
+
+class SessionJournal:
+    def __init__(self, path=CHECKPOINT_PATH, position=None):
+        self.path = path
+        # 쓸 때마다 함께 기록할 모터 위치 (position() → {"position": ..., "phase": ...})
+        self.position = position
+        self.lock = threading.Lock()
+        self.state = {}
+        self.seq = 0
+        self.map = None
+        self.last_sync = 0.0
+
+    def open(self):
+        if self.map is not None:
+            return self.map
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < 2 * SLOT_SIZE:
+                os.ftruncate(fd, 2 * SLOT_SIZE)
+            self.map = mmap.mmap(fd, 2 * SLOT_SIZE)
+        finally:
+            os.close(fd)
+        return self.map
+
+    def read_slot(self, index):
+        data = self.map[index * SLOT_SIZE:(index + 1) * SLOT_SIZE]
+        magic, seq, length, crc = HEADER.unpack_from(data)
+        payload = data[HEADER.size:HEADER.size + length]
+        if magic != MAGIC or length > SLOT_SIZE - HEADER.size or zlib.crc32(payload) != crc:
+            return None
+        return seq, payload
+
+    def load(self):
+        # 두 슬롯 중 온전하고 seq 가 큰 쪽을 읽는다. 없으면 빈 dict
+        with self.lock:
+            try:
+                self.open()
+            except OSError as e:
+                logging.error(f"[CKPT] 상태 파일 열기 실패: {e}")
+                return {}
+            slots = [slot for slot in (self.read_slot(0), self.read_slot(1)) if slot]
+            if not slots:
+                return {}
+            self.seq, payload = max(slots)
+            try:
+                self.state = json.loads(payload)
+            except ValueError:
+                self.state = {}
+            return dict(self.state)
+
+    def write(self, sync=False):
+        state = dict(self.state)
+        if self.position is not None:
+            state["motor"] = self.position()
+        state["saved_at"] = time.time()
+        payload = json.dumps(state, separators=(",", ":")).encode("utf-8")
+        if len(payload) > SLOT_SIZE - HEADER.size:
+            logging.error(f"[CKPT] 상태가 너무 큼: {len(payload)} bytes")
+            return
+        self.seq += 1
+        offset = (self.seq % 2) * SLOT_SIZE
+        # 내용 → 헤더 순으로 써야 헤더의 crc 가 맞을 때만 유효한 슬롯이 된다
+        self.map[offset + HEADER.size:offset + HEADER.size + len(payload)] = payload
+        self.map[offset:offset + HEADER.size] = HEADER.pack(MAGIC, self.seq, len(payload), zlib.crc32(payload))
+        now = time.monotonic()
+        if sync or now - self.last_sync >= SYNC_INTERVAL:
+            self.map.flush()
+            self.last_sync = now
+
+    def update(self, sync=False, **sections):
+        # 섹션(routine / timer)을 바꾸고 기록. None 이면 섹션을 지운다
+        with self.lock:
+            try:
+                self.open()
+            except OSError as e:
+                logging.error(f"[CKPT] 상태 파일 열기 실패: {e}")
+                return
+            for name, value in sections.items():
+                if value is None:
+                    self.state.pop(name, None)
+                else:
+                    self.state[name] = value
+            self.write(sync)
+
+    def patch(self, name, sync=False, **fields):
+        # 섹션의 일부 값만 바꿔 기록 (섹션이 이미 지워졌으면 아무것도 하지 않는다)
+        with self.lock:
+            section = self.state.get(name)
+            if section is None or self.map is None:
+                return
+            self.state[name] = dict(section, **fields)
+            self.write(sync)
+
+    def tick(self):
+        # 섹션은 그대로 두고 모터 위치 등만 갱신
+        self.update()
+
+_journal = None
+_journal_lock = threading.Lock()
+
+def get_journal(position=None):
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = SessionJournal(position=position)
+        return _journal
@@ -0,0 +1,258 @@
+import os
+import sys
+import time
+import socket
+import threading
+
+# "real": 라즈베리파이 드라이버, "sim": 하드웨어 없이 동작하는 메모리 내 가짜 장치
+HARDWARE_BACKEND = os.environ.get("ROUTINE_HW", "real")
+# sim 백엔드에서 RFCOMM 채널 n 은 127.0.0.1:(SIM_RFCOMM_PORT_BASE + n) TCP 소켓으로 대신한다
+SIM_RFCOMM_PORT_BASE = int(os.environ.get("ROUTINE_SIM_RFCOMM_PORT", "47000"))
+
+LCD_LIB_PATH = "/home/pi/LCD_final"
+BUTTON_BOUNCE_TIME = 0.05
+
+_devices = {}
+_devices_lock = threading.Lock()
+
+def use_backend(name):
+    global HARDWARE_BACKEND
+    if name not in ("real", "sim"):
+        raise ValueError(f"unknown hardware backend: {name}")
+    HARDWARE_BACKEND = name
+    _devices.clear()
+
+def is_simulated():
+    return HARDWARE_BACKEND == "sim"
+
+def _cached(key, factory):
+    with _devices_lock:
+        device = _devices.get(key)
+        if device is None:
+            device = _devices[key] = factory()
+        return device
+
+# ------------------ 가짜 장치 ------------------ #
+class SimLCD:
+    # LCD_1inch28 과 같은 메서드를 가진 메모리 프레임버퍼 (RGB565, big-endian)
+    width = 240
+    height = 240
+    DC_PIN = 25
+
+    def __init__(self):
+        self.framebuffer = bytearray(self.width * self.height * 2)
+        self.window = (0, 0, self.width, self.height)
+        self.cursor = 0
+        self.backlight = 0
+        self.frames = 0
+        self.bytes_written = 0
+        self.last_update = None
+        # spidev.SpiDev 처럼 writebytes2 로 버퍼를 그대로 받는다
+        self.SPI = self
+
+    def Init(self):
+        pass
+
+    def module_exit(self):
+        pass
+
+    def bl_DutyCycle(self, duty):
+        self.backlight = duty
+
+    def clear(self):
+        self.framebuffer[:] = bytes(len(self.framebuffer))
+        self.touch()
+
+    def digital_write(self, pin, value):
+        pass
+
+    def SetWindows(self, x_start, y_start, x_end, y_end):
+        self.window = (x_start, y_start, x_end, y_end)
+        self.cursor = 0
+
+    def spi_writebyte(self, data):
+        x0, y0, x1, y1 = self.window
+        row_bytes = (x1 - x0) * 2
+        data = bytes(data)
+        offset = 0
+        while offset < len(data):
+            row, col = divmod(self.cursor, row_bytes)
+            n = min(row_bytes - col, len(data) - offset)
+            start = ((y0 + row) * self.width + x0) * 2 + col
+            self.framebuffer[start:start + n] = data[offset:offset + n]
+            self.cursor += n
+            offset += n
+        self.bytes_written += len(data)
+        self.touch()
+
+    def writebytes2(self, data):
+        self.spi_writebyte(data)
+
+    def ShowImage(self, image, Xstart=0, Ystart=0):
+        from lcd_frame import image_to_rgb565
+        self.SetWindows(0, 0, self.width, self.height)
+        self.spi_writebyte(image_to_rgb565(image))
+
+    def touch(self):
+        self.frames += 1
+        self.last_update = time.monotonic()
+
+class SimButton:
+    # gpiozero.Button 과 같은 속성/콜백을 가진, 코드로 누르고 뗄 수 있는 버튼
+    def __init__(self, pin):
+        self.pin = pin
+        self.is_pressed = False
+        self.hold_time = 1.0
+        self.when_pressed = None
+        self.when_released = None
+        self.when_held = None
+        self.changed = threading.Condition()
+        self.hold_timer = None
+
+    def press(self):
+        with self.changed:
+            self.is_pressed = True
+            self.changed.notify_all()
+        if self.when_held:
+            self.hold_timer = threading.Timer(self.hold_time, self._held)
+            self.hold_timer.daemon = True
+            self.hold_timer.start()
+        if self.when_pressed:
+            self.when_pressed()
+
+    def release(self):
+        if self.hold_timer:
+            self.hold_timer.cancel()
+        with self.changed:
+            self.is_pressed = False
+            self.changed.notify_all()
+        if self.when_released:
+            self.when_released()
+
+    def tap(self, hold=0.0):
+        self.press()
+        if hold:
+            time.sleep(hold)
+        self.release()
+
+    def _held(self):
+        if self.is_pressed and self.when_held:
+            self.when_held()
+
+    def wait_for_press(self, timeout=None):
+        with self.changed:
+            return self.changed.wait_for(lambda: self.is_pressed, timeout)
+
+    def wait_for_release(self, timeout=None):
+        with self.changed:
+            return self.changed.wait_for(lambda: not self.is_pressed, timeout)
+
+class SimBuzzer:
+    def __init__(self, pin):
+        self.pin = pin
+        self.is_active = False
+        self.history = []
+
+    def on(self):
+        self.is_active = True
+        self.history.append((time.monotonic(), True))
+
+    def off(self):
+        self.is_active = False
+        self.history.append((time.monotonic(), False))
+
+class SimGPIO:
+    # RPi.GPIO 모듈 대용. output 호출 시각을 기록해 스텝 타이밍을 측정할 수 있다
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self):
+        self.levels = {}
+        self.outputs = []
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, channel, direction):
+        self.levels[channel] = self.LOW
+
+    def output(self, channel, value):
+        channels = channel if isinstance(channel, (list, tuple)) else [channel]
+        values = value if isinstance(value, (list, tuple)) else [value] * len(channels)
+        for ch, val in zip(channels, values):
+            self.levels[ch] = val
+        self.outputs.append((time.perf_counter(), tuple(values)))
+
+    def cleanup(self):
+        self.levels.clear()
+
+    def step_intervals(self):
+        times = [t for t, _ in self.outputs]
+        return [b - a for a, b in zip(times, times[1:])]
+
+class SimRfcommSocket(socket.socket):
+    # RFCOMM 소켓 대신 쓰는 로컬 TCP 루프백 소켓 (주소의 MAC 부분은 무시)
+    def __init__(self):
+        super().__init__(socket.AF_INET, socket.SOCK_STREAM)
+        self.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+    def bind(self, address):
+        super().bind(("127.0.0.1", SIM_RFCOMM_PORT_BASE + address[1]))
+
+    def connect(self, address):
+        super().connect(("127.0.0.1", SIM_RFCOMM_PORT_BASE + address[1]))
+
+# ------------------ 장치 생성 (드라이버는 처음 쓸 때 불러온다) ------------------ #
+def create_lcd():
+    def factory():
+        if is_simulated():
+            return SimLCD()
+        if LCD_LIB_PATH not in sys.path:
+            sys.path.append(LCD_LIB_PATH)
+        from LCD_1inch28 import LCD_1inch28
+        return LCD_1inch28()
+    return _cached("lcd", factory)
+
+def button(pin):
+    def factory():
+        if is_simulated():
+            return SimButton(pin)
+        from gpiozero import Button
+        return Button(pin, pull_up=False, bounce_time=BUTTON_BOUNCE_TIME)
+    return _cached(("button", pin), factory)
+
+def buzzer(pin):
+    def factory():
+        if is_simulated():
+            return SimBuzzer(pin)
+        from gpiozero import Buzzer
+        return Buzzer(pin)
+    return _cached(("buzzer", pin), factory)
+
+def gpio():
+    if is_simulated():
+        return _cached("gpio", SimGPIO)
+    import RPi.GPIO as GPIO
+    return GPIO
+
+def pigpio():
+    # pigpio 가 없거나 sim 백엔드면 None → 소프트웨어 스텝 구동
+    if is_simulated():
+        return None
+    try:
+        import pigpio
+    except ImportError:
+        return None
+    return pigpio
+
+def rfcomm_socket():
+    if is_simulated():
+        return SimRfcommSocket()
+    import bluetooth
+    return bluetooth.BluetoothSocket(bluetooth.RFCOMM)
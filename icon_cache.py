@@ -0,0 +1,103 @@
+import os
+import glob
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from PIL import Image
+from lcd_frame import LCD_WIDTH, LCD_HEIGHT, image_to_rgb565
+
+ICON_PATH = os.environ.get("ROUTINE_ICON_PATH", "/home/pi/APP_icon/")
+# 변환된 프레임을 재부팅 후에도 재사용하기 위한 디스크 캐시 위치
+ICON_CACHE_DIR = os.environ.get("ROUTINE_ICON_CACHE", "/home/pi/.cache/routine_icons/")
+# 메모리에 유지할 프레임 수 (240x240 RGB565 한 장 = 115KB)
+ICON_CACHE_SIZE = 16
+
+FRAME_SIZE = LCD_WIDTH * LCD_HEIGHT * 2
+
+class IconCache:
+    # 아이콘 JPG를 한 번만 디코드/리사이즈/회전/RGB565 변환하고
+    # 결과를 메모리 LRU와 디스크(파일 mtime 기준)에 보관한다
+    def __init__(self, icon_dir=ICON_PATH, cache_dir=ICON_CACHE_DIR, capacity=ICON_CACHE_SIZE):
+        self.icon_dir = icon_dir
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+
+    def path(self, icon):
+        return os.path.join(self.icon_dir, icon)
+
+    def exists(self, icon):
+        return os.path.exists(self.path(icon))
+
+    def render(self, icon, angle):
+        image = Image.open(self.path(icon)).convert("RGB").resize((LCD_WIDTH, LCD_HEIGHT))
+        if angle % 360:
+            image = image.rotate(angle)
+        return image
+
+    def disk_prefix(self, icon, angle):
+        digest = hashlib.sha1(self.path(icon).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}_{angle % 360}_")
+
+    def load_disk(self, prefix, mtime):
+        try:
+            with open(f"{prefix}{mtime}.rgb565", "rb") as f:
+                frame = f.read()
+        except OSError:
+            return None
+        return frame if len(frame) == FRAME_SIZE else None
+
+    def save_disk(self, prefix, mtime, frame):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # 원본이 바뀌어 쓸모없어진 이전 프레임은 지운다
+            for stale in glob.glob(glob.escape(prefix) + "*.rgb565"):
+                os.remove(stale)
+            tmp_path = f"{prefix}{mtime}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(frame)
+            os.replace(tmp_path, f"{prefix}{mtime}.rgb565")
+        except OSError as e:
+            logging.warning(f"[ICON] 디스크 캐시 저장 실패: {e}")
+
+    def get(self, icon, angle=90):
+        try:
+            mtime = os.stat(self.path(icon)).st_mtime_ns
+        except OSError:
+            return None
+        key = (icon, angle % 360)
+        with self.lock:
+            entry = self.frames.get(key)
+            if entry and entry[0] == mtime:
+                self.frames.move_to_end(key)
+                return entry[1]
+
+        prefix = self.disk_prefix(icon, angle)
+        frame = self.load_disk(prefix, mtime)
+        if frame is None:
+            frame = image_to_rgb565(self.render(icon, angle))
+            self.save_disk(prefix, mtime, frame)
+            logging.info(f"[ICON] 프레임 생성: {icon} ({angle}°)")
+
+        with self.lock:
+            self.frames[key] = (mtime, frame)
+            self.frames.move_to_end(key)
+            while len(self.frames) > self.capacity:
+                self.frames.popitem(last=False)
+        return frame
+
+    def preload(self, icons, angle=90):
+        for icon in icons:
+            self.get(icon, angle)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_icon_cache(icon_dir=ICON_PATH):
+    with _caches_lock:
+        cache = _caches.get(icon_dir)
+        if cache is None:
+            cache = _caches[icon_dir] = IconCache(icon_dir)
+        return cache
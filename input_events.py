@@ -0,0 +1,66 @@
+import time
+import queue
+import logging
+from collections import namedtuple
+
+# kind: "press"(눌림), "double"(연속 두 번), "long"(길게 누름)
+ButtonEvent = namedtuple("ButtonEvent", "button kind time")
+
+# 이 간격 안의 반복 눌림은 채터링으로 보고 버린다(초)
+DEBOUNCE_SECONDS = 0.05
+DOUBLE_PRESS_SECONDS = 0.4
+LONG_PRESS_SECONDS = 1.0
+
+class InputEvents:
+    # gpiozero 콜백(when_pressed/when_held)을 스레드 안전한 이벤트 큐로 모아,
+    # 상태 머신이 폴링 대신 큐에서 블록하며 기다리게 한다
+    def __init__(self):
+        self.events = queue.Queue()
+        self.last_press = {}
+        self.sink = self.events.put
+
+    def attach(self, name, button):
+        button.hold_time = LONG_PRESS_SECONDS
+        button.when_pressed = lambda: self.on_press(name)
+        button.when_held = lambda: self.emit(name, "long", time.monotonic())
+
+    def on_press(self, name):
+        now = time.monotonic()
+        last = self.last_press.get(name)
+        if last is not None and now - last < DEBOUNCE_SECONDS:
+            return
+        self.last_press[name] = now
+        self.emit(name, "press", now)
+        if last is not None and now - last < DOUBLE_PRESS_SECONDS:
+            self.emit(name, "double", now)
+
+    def emit(self, name, kind, pressed_at):
+        logging.debug(f"[INPUT] {name} {kind}")
+        self.sink(ButtonEvent(name, kind, pressed_at))
+
+    def clear(self):
+        # 이전 화면에서 눌린 입력이 새 상태로 넘어가지 않게 비운다
+        try:
+            while True:
+                self.events.get_nowait()
+        except queue.Empty:
+            pass
+
+    def get(self, timeout=None):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def wait_for(self, buttons, timeout=None, kinds=("press",)):
+        # 지정한 버튼 이벤트가 오거나 timeout 이 지나면 반환 (timeout 이면 None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            event = self.get(remaining)
+            if event is None:
+                return None
+            if event.button in buttons and event.kind in kinds:
+                return event
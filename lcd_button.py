@@ -1,40 +1,41 @@
 #!/usr/bin/python
 # -*- coding: UTF-8 -*-
-import os
 import sys
 import time
 import logging
 import sqlite3
 from datetime import datetime, time as dtime, timedelta
-from PIL import Image
-from gpiozero import Button
-
-sys.path.append("/home/pi/LCD_final")
-from LCD_1inch28 import LCD_1inch28
+import hardware
+from routine_db import ROUTINE_SKIPPED, ROUTINE_FAILED, ROUTINE_TIMEOUT, Routine, get_repository
+from agenda import parse_start_time
+from missed_policy import MissedRoutinePolicy
+from icon_cache import get_icon_cache
+from lcd_frame import show_frame
+from input_events import InputEvents
 
 # GPIO 버튼 설정
-button1 = Button(5, pull_up=False, bounce_time=0.05)
-button2 = Button(6, pull_up=False, bounce_time=0.05)
+button1 = hardware.button(5)
+button2 = hardware.button(6)
+
+# 버튼 입력은 콜백 → 이벤트 큐로 받는다
+events = InputEvents()
+events.attach("button1", button1)
+events.attach("button2", button2)
 
 # SQLite DB 경로
 DB_PATH = '/home/pi/routine_db.db'
+repo = get_repository(DB_PATH)
+icons = get_icon_cache("/home/pi/APP_icon/")
+# 폴링이 정각(HH:MM)을 놓쳐도 루틴을 잃지 않도록 지난 루틴은 정책으로 판정한다
+policy = MissedRoutinePolicy.load()
+# 오늘 이미 판정한 루틴 id (날짜가 바뀌면 비운다)
+handled = set()
+handled_date = None
 
 logging.basicConfig(level=logging.DEBUG)
 
-def connect_db():
-    try:
-        return sqlite3.connect(DB_PATH)
-    except sqlite3.Error as err:
-        logging.error(f"DB connection failed: {err}")
-        return None
-
 def get_routine_data():
-    conn = connect_db()
-    if not conn:
-        return None
     try:
-        cursor = conn.cursor()
-
         today = datetime.now().strftime("%Y-%m-%d")
 
         query = """
@@ -42,72 +43,56 @@ def get_routine_data():
         FROM routines 
         WHERE completed = 0 AND date = ?
         """
-        cursor.execute(query, (today,))
-        return cursor.fetchall()
+        return repo.query(query, (today,))
     except sqlite3.Error as err:
         logging.error(f"Query failed: {err}")
         return None
-    finally:
-        cursor.close()
-        conn.close()
 
 def update_routine_status(routine_id, status):
-    conn = connect_db()
-    if not conn:
-        logging.error("DB connect fail: enable update db")
-        return
     try:
-        cursor = conn.cursor()
-        query = "UPDATE routines SET completed = ? WHERE id = ?"
-        cursor.execute(query, (status, routine_id))
-        conn.commit()
+        repo.update_routine_status(routine_id, status)
         logging.info(f"routine ID {routine_id} update state: {'success' if status == 1 else 'fail'}")
     except sqlite3.Error as e:
         logging.error(f"routine state update error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
-
-def compare_time(date_str, time_str):
-    now = datetime.now()
-    current_date = now.strftime("%Y-%m-%d")
-    current_time = now.strftime("%H:%M")
 
-    db_time = str(time_str)[:5]  # 'HH:MM'
-    is_match = current_date == str(date_str) and current_time == db_time
-
-    logging.info(f"Comparing: {current_date=} {db_time=} {current_time=} → Match: {is_match}")
-    return is_match
+# 오늘 루틴의 시작 시각이 이미 지났으면 그 시각을, 아니면 None 을 돌려준다
+def due_start(date_str, time_str, now):
+    if str(date_str) != now.strftime("%Y-%m-%d"):
+        return None
+    start = parse_start_time(str(time_str), now)
+    logging.debug(f"Comparing: {date_str=} {time_str=} now={now.strftime('%H:%M:%S')}")
+    return start if start <= now else None
 
-def handle_routine_event(routine_id, duration_hours, duration_minutes, disp, image):
+def handle_routine_event(routine_id, duration_hours, duration_minutes, disp, frame):
     total_seconds = duration_hours * 3600 + duration_minutes * 60
-    end_time = time.time() + total_seconds
 
-    disp.ShowImage(image)
+    show_frame(disp, frame)
+    events.clear()
     logging.info(f"start time (ID={routine_id}) : {duration_hours}H {duration_minutes}M while LCD on")
 
     button_pressed = None
-    while time.time() < end_time:
-        if button1.is_pressed:
-            button_pressed = 'success'
-            break
-        elif button2.is_pressed:
-            button_pressed = 'fail'
-            break
-        time.sleep(0.1)
+    event = events.wait_for(("button1", "button2"), timeout=total_seconds)
+    if event and event.button == "button1":
+        button_pressed = 'success'
+    elif event and event.button == "button2":
+        button_pressed = 'fail'
 
     if button_pressed == 'success':
         update_routine_status(routine_id, 1)
         logging.info("button1 pressed - routine success")
+    elif button_pressed == 'fail':
+        update_routine_status(routine_id, ROUTINE_FAILED)
+        logging.info("button2 pressed - routine fail")
     else:
-        update_routine_status(routine_id, 0)
-        logging.info("time out or button2 pressed - routine fail")
+        update_routine_status(routine_id, ROUTINE_TIMEOUT)
+        logging.info("time out - routine fail")
 
     disp.clear()
     logging.info("LCD off")
 
 def main():
-    disp = LCD_1inch28()
+    global handled_date
+    disp = hardware.create_lcd()
     disp.Init()
     disp.clear()
     disp.bl_DutyCycle(50)
@@ -120,17 +105,33 @@ def main():
             continue
 
         match_found = False
+        now = datetime.now()
+        if handled_date != now.date():
+            handled.clear()
+            handled_date = now.date()
         for routine in routines:
             routine_id, date_str, start_time, icon, hours, minutes = routine
-            if compare_time(date_str, start_time):
-                image_path = os.path.join("/home/pi/APP_icon/", icon)
-                if os.path.exists(image_path):
-                    image = Image.open(image_path).resize((240, 240)).rotate(180)
-                    handle_routine_event(routine_id, hours, minutes, disp, image)
-                    match_found = True
-                    break
-                else:
-                    logging.error(f"no icon file exist: {image_path}")
+            if routine_id in handled:
+                continue
+            start = due_start(date_str, start_time, now)
+            if start is None:
+                continue
+            handled.add(routine_id)
+            decision = policy.decide(Routine(routine_id, start_time, icon, hours * 60 + minutes, None, None), start, now)
+            if decision.action == "skip":
+                update_routine_status(routine_id, ROUTINE_SKIPPED)
+                logging.info(f"routine ID {routine_id} skipped ({decision.reason})")
+                continue
+            frame = icons.get(icon, 180)
+            if frame is not None:
+                hours, minutes = divmod(decision.minutes, 60)
+                handle_routine_event(routine_id, hours, minutes, disp, frame)
+                match_found = True
+                break
+            else:
+                # 다시 시도하지 않으므로 실패로 확정해 미처리로 남지 않게 한다
+                logging.error(f"no icon file exist: {icons.path(icon)} - routine ID {routine_id} failed")
+                update_routine_status(routine_id, ROUTINE_FAILED)
         if not match_found:
             time.sleep(2)
 
@@ -139,6 +140,6 @@ if __name__ == "__main__":
         main()
     except KeyboardInterrupt:
         logging.info("exit sign checked")
-        disp = LCD_1inch28()
+        disp = hardware.create_lcd()
         disp.module_exit()
         sys.exit(0)
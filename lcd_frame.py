@@ -0,0 +1,60 @@
+import numpy as np
+
+# 1.28인치 원형 LCD 해상도 / writebytes2 가 없을 때 SPI 한 번에 보내는 바이트 수
+LCD_WIDTH = 240
+LCD_HEIGHT = 240
+SPI_CHUNK = 4096
+
+# RGB888 배열을 패널 형식(RGB565, big-endian) 두 바이트로 out 에 바로 채운다 (중간 배열 없음)
+def pack_rgb565(rgb, out, scratch):
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    hi, lo = out[..., 0], out[..., 1]
+    np.bitwise_and(r, 0xF8, out=hi)
+    np.right_shift(g, 5, out=scratch)
+    np.bitwise_or(hi, scratch, out=hi)
+    np.left_shift(g, 3, out=lo)
+    np.bitwise_and(lo, 0xE0, out=lo)
+    np.right_shift(b, 3, out=scratch)
+    np.bitwise_or(lo, scratch, out=lo)
+    return out
+
+class FrameConverter:
+    # 변환 버퍼를 한 번만 잡아 두고 프레임마다 재사용한다.
+    # convert() 결과는 다음 convert() 호출 전까지만 유효하다
+    def __init__(self, width=LCD_WIDTH, height=LCD_HEIGHT):
+        self.frame = np.empty((height, width, 2), dtype=np.uint8)
+        self.scratch = np.empty((height, width), dtype=np.uint8)
+
+    def convert(self, image):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return pack_rgb565(np.asarray(image), self.frame, self.scratch)
+
+# PIL RGB 이미지를 패널 형식 바이트열로 변환 (캐시에 보관할 독립 사본)
+def image_to_rgb565(image):
+    return FrameConverter(*image.size).convert(image).tobytes()
+
+# 연속된 버퍼(bytes, bytearray, C-연속 ndarray)를 SPI 로 전송.
+# spidev 의 writebytes2 는 버퍼를 그대로 받아 나눠 보내므로 파이썬 리스트를 만들지 않는다
+def spi_write(disp, data):
+    writebytes2 = getattr(getattr(disp, "SPI", None), "writebytes2", None)
+    if writebytes2 is not None:
+        writebytes2(data)
+        return
+    view = memoryview(data).cast("B")
+    for i in range(0, len(view), SPI_CHUNK):
+        disp.spi_writebyte(list(view[i:i + SPI_CHUNK]))
+
+# 화면의 (x0, y0)-(x1, y1) 사각형(끝은 미포함)에 RGB565 데이터를 전송
+def show_window(disp, x0, y0, x1, y1, data):
+    disp.SetWindows(x0, y0, x1, y1)
+    disp.digital_write(disp.DC_PIN, True)
+    spi_write(disp, data)
+
+# 미리 변환된 RGB565 프레임을 ShowImage 의 변환 과정 없이 바로 전송
+def show_frame(disp, frame):
+    show_window(disp, 0, 0, LCD_WIDTH, LCD_HEIGHT, frame)
+
+# disp.ShowImage 대용: 재사용 버퍼로 변환해 리스트 변환 없이 전송
+def show_image(disp, image, converter):
+    show_frame(disp, converter.convert(image))
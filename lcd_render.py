@@ -0,0 +1,228 @@
+import os
+import time
+import math
+import threading
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+import metrics
+from lcd_frame import LCD_WIDTH, LCD_HEIGHT, show_window
+
+# 패널이 받아낼 수 있는 최대 갱신 횟수 (SPI 전체 프레임 기준 약 10fps)
+LCD_MAX_FPS = 10
+FONT_PATH = os.environ.get("ROUTINE_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+FONT_SIZE = 30
+# 진행 링: 원형 화면 가장자리의 띠 (중심에서의 반지름, 픽셀)
+RING_INNER = 111
+RING_OUTER = 119
+# 남은 시간 글자 영역 (아이콘을 똑바로 본 좌표, 끝은 미포함)
+TEXT_BOX = (60, 168, 180, 204)
+
+RING_COLOR = (255, 140, 0)
+TRACK_COLOR = (40, 40, 40)
+TEXT_COLOR = (255, 255, 255)
+TEXT_BACKGROUND = (0, 0, 0)
+
+# (r, g, b) → 패널 형식 2바이트 (RGB565, big-endian)
+def rgb565(color):
+    r, g, b = color
+    value = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+    return np.array([value >> 8, value & 0xFF], dtype=np.uint8)
+
+# 회색조 글자 마스크 → 배경/글자색 사이 보간 색 (안티에일리어싱 유지)
+def text_palette(foreground, background):
+    levels = np.arange(256) / 255.0
+    return np.stack([
+        rgb565(tuple(int(b + (f - b) * level) for f, b in zip(foreground, background)))
+        for level in levels
+    ])
+
+# 아이콘과 같은 방향(PIL rotate = 반시계 90도 단위)으로 사각형을 돌린다
+def rotate_rect(rect, angle, size=LCD_WIDTH):
+    x0, y0, x1, y1 = rect
+    for _ in range((angle // 90) % 4):
+        x0, y0, x1, y1 = y0, size - x1, y1, size - x0
+    return x0, y0, x1, y1
+
+def rotate_points(ys, xs, angle, size=LCD_WIDTH):
+    for _ in range((angle // 90) % 4):
+        ys, xs = size - 1 - xs, ys
+    return ys, xs
+
+def ring_points():
+    # 12시 방향부터 시계 방향 순으로 정렬한 링 픽셀 좌표
+    ys, xs = np.mgrid[0:LCD_HEIGHT, 0:LCD_WIDTH]
+    dx = xs - (LCD_WIDTH - 1) / 2
+    dy = ys - (LCD_HEIGHT - 1) / 2
+    radius = np.hypot(dx, dy)
+    mask = (radius >= RING_INNER) & (radius <= RING_OUTER + 0.5)
+    angles = np.arctan2(dx[mask], -dy[mask]) % (2 * math.pi)
+    order = np.argsort(angles, kind="stable")
+    return ys[mask][order], xs[mask][order]
+
+def load_font():
+    try:
+        return ImageFont.truetype(FONT_PATH, FONT_SIZE)
+    except OSError:
+        try:
+            return ImageFont.load_default(FONT_SIZE)
+        except TypeError:
+            return ImageFont.load_default()
+
+def format_remaining(seconds):
+    seconds = max(int(math.ceil(seconds)), 0)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+class LcdRenderer:
+    # 아이콘 + 진행 링 + 남은 시간 글자를 미리 잡아 둔 버퍼에 합성하고,
+    # 패널에 이미 있는 내용과 달라진 사각형만 SetWindows 로 잘라 보낸다
+    def __init__(self, disp, max_fps=LCD_MAX_FPS):
+        self.disp = disp
+        self.min_interval = 1 / max_fps
+        self.lock = threading.Lock()
+        self.back = np.zeros((LCD_HEIGHT, LCD_WIDTH, 2), dtype=np.uint8)
+        self.front = np.zeros_like(self.back)
+        # 부분 창을 SPI 로 보내기 전에 연속 메모리로 모으는 버퍼
+        self.scratch = np.empty(self.back.size, dtype=np.uint8)
+        # 다른 코드가 패널에 직접 그린 뒤에는 패널 내용을 알 수 없으므로 전체를 보낸다
+        self.front_valid = False
+        self.dirty = []
+        self.last_flush = 0.0
+
+        self.base = np.zeros_like(self.back)
+        self.frame = None
+        self.angle = 0
+        self.ring_ys, self.ring_xs = ring_points()
+        self.rings = {}
+        self.filled = None
+        self.text = None
+        self.font = load_font()
+        x0, y0, x1, y1 = TEXT_BOX
+        self.text_image = Image.new("L", (x1 - x0, y1 - y0))
+        self.text_draw = ImageDraw.Draw(self.text_image)
+        self.text_palette = text_palette(TEXT_COLOR, TEXT_BACKGROUND)
+        self.ring_color = rgb565(RING_COLOR)
+        self.track_color = rgb565(TRACK_COLOR)
+
+    def ring(self):
+        points = self.rings.get(self.angle)
+        if points is None:
+            points = self.rings[self.angle] = rotate_points(self.ring_ys, self.ring_xs, self.angle)
+        return points
+
+    def mark(self, ys, xs):
+        if len(ys):
+            self.dirty.append((int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1))
+
+    # ------------------ 레이어 ------------------ #
+    def set_icon(self, frame, angle):
+        if frame is self.frame and angle == self.angle:
+            return
+        self.frame = frame
+        self.angle = angle
+        self.base[:] = np.frombuffer(frame, dtype=np.uint8).reshape(self.base.shape)
+        self.back[:] = self.base
+        self.dirty.append((0, 0, LCD_WIDTH, LCD_HEIGHT))
+        # 아이콘이 바뀌면 위에 있던 링/글자를 다시 그린다
+        filled, text = self.filled, self.text
+        self.filled = self.text = None
+        self.set_filled(filled)
+        self.set_text(text)
+
+    def set_progress(self, fraction):
+        if fraction is None:
+            self.set_filled(None)
+        else:
+            self.set_filled(int(round(min(max(fraction, 0.0), 1.0) * len(self.ring_ys))))
+
+    def set_filled(self, filled):
+        if filled == self.filled:
+            return
+        ys, xs = self.ring()
+        if filled is None:
+            self.back[ys, xs] = self.base[ys, xs]
+            self.mark(ys, xs)
+        elif self.filled is None:
+            self.back[ys[:filled], xs[:filled]] = self.ring_color
+            self.back[ys[filled:], xs[filled:]] = self.track_color
+            self.mark(ys, xs)
+        else:
+            # 늘거나 줄어든 호 부분만 다시 칠한다
+            lo, hi = sorted((self.filled, filled))
+            color = self.ring_color if filled > self.filled else self.track_color
+            self.back[ys[lo:hi], xs[lo:hi]] = color
+            self.mark(ys[lo:hi], xs[lo:hi])
+        self.filled = filled
+
+    def set_text(self, text):
+        if text == self.text:
+            return
+        x0, y0, x1, y1 = rotate_rect(TEXT_BOX, self.angle)
+        if text is None:
+            self.back[y0:y1, x0:x1] = self.base[y0:y1, x0:x1]
+        else:
+            width, height = self.text_image.size
+            self.text_draw.rectangle((0, 0, width, height), fill=0)
+            self.text_draw.text((width / 2, height / 2), text, fill=255, font=self.font, anchor="mm")
+            tile = self.text_palette[np.asarray(self.text_image)]
+            self.back[y0:y1, x0:x1] = np.rot90(tile, (self.angle // 90) % 4)
+        self.dirty.append((x0, y0, x1, y1))
+        self.text = text
+
+    # ------------------ 전송 ------------------ #
+    def flush(self):
+        # 최대 fps 를 넘지 않도록 다음 전송 시점까지 기다린 뒤 바뀐 사각형만 보낸다
+        if not self.dirty and self.front_valid:
+            return 0
+        wait = self.last_flush + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        start = time.perf_counter()
+        sent = 0
+        if not self.front_valid:
+            self.dirty = [(0, 0, LCD_WIDTH, LCD_HEIGHT)]
+            self.front[:] = ~self.back[:]  # 전체가 달라진 것으로 취급
+        for x0, y0, x1, y1 in self.dirty:
+            changed = np.any(self.back[y0:y1, x0:x1] != self.front[y0:y1, x0:x1], axis=2)
+            rows = np.flatnonzero(changed.any(axis=1))
+            if not len(rows):
+                continue  # 겹친 사각형이 이미 보냈거나 실제로 바뀐 픽셀이 없음
+            cols = np.flatnonzero(changed.any(axis=0))
+            top, bottom = y0 + rows[0], y0 + rows[-1] + 1
+            left, right = x0 + cols[0], x0 + cols[-1] + 1
+            window = self.back[top:bottom, left:right]
+            packed = self.scratch[:window.size].reshape(window.shape)
+            np.copyto(packed, window)
+            show_window(self.disp, left, top, right, bottom, packed)
+            self.front[top:bottom, left:right] = window
+            sent += window.nbytes
+        self.dirty = []
+        self.front_valid = True
+        self.last_flush = time.monotonic()
+        if sent:
+            metrics.incr("lcd.bytes", sent)
+            metrics.observe("lcd.flush", time.perf_counter() - start)
+        return sent
+
+    def show(self, frame, angle=90, progress=None, text=None):
+        with self.lock:
+            self.set_icon(frame, angle)
+            self.set_progress(progress)
+            self.set_text(text)
+            return self.flush()
+
+    def update(self, progress=None, text=None):
+        with self.lock:
+            self.set_progress(progress)
+            self.set_text(text)
+            return self.flush()
+
+    def clear(self):
+        with self.lock:
+            self.disp.clear()
+            self.front_valid = False
+            self.dirty = []
+            self.frame = self.filled = self.text = None
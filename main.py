@@ -1,21 +1,17 @@
-from multiprocessing import Process
-from ble_receiver import receive_bluetooth_data
-from routine_runner import run_routine_loop
+import os
 import logging
+import hardware
+import runtime
 
 logging.basicConfig(level=logging.INFO)
 
 if __name__ == "__main__":
     try:
-        logging.info("[MAIN] proccess start")
-        p1 = Process(target=receive_bluetooth_data)
-        p2 = Process(target=run_routine_loop)
-
-        p1.start()
-        p2.start()
-
-        p1.join()
-        p2.join()
+        logging.info("[MAIN] runtime start")
+        # BLE 수신, 스케줄러, 버튼 입력, 모터, 송신을 한 프로세스에서 실행
+        runtime.main()
 
     except KeyboardInterrupt:
         logging.info("[MAIN] Manual shutdown requested")
+        hardware.create_lcd().module_exit()
+        os._exit(0)
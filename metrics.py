@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+import bisect
+import socket
+import logging
+import threading
+from contextlib import contextmanager
+
+# 스냅샷 파일과 조회용 Unix 소켓을 둘 위치 (SD 카드 쓰기를 줄이려면 tmpfs 경로를 쓴다)
+METRICS_DIR = os.environ.get("ROUTINE_METRICS_DIR", "/tmp/routine_metrics")
+# 스냅샷 파일 갱신 주기(초). 값이 바뀌지 않았으면 쓰지 않는다
+SNAPSHOT_INTERVAL = 60
+# 같은 키의 샘플링 로그는 이 간격에 한 번만 남긴다(초)
+LOG_SAMPLE_INTERVAL = 60
+
+# 히스토그램 버킷 상한(초): 모터 스텝 지터(µs)부터 루틴 지각(분)까지 담는다
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05,
+    0.1, 0.5, 1, 5, 30, 60, 300,
+)
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # 버킷 상한으로 어림한 분위수 (마지막 버킷은 관측 최댓값)
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+class Metrics:
+    # 프로세스 안의 카운터/히스토그램 모음. 핫패스에서는 잠금 한 번과 덧셈만 한다
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self.updates = 0
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            self.updates += 1
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+            self.updates += 1
+
+    def observe_many(self, name, values):
+        if not values:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            for value in values:
+                histogram.observe(value)
+            self.updates += 1
+
+    @contextmanager
+    def timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "time": time.time(),
+                "uptime": time.time() - self.started,
+                "counters": dict(self.counters),
+                "histograms": {name: h.snapshot() for name, h in self.histograms.items()},
+            }
+
+_metrics = Metrics()
+
+def get_metrics():
+    return _metrics
+
+def incr(name, value=1):
+    _metrics.incr(name, value)
+
+def observe(name, value):
+    _metrics.observe(name, value)
+
+def observe_many(name, values):
+    _metrics.observe_many(name, values)
+
+def timed(name):
+    return _metrics.timed(name)
+
+def snapshot():
+    return _metrics.snapshot()
+
+# ------------------ 샘플링 로그 ------------------ #
+_log_samples = {}
+
+def log_sampled(key, message, level=logging.DEBUG, interval=LOG_SAMPLE_INTERVAL):
+    # 폴링마다 찍히던 로그용: 키마다 interval 에 한 번만 남기고 생략한 횟수를 붙인다
+    if not logging.getLogger().isEnabledFor(level):
+        return
+    now = time.monotonic()
+    last, skipped = _log_samples.get(key, (None, 0))
+    if last is not None and now - last < interval:
+        _log_samples[key] = (last, skipped + 1)
+        return
+    _log_samples[key] = (now, 0)
+    logging.log(level, f"{message} (+{skipped}건 생략)" if skipped else message)
+
+# ------------------ 내보내기 ------------------ #
+def socket_path(name):
+    return os.path.join(METRICS_DIR, f"{name}.sock")
+
+def snapshot_path(name):
+    return os.path.join(METRICS_DIR, f"{name}.json")
+
+def write_snapshot(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+class MetricsExporter(threading.Thread):
+    # Unix 소켓에 접속하면 현재 스냅샷(JSON 한 줄)을 돌려주고,
+    # SNAPSHOT_INTERVAL 마다 값이 바뀌었으면 스냅샷 파일을 갱신한다
+    def __init__(self, name, metrics=None, interval=SNAPSHOT_INTERVAL):
+        super().__init__(daemon=True)
+        self.name = name
+        self.metrics = metrics or _metrics
+        self.interval = interval
+        self.written = -1
+
+    def serve(self):
+        path = socket_path(self.name)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(4)
+        while True:
+            client, _ = server.accept()
+            try:
+                client.sendall(json.dumps(self.metrics.snapshot()).encode("utf-8") + b"\n")
+            except OSError:
+                pass
+            finally:
+                client.close()
+
+    def flush(self):
+        if self.metrics.updates == self.written:
+            return
+        self.written = self.metrics.updates
+        try:
+            write_snapshot(snapshot_path(self.name), self.metrics.snapshot())
+        except OSError as e:
+            logging.warning(f"[METRICS] 스냅샷 저장 실패: {e}")
+
+    def run(self):
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        threading.Thread(target=self.serve, daemon=True).start()
+        logging.info(f"[METRICS] 조회 소켓: {socket_path(self.name)}")
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+_exporters = {}
+
+def start_exporter(name):
+    exporter = _exporters.get(name)
+    if exporter is None:
+        exporter = _exporters[name] = MetricsExporter(name)
+        exporter.start()
+    return exporter
+
+def read_metrics(name):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path(name))
+    with client, client.makefile("rb") as f:
+        return json.loads(f.readline())
+
+if __name__ == "__main__":
+    # python metrics.py runner|receiver → 실행 중인 프로세스의 지표 출력
+    print(json.dumps(read_metrics(sys.argv[1] if len(sys.argv) > 1 else "runner"), indent=2))
@@ -0,0 +1,94 @@
+import os
+import json
+import math
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+# 정책 설정 파일 (없으면 기본 정책만 사용)
+#   {"default": {"action": "compress", "grace_seconds": 120},
+#    "groups": {"아침 루틴": {"action": "skip"}, "운동": {"action": "run_late", "late_limit_minutes": 30}}}
+POLICY_PATH = os.environ.get("ROUTINE_POLICY_PATH", "/home/pi/LCD_final/routine_policy.json")
+
+# action
+#   skip     : 유예 시간이 지나면 건너뜀으로 기록
+#   compress : 원래 끝나는 시각까지 남은 시간만큼만 실행 (다 지났으면 건너뜀)
+#   run_late : late_limit_minutes 안이면 원래 길이대로 늦게 실행
+ACTIONS = ("skip", "compress", "run_late")
+DEFAULT_ACTION = "compress"
+# 이 시간 안의 지연은 정상 시작으로 본다(초)
+GRACE_SECONDS = 120
+RUN_LATE_LIMIT_MINUTES = 60
+# 압축 후 남은 시간이 이보다 짧으면 실행하지 않는다(초)
+MIN_RUN_SECONDS = 60
+
+Policy = namedtuple("Policy", "action grace_seconds late_limit_minutes")
+# action: "run" 또는 "skip", minutes: 실행할 길이(분)
+Decision = namedtuple("Decision", "routine start action minutes reason")
+
+DEFAULT_POLICY = Policy(DEFAULT_ACTION, GRACE_SECONDS, RUN_LATE_LIMIT_MINUTES)
+
+def make_policy(config, base=DEFAULT_POLICY):
+    policy = base._replace(**{k: v for k, v in config.items() if k in Policy._fields})
+    if policy.action not in ACTIONS:
+        raise ValueError(f"unknown missed-routine action: {policy.action}")
+    return policy
+
+class MissedRoutinePolicy:
+    # 예정 시각이 지난 루틴을 그룹별 정책으로 실행/건너뜀 판정한다.
+    # 여러 개가 한꺼번에 밀려 있으면(재부팅, 긴 타이머 뒤) 한 번에 판정해서
+    # 같은 그룹에서 늦게 실행되는 루틴은 가장 최근 것 하나만 남긴다
+    def __init__(self, default=DEFAULT_POLICY, groups=None):
+        self.default = default
+        self.groups = groups or {}
+
+    @classmethod
+    def load(cls, path=POLICY_PATH):
+        try:
+            with open(path) as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError) as e:
+            logging.error(f"[POLICY] 설정 파일 오류, 기본 정책 사용: {e}")
+            return cls()
+        try:
+            default = make_policy(config.get("default", {}))
+            groups = {name: make_policy(group, default) for name, group in config.get("groups", {}).items()}
+        except (TypeError, ValueError) as e:
+            logging.error(f"[POLICY] 정책 값 오류, 기본 정책 사용: {e}")
+            return cls()
+        return cls(default, groups)
+
+    def policy_for(self, group):
+        return self.groups.get(group, self.default)
+
+    def decide(self, routine, start, now):
+        minutes = routine[3]
+        policy = self.policy_for(routine[5])
+        late = (now - start).total_seconds()
+        if late <= policy.grace_seconds:
+            return Decision(routine, start, "run", minutes, "on_time")
+        if policy.action == "compress":
+            left = (start + timedelta(minutes=minutes) - now).total_seconds()
+            if left >= MIN_RUN_SECONDS:
+                return Decision(routine, start, "run", math.ceil(left / 60), "compressed")
+            return Decision(routine, start, "skip", 0, "window_passed")
+        if policy.action == "run_late" and late <= policy.late_limit_minutes * 60:
+            return Decision(routine, start, "run", minutes, "late")
+        return Decision(routine, start, "skip", 0, "missed")
+
+    def resolve(self, due, now):
+        # due: [(start, routine)] → 시작 시각 순 판정 목록
+        decisions = [self.decide(routine, start, now) for start, routine in sorted(due, key=lambda d: d[0])]
+        latest_late = {}
+        for decision in decisions:
+            if decision.action == "run" and decision.reason != "on_time":
+                latest_late[decision.routine[5]] = decision.routine[0]
+        resolved = []
+        for decision in decisions:
+            if (decision.action == "run" and decision.reason != "on_time"
+                    and latest_late[decision.routine[5]] != decision.routine[0]):
+                decision = decision._replace(action="skip", minutes=0, reason="superseded")
+            resolved.append(decision)
+        return resolved
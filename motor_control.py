@@ -1,5 +1,8 @@
-import RPi.GPIO as GPIO
 import time
+import logging
+import threading
+import hardware
+import metrics
 
 # 핀 설정
 in1, in2, in3, in4 = 12, 16, 20, 21
@@ -20,56 +23,286 @@ steps_per_rotation = 4076
 step_sleep_fast = 0.001
 step_sleep_reverse = 0.001
 
+# 워커가 한 번에 구동하는 최대 스텝 수 (목표 변경/정지가 반영되는 단위)
+MOTOR_CHUNK_STEPS = 256
+# pigpio 웨이브 구동 중 종료/취소를 확인하는 간격(초)
+WAVE_POLL_INTERVAL = 0.002
+
+# 반스텝 시퀀스를 pigpio 용 핀 비트마스크(켜질 핀, 꺼질 핀)로 미리 계산
+ALL_PINS_MASK = sum(1 << pin for pin in motor_pins)
+step_masks = []
+for seq in step_sequence:
+    on_mask = sum(1 << pin for pin, val in zip(motor_pins, seq) if val)
+    step_masks.append((on_mask, ALL_PINS_MASK & ~on_mask))
+
 motor_step_counter = 0
+GPIO = None
 
-# GPIO 초기화
-GPIO.setmode(GPIO.BCM)
-for pin in motor_pins:
-    GPIO.setup(pin, GPIO.OUT)
-    GPIO.output(pin, GPIO.LOW)
+# GPIO 초기화 (모터를 처음 쓸 때 한 번)
+def init_motor_pins():
+    global GPIO
+    if GPIO is None:
+        GPIO = hardware.gpio()
+        GPIO.setmode(GPIO.BCM)
+        for pin in motor_pins:
+            GPIO.setup(pin, GPIO.OUT)
+            GPIO.output(pin, GPIO.LOW)
+    return GPIO
 
 def cleanup_motor():
+    global GPIO
+    if GPIO is None:
+        return
     for pin in motor_pins:
         GPIO.output(pin, GPIO.LOW)
     GPIO.cleanup()
+    GPIO = None
+
+# 방향: forward 는 시퀀스를 거꾸로(-1), backward 는 정방향(+1)으로 진행
+def phase_direction(steps):
+    return -1 if steps > 0 else 1
+
+class GpioStepper:
+    # pigpio 가 없을 때: 절대 마감 시각 기준으로 잠들어 지연이 누적되지 않게 구동
+    def __init__(self):
+        init_motor_pins()
+
+    def drive(self, phase, steps, step_delay, cancelled):
+        direction = phase_direction(steps)
+        deadline = time.perf_counter()
+        # 스텝마다 예정 시각보다 늦은 정도(지터)를 모아 구동이 끝날 때 한 번에 기록
+        jitter = []
+        try:
+            for done in range(abs(steps)):
+                if cancelled():
+                    return phase, done
+                phase = (phase + direction) % 8
+                GPIO.output(motor_pins, step_sequence[phase])
+                jitter.append(time.perf_counter() - deadline)
+                deadline += step_delay
+                remaining = deadline - time.perf_counter()
+                if remaining > 0:
+                    time.sleep(remaining)
+            return phase, abs(steps)
+        finally:
+            metrics.observe_many("motor.step_jitter", jitter)
+            metrics.incr("motor.steps", len(jitter))
+
+class PigpioStepper:
+    # pigpiod 의 DMA 웨이브 체인으로 스텝 타이밍을 하드웨어에 맡긴다
+    def __init__(self, pigpio, pi):
+        self.pigpio = pigpio
+        self.pi = pi
+        self.waves = {}
+        for pin in motor_pins:
+            pi.set_mode(pin, pigpio.OUTPUT)
+
+    def wave(self, phase, direction, count, step_delay):
+        key = (phase, direction, count, step_delay)
+        wid = self.waves.get(key)
+        if wid is None:
+            delay_us = int(step_delay * 1_000_000)
+            pulses = []
+            for _ in range(count):
+                phase = (phase + direction) % 8
+                on_mask, off_mask = step_masks[phase]
+                pulses.append(self.pigpio.pulse(on_mask, off_mask, delay_us))
+            self.pi.wave_add_generic(pulses)
+            wid = self.waves[key] = self.pi.wave_create()
+        return wid
+
+    def drive(self, phase, steps, step_delay, cancelled):
+        direction = phase_direction(steps)
+        loops, rest = divmod(abs(steps), 8)
+        chain = []
+        if loops:
+            chain += [255, 0, self.wave(phase, direction, 8, step_delay), 255, 1, loops % 256, loops // 256]
+        if rest:
+            chain.append(self.wave(phase, direction, rest, step_delay))
+        self.pi.wave_chain(chain)
+        started = time.perf_counter()
+        # 끝날 때까지 짧게 폴링하며 목표 변경을 확인한다 (GpioStepper 와 같은 단위로 멈출 수 있게)
+        while self.pi.wave_tx_busy():
+            if cancelled():
+                return self.stop(phase, direction, abs(steps), step_delay, started)
+            time.sleep(WAVE_POLL_INTERVAL)
+        return (phase + direction * abs(steps)) % 8, abs(steps)
+
+    def stop(self, phase, direction, steps, step_delay, started):
+        # 웨이브는 진행 위치를 알려주지 않으므로 지난 시간으로 간 스텝 수를 어림하고,
+        # 코일을 그 위상으로 맞춰 두어 다음 구동이 기록된 위상에서 이어지게 한다 (오차는 1스텝 이내)
+        self.pi.wave_tx_stop()
+        done = min(int((time.perf_counter() - started) / step_delay), steps)
+        phase = (phase + direction * done) % 8
+        on_mask, off_mask = step_masks[phase]
+        self.pi.clear_bank_1(off_mask)
+        self.pi.set_bank_1(on_mask)
+        return phase, done
+
+def create_stepper():
+    pigpio = hardware.pigpio()
+    if pigpio is not None:
+        pi = pigpio.pi()
+        if pi.connected:
+            logging.info("[MOTOR] pigpio 웨이브 구동 사용")
+            return PigpioStepper(pigpio, pi)
+    logging.info("[MOTOR] GPIO 마감 시각 구동 사용")
+    return GpioStepper()
+
+class MotorEngine:
+    # 목표 위치만 받고 바로 반환한다. 실제 스텝 구동은 전용 워커 스레드가 맡는다.
+    # position 은 forward 방향으로 감긴 절대 스텝 수
+    def __init__(self, stepper=None, step_delay=step_sleep_fast):
+        self.stepper = stepper or create_stepper()
+        self.step_delay = step_delay
+        self.position = 0
+        self.target = 0
+        self.phase = motor_step_counter
+        self.cond = threading.Condition()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def move_to(self, target, step_delay=None):
+        with self.cond:
+            self.target = int(target)
+            if step_delay is not None:
+                self.step_delay = step_delay
+            self.cond.notify_all()
+
+    def move_by(self, steps, step_delay=None):
+        with self.cond:
+            self.move_to(self.target + steps, step_delay)
+
+    def stop(self):
+        with self.cond:
+            self.target = self.position
+            self.cond.notify_all()
+
+    def is_idle(self):
+        with self.cond:
+            return self.position == self.target
+
+    def wait_idle(self, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(lambda: self.position == self.target, timeout)
+
+    def snapshot(self):
+        # 체크포인트용: 청크 단위로 반영된 절대 위치와 코일 위상
+        with self.cond:
+            return {"position": self.position, "phase": self.phase}
+
+    def restore(self, position, phase=None):
+        # 재부팅 뒤 모터는 전원이 꺼졌던 자리에 그대로 있다 → 그 위치를 현재 위치로 삼는다
+        global motor_step_counter
+        with self.cond:
+            self.position = self.target = int(position)
+            if phase is not None:
+                self.phase = motor_step_counter = int(phase) % 8
+            self.cond.notify_all()
+
+    def run(self):
+        global motor_step_counter
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.position != self.target)
+                remaining = self.target - self.position
+                steps = max(-MOTOR_CHUNK_STEPS, min(MOTOR_CHUNK_STEPS, remaining))
+                step_delay = self.step_delay
+                target = self.target
+
+            # 구동 중 목표가 바뀌면 남은 스텝을 멈추고 새 목표 기준으로 다시 계산한다
+            def cancelled():
+                return self.target != target
+
+            try:
+                self.phase, done = self.stepper.drive(self.phase, steps, step_delay, cancelled)
+            except Exception as e:
+                logging.error(f"[MOTOR] 구동 오류: {e}")
+                with self.cond:
+                    self.target = self.position
+                    self.cond.notify_all()
+                continue
+
+            with self.cond:
+                self.position += done if steps > 0 else -done
+                motor_step_counter = self.phase
+                self.cond.notify_all()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_motor_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = MotorEngine()
+        return _engine
 
 def move_motor(steps, direction, step_delay):
-    global motor_step_counter
-    for _ in range(steps):
-        seq = step_sequence[motor_step_counter]
-        for pin, val in zip(motor_pins, seq):
-            GPIO.output(pin, val)
-        if direction == "forward":
-            motor_step_counter = (motor_step_counter - 1) % 8
-        elif direction == "backward":
-            motor_step_counter = (motor_step_counter + 1) % 8
-        time.sleep(step_delay)
-
-def run_motor_routine(total_minutes):
-    total_degrees = min(total_minutes * 6, 360)
-    total_steps = int((total_degrees / 360) * steps_per_rotation)
-    steps_per_minute = total_steps // min(total_minutes, 60)
-
-    move_motor(total_steps, "forward", step_sleep_fast)
-
-    if total_minutes > 60:
-        wait_time = total_minutes - 60
-        time.sleep(wait_time * 60)
-
-    for i in range(min(total_minutes, 60)):
-        time.sleep(60)
-        move_motor(steps_per_minute, "backward", step_sleep_reverse)
-
-def run_motor_timer(timer_minutes, rest, repeat_count):
-    total_degrees = timer_minutes * 6
-    total_steps = int((total_degrees / 360) * steps_per_rotation)
-    steps_per_minute = total_steps // timer_minutes
+    engine = get_motor_engine()
+    if direction == "forward":
+        engine.move_by(steps, step_delay)
+    elif direction == "backward":
+        engine.move_by(-steps, step_delay)
+    engine.wait_idle()
 
-    for i in range(repeat_count):
-        move_motor(total_steps, "forward", step_sleep_fast)
+# 다이얼 한 바퀴 = 60분 (1분당 6도)
+DIAL_FULL_SECONDS = 3600
+# 다이얼 목표 위치를 다시 계산하는 주기(초)
+DIAL_TICK_SECONDS = 1
+
+def dial_steps(remaining_seconds):
+    remaining_seconds = max(0, min(remaining_seconds, DIAL_FULL_SECONDS))
+    return round(remaining_seconds / DIAL_FULL_SECONDS * steps_per_rotation)
+
+class DialController:
+    # 다이얼 각도 = 남은 시간. 매 tick 마다 monotonic 경과 시간으로 절대 목표 위치를 계산하므로
+    # 정수 나눗셈 오차나 스텝 구동 시간이 누적되지 않는다
+    def __init__(self, engine=None, tick=DIAL_TICK_SECONDS):
+        self.engine = engine
+        self.tick = tick
+        self.cancel_event = threading.Event()
+        self.thread = None
+        self.home_on_cancel = True
+
+    def start(self, total_seconds):
+        # 이어서 다른 위치로 옮길 것이므로 원점으로 되돌리지 않고 멈춘다
+        self.cancel(home=False)
+        self.home_on_cancel = True
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, args=(total_seconds, self.cancel_event), daemon=True
+        )
+        self.thread.start()
 
-        for j in range(timer_minutes):
-            time.sleep(60)
-            move_motor(steps_per_minute, "backward", step_sleep_reverse)
+    def cancel(self, home=True):
+        self.home_on_cancel = home
+        self.cancel_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1)
+        self.thread = None
 
-        time.sleep(rest * 60)
+    def run(self, total_seconds, cancel_event):
+        engine = self.engine or get_motor_engine()
+        start = time.monotonic()
+        engine.move_to(dial_steps(total_seconds), step_sleep_fast)
+        while not cancel_event.wait(self.tick):
+            remaining = total_seconds - (time.monotonic() - start)
+            engine.move_to(dial_steps(remaining), step_sleep_reverse)
+            if remaining <= 0:
+                return
+        # 루틴이 일찍 끝나면 남은 각도만큼 바로 원점으로 되돌린다
+        if self.home_on_cancel:
+            engine.move_to(0, step_sleep_fast)
+
+def run_motor_routine(total_minutes, cancel_event=None):
+    dial = DialController()
+    dial.run(total_minutes * 60, cancel_event or threading.Event())
+
+def run_motor_timer(timer_minutes, rest, repeat_count, cancel_event=None):
+    cancel_event = cancel_event or threading.Event()
+    dial = DialController()
+    for i in range(repeat_count):
+        dial.run(timer_minutes * 60, cancel_event)
+        if cancel_event.wait(rest * 60):
+            return
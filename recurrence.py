@@ -0,0 +1,86 @@
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+# 반복 규칙 (RRULE 의 일부): "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE,FR;UNTIL=20261231;COUNT=30"
+FREQS = ("DAILY", "WEEKLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+# byday: 요일 번호(월=0) frozenset, until: date 또는 None, count: 횟수 또는 None
+Rule = namedtuple("Rule", "freq interval byday until count")
+
+def parse_date(value):
+    # "2026-10-16" / "20261016" / date
+    if isinstance(value, date):
+        return value
+    value = value.strip()
+    fmt = "%Y%m%d" if len(value) == 8 else "%Y-%m-%d"
+    return datetime.strptime(value, fmt).date()
+
+def parse_rrule(text):
+    fields = {}
+    for part in text.upper().split(";"):
+        if not part.strip():
+            continue
+        name, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"bad rrule part: {part}")
+        fields[name.strip()] = value.strip()
+    freq = fields.pop("FREQ", None)
+    if freq not in FREQS:
+        raise ValueError(f"unsupported rrule FREQ: {freq}")
+    interval = int(fields.pop("INTERVAL", 1))
+    if interval < 1:
+        raise ValueError(f"bad rrule INTERVAL: {interval}")
+    byday = frozenset()
+    if "BYDAY" in fields:
+        days = [day.strip() for day in fields.pop("BYDAY").split(",")]
+        if any(day not in WEEKDAYS for day in days):
+            raise ValueError(f"bad rrule BYDAY: {days}")
+        byday = frozenset(WEEKDAYS.index(day) for day in days)
+    until = parse_date(fields.pop("UNTIL")[:8]) if "UNTIL" in fields else None
+    count = int(fields.pop("COUNT")) if "COUNT" in fields else None
+    if fields:
+        raise ValueError(f"unsupported rrule parts: {', '.join(fields)}")
+    return Rule(freq, interval, byday, until, count)
+
+def count_weekdays(first_weekday, step, n, byday):
+    # first_weekday 부터 step 일 간격 n 번 중 byday 요일에 떨어지는 횟수 (요일은 7번마다 반복)
+    cycle = [(first_weekday + k * step) % 7 in byday for k in range(7)]
+    full, rest = divmod(n, 7)
+    return full * sum(cycle) + sum(cycle[:rest])
+
+def occurrence_index(rule, dtstart, day):
+    # day 가 몇 번째(0부터) 발생인지. 발생하지 않는 날이면 None
+    if day < dtstart or (rule.until is not None and day > rule.until):
+        return None
+    if rule.freq == "DAILY":
+        step, offset = divmod((day - dtstart).days, rule.interval)
+        if offset:
+            return None
+        if not rule.byday:
+            index = step
+        elif day.weekday() not in rule.byday:
+            return None
+        else:
+            index = count_weekdays(dtstart.weekday(), rule.interval, step, rule.byday)
+    else:
+        byday = rule.byday or frozenset((dtstart.weekday(),))
+        if day.weekday() not in byday:
+            return None
+        week, offset = divmod((day - dtstart).days + dtstart.weekday(), 7)
+        if week % rule.interval:
+            return None
+        # 지난 활성 주 × 주당 횟수 + 이번 주에서 앞선 요일 - 첫 주에서 dtstart 이전 요일
+        before_start = sum(1 for weekday in byday if weekday < dtstart.weekday())
+        index = (week // rule.interval) * len(byday) + sum(1 for weekday in byday if weekday < offset) - before_start
+    if rule.count is not None and index >= rule.count:
+        return None
+    return index
+
+def occurs_on(rule, dtstart, day, exdates=()):
+    # 예외 날짜(exdates)는 COUNT 에는 포함되고 발생만 빠진다 (RFC 5545 와 같다)
+    return occurrence_index(rule, dtstart, day) is not None and day not in exdates
+
+def occurrence_id(template_id, day):
+    # 템플릿에서 펼친 루틴의 id: 휴대폰이 주는 양수 id 와 겹치지 않는 음수, 같은 날이면 항상 같은 값
+    return -(template_id * 1_000_000 + day.toordinal())
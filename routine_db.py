@@ -0,0 +1,1013 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import metrics
+import recurrence
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# 절대 경로로 DB 위치 고정 (하드웨어 없이 실행할 때는 환경변수로 바꾼다)
+DB_PATH = os.environ.get("ROUTINE_DB_PATH", "/home/pi/LCD_final/routine_db.db")
+
+# 다른 프로세스가 쓰는 중이면 바로 실패하지 않고 기다리는 시간(ms)
+BUSY_TIMEOUT_MS = 5000
+# 연결마다 재사용할 prepared statement 개수
+STATEMENT_CACHE_SIZE = 64
+
+# routines.completed 값: 0 만 아직 처리되지 않은 루틴이고 나머지는 모두 결과가 확정된 상태
+ROUTINE_PENDING = 0
+ROUTINE_COMPLETED = 1
+# 놓친 루틴 정책으로 실행하지 않고 넘어간 루틴
+ROUTINE_SKIPPED = 2
+# 버튼2 로 실패 처리 / 시간 안에 누르지 않음
+ROUTINE_FAILED = 3
+ROUTINE_TIMEOUT = 4
+
+Routine = namedtuple("Routine", "id start_time icon routine_minutes routine_name group_routine_name")
+Timer = namedtuple("Timer", "id timer_minutes rest repeat_count icon")
+Template = namedtuple("Template", "id start_time routine_minutes icon routine_name group_routine_name rrule dtstart exdates")
+
+# ------------------ 스키마 마이그레이션 ------------------ #
+# 각 마이그레이션은 한 번만 적용되고, 적용된 버전은 PRAGMA user_version에 기록된다
+def _migrate_base_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS routines (
+            id INTEGER PRIMARY KEY,
+            date TEXT,
+            start_time TEXT,
+            routine_minutes INTEGER,
+            icon TEXT,
+            routine_name TEXT,
+            group_routine_name TEXT,
+            completed INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS timers (
+            id INTEGER PRIMARY KEY,
+            timer_minutes INTEGER,
+            rest INTEGER,
+            repeat_count INTEGER,
+            icon TEXT
+        )
+    """)
+
+def _migrate_indexes(conn):
+    # get_today_routines / 그룹 결과 보고 조회가 전체 스캔 없이 인덱스만 타도록
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_routines_date_completed_start
+        ON routines (date, completed, start_time)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_routines_date_group
+        ON routines (date, group_routine_name)
+    """)
+
+def _migrate_legacy_columns(conn):
+    # lcd_button / routine_timer 가 읽는 컬럼을 맞춘다.
+    # 시간/분 컬럼은 저장된 분 값에서 계산되는 가상 컬럼으로 추가한다
+    add_missing_columns(conn, "routines", [
+        ("duration_hours", "INTEGER GENERATED ALWAYS AS (routine_minutes / 60) VIRTUAL"),
+        ("duration_minutes", "INTEGER GENERATED ALWAYS AS (routine_minutes % 60) VIRTUAL"),
+    ])
+    add_missing_columns(conn, "timers", [
+        ("timer_name", "TEXT"),
+        ("completed", "INTEGER DEFAULT 0"),
+        ("duration_hours", "INTEGER GENERATED ALWAYS AS (timer_minutes / 60) VIRTUAL"),
+        ("duration_minutes", "INTEGER GENERATED ALWAYS AS (timer_minutes % 60) VIRTUAL"),
+    ])
+
+# 휴대폰과 동기화되는 컬럼 (completed 는 기기가 관리하므로 제외)
+ROUTINE_SYNC_COLUMNS = ("date", "start_time", "routine_minutes", "icon", "routine_name", "group_routine_name")
+TIMER_SYNC_COLUMNS = ("timer_minutes", "rest", "repeat_count", "icon")
+
+# guard: 동기화 버전을 올리지 않을 행을 거르는 WHEN 절 (마이그레이션 10)
+def _create_sync_triggers(conn, table, columns, guard="", delete_guard=""):
+    # 행이 바뀔 때마다 전역 버전을 올려 row_version 에 기록하고, 삭제는 tombstone 으로 남긴다
+    bump = f"""
+        UPDATE sync_state SET version = version + 1 WHERE id = 1;
+        UPDATE {table} SET row_version = (SELECT version FROM sync_state WHERE id = 1)
+        WHERE id = NEW.id;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_insert AFTER INSERT ON {table} {guard}
+        BEGIN
+            {bump}
+            DELETE FROM sync_tombstones WHERE table_name = '{table}' AND row_id = NEW.id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_update
+        AFTER UPDATE OF {", ".join(columns)} ON {table} {guard}
+        BEGIN
+            {bump}
+        END
+    """)
+    _create_sync_delete_trigger(conn, table, delete_guard)
+
+# guard: 보관(archive)으로 옮기는 삭제는 건너뛰도록 붙이는 WHEN 절 (마이그레이션 9)
+def _create_sync_delete_trigger(conn, table, guard=""):
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_delete AFTER DELETE ON {table} {guard}
+        BEGIN
+            UPDATE sync_state SET version = version + 1 WHERE id = 1;
+            INSERT OR REPLACE INTO sync_tombstones (table_name, row_id, version)
+            VALUES ('{table}', OLD.id, (SELECT version FROM sync_state WHERE id = 1));
+        END
+    """)
+
+def _migrate_sync_versions(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO sync_state (id, version) VALUES (1, 0)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_tombstones (
+            table_name TEXT,
+            row_id INTEGER,
+            version INTEGER,
+            PRIMARY KEY (table_name, row_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_devices (
+            device_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            synced_at TEXT
+        )
+    """)
+    for table in ("routines", "timers"):
+        add_missing_columns(conn, table, [("row_version", "INTEGER DEFAULT 0")])
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_row_version ON {table} (row_version)")
+    _create_sync_triggers(conn, "routines", ROUTINE_SYNC_COLUMNS + ("completed",))
+    _create_sync_triggers(conn, "timers", TIMER_SYNC_COLUMNS + ("completed",))
+
+def _migrate_ble_outbox(conn):
+    # 전화기가 없을 때도 그룹 결과 보고가 재부팅 후까지 남도록 보관하는 송신함
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ble_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payload TEXT NOT NULL,
+            created_at TEXT
+        )
+    """)
+
+# group_progress 의 상태별 카운터 컬럼
+GROUP_COUNTERS = (
+    ("pending", ROUTINE_PENDING),
+    ("completed", ROUTINE_COMPLETED),
+    ("skipped", ROUTINE_SKIPPED),
+    ("failed", ROUTINE_FAILED),
+    ("timeout", ROUTINE_TIMEOUT),
+)
+
+# 휴대폰으로 보내는 루틴 상태: completed 는 예전 계약대로 0/1(완료 여부)만 쓰고,
+# 건너뜀/실패/시간 초과 구분은 status 이름으로 따로 보낸다
+STATUS_NAMES = {status: name for name, status in GROUP_COUNTERS}
+
+def wire_status(status):
+    return {"completed": int(status == ROUTINE_COMPLETED), "status": STATUS_NAMES.get(status, "pending")}
+
+def _group_count_sql(row, sign):
+    # row(NEW/OLD) 하나만큼 그 날짜/그룹의 카운터를 더하거나 뺀다
+    counters = ", ".join(f"{name} = {name} {sign} ({row}.completed = {status})" for name, status in GROUP_COUNTERS)
+    reopen = ", reported_at = CASE WHEN NEW.completed = 0 THEN NULL ELSE reported_at END" if sign == "+" else ""
+    return f"""
+        UPDATE group_progress SET total = total {sign} 1, {counters}{reopen}
+        WHERE date = {row}.date AND group_name = {row}.group_routine_name;
+    """
+
+GROUP_DROP_EMPTY = "DELETE FROM group_progress WHERE total = 0;"
+
+def _create_group_delete_trigger(conn, guard=""):
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_routines_group_delete AFTER DELETE ON routines {guard}
+        BEGIN
+            {_group_count_sql("OLD", "-")}
+            {GROUP_DROP_EMPTY}
+        END
+    """)
+
+def _migrate_group_progress(conn):
+    # 그룹별 상태 카운터: 상태를 바꾸는 트랜잭션 안에서 트리거로 함께 갱신되므로
+    # 그룹이 끝났는지 알려고 그룹 전체를 다시 읽을 필요가 없다.
+    # reported_at 은 그룹 결과 보고를 송신함에 넣은 시각 (그룹당 한 번)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS group_progress (
+            date TEXT,
+            group_name TEXT,
+            total INTEGER NOT NULL DEFAULT 0,
+            {", ".join(f"{name} INTEGER NOT NULL DEFAULT 0" for name, _ in GROUP_COUNTERS)},
+            reported_at TEXT,
+            PRIMARY KEY (date, group_name)
+        )
+    """)
+    ensure_group = """
+        INSERT INTO group_progress (date, group_name) VALUES (NEW.date, NEW.group_routine_name)
+        ON CONFLICT(date, group_name) DO NOTHING;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_routines_group_insert AFTER INSERT ON routines
+        BEGIN
+            {ensure_group}
+            {_group_count_sql("NEW", "+")}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_routines_group_update
+        AFTER UPDATE OF date, group_routine_name, completed ON routines
+        BEGIN
+            {_group_count_sql("OLD", "-")}
+            {ensure_group}
+            {_group_count_sql("NEW", "+")}
+            {GROUP_DROP_EMPTY}
+        END
+    """)
+    _create_group_delete_trigger(conn)
+    # 이미 있는 루틴으로 채운다. 지난 날짜의 끝난 그룹은 다시 보고하지 않는다
+    conn.execute(f"""
+        INSERT INTO group_progress (date, group_name, total, {", ".join(name for name, _ in GROUP_COUNTERS)}, reported_at)
+        SELECT date, group_routine_name, COUNT(*),
+               {", ".join(f"SUM(completed = {status})" for _, status in GROUP_COUNTERS)},
+               CASE WHEN SUM(completed = 0) = 0 THEN strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime') END
+        FROM routines
+        GROUP BY date, group_routine_name
+    """)
+
+# 통계 테이블: 범위(scope) → (테이블, 키 컬럼, routines 의 원본 컬럼)
+STATS_TABLES = {
+    "day": ("stats_daily", "date", "date"),
+    "group": ("stats_group", "group_name", "group_routine_name"),
+    "name": ("stats_name", "routine_name", "routine_name"),
+}
+# 결과가 확정된 루틴만 센다 (total = 확정된 루틴 수). 지각은 시작 시각이 기록된 루틴만
+STATS_COLUMNS = ("total", "completed", "skipped", "failed", "timeout", "late_total", "late_count")
+
+def _stats_count_sql(table, key, column, row, sign):
+    resolved = f"({row}.completed != 0)"
+    counters = ", ".join(
+        f"{name} = {name} {sign} ({row}.completed = {status})"
+        for name, status in GROUP_COUNTERS if status != ROUTINE_PENDING
+    )
+    return f"""
+        UPDATE {table} SET total = total {sign} {resolved}, {counters},
+            late_total = late_total {sign} (CASE WHEN {resolved} THEN COALESCE({row}.late_seconds, 0) ELSE 0 END),
+            late_count = late_count {sign} ({resolved} AND {row}.late_seconds IS NOT NULL)
+        WHERE {key} = {row}.{column};
+    """
+
+def _stats_ensure_sql(table, key, column):
+    return f"""
+        INSERT INTO {table} ({key}) SELECT NEW.{column} WHERE NEW.completed != 0
+        ON CONFLICT({key}) DO NOTHING;
+    """
+
+def count_streak(rows):
+    # rows: 최근 날짜부터 (date, 성공 여부). 처음 실패한 날 앞까지 센다
+    current, last_date = 0, None
+    for date, success in rows:
+        last_date = last_date or date
+        if not success:
+            break
+        current += 1
+    return current, last_date
+
+def save_streak(conn, scope, key, current, last_date):
+    conn.execute("""
+        INSERT INTO stats_streaks (scope, key, current, best, last_date) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(scope, key) DO UPDATE SET
+            current = excluded.current, best = MAX(best, excluded.current), last_date = excluded.last_date
+    """, (scope, key, current, current, last_date))
+
+def advance_streak(conn, scope, key, date, success, previous):
+    # 저장된 연속 기록(current, last_date)에 끝난 하루를 잇는다.
+    # previous: 이 범위에서 date 바로 앞의 기록이 있는 날 (그날이 last_date 면 이어진다)
+    row = conn.execute(
+        "SELECT current, last_date FROM stats_streaks WHERE scope = ? AND key = ?", (scope, key)
+    ).fetchone()
+    current, last_date = row if row else (0, None)
+    if last_date is not None and date < last_date:
+        # 더 최근 날이 이미 반영됐다: 늦게 끝난 지난 날은 현재 연속 기록을 바꾸지 않는다
+        return
+    if date == last_date:
+        # 같은 날을 다시 끝낸 경우 (그날 루틴이 나중에 추가됨): 성공/실패만 다시 반영
+        current = max(current, 1) if success else 0
+    elif not success:
+        current = 0
+    elif last_date is not None and last_date == previous:
+        current += 1
+    else:
+        current = 1
+    save_streak(conn, scope, key, current, date)
+
+def refresh_streaks(conn, date, group_name):
+    # 그룹의 하루가 끝났을 때(보고 시점)만 부른다. 지난 기록을 다시 세지 않고 하루씩 잇는다.
+    # 그룹 연속 성공: 그룹이 있는 날끼리 이어서 모든 루틴을 완료한 날 수 (그룹이 없는 날은 건너뜀)
+    success, previous = conn.execute("""
+        SELECT completed = total,
+               (SELECT MAX(date) FROM group_progress WHERE group_name = ? AND date < ?)
+        FROM group_progress WHERE group_name = ? AND date = ?
+    """, (group_name, date, group_name, date)).fetchone()
+    advance_streak(conn, "group", group_name, date, success, previous)
+    # 하루 전체 연속 성공: 그날의 모든 그룹이 끝났을 때만 잇는다
+    pending, success = conn.execute(
+        "SELECT SUM(pending), SUM(completed) = SUM(total) FROM group_progress WHERE date = ?", (date,)
+    ).fetchone()
+    if pending == 0:
+        previous = conn.execute("SELECT MAX(date) FROM group_progress WHERE date < ?", (date,)).fetchone()[0]
+        advance_streak(conn, "day", "", date, success, previous)
+
+def backfill_streaks(conn):
+    # 마이그레이션에서 한 번만: 이미 끝난 날들로 연속 기록을 처음부터 센다
+    for (group_name,) in conn.execute(
+        "SELECT DISTINCT group_name FROM group_progress WHERE pending = 0"
+    ).fetchall():
+        save_streak(conn, "group", group_name, *count_streak(conn.execute("""
+            SELECT date, completed = total FROM group_progress
+            WHERE group_name = ? AND pending = 0
+            ORDER BY date DESC
+        """, (group_name,))))
+    current, last_date = count_streak(conn.execute("""
+        SELECT date, SUM(completed) = SUM(total) FROM group_progress
+        GROUP BY date HAVING SUM(pending) = 0
+        ORDER BY date DESC
+    """))
+    if last_date is not None:
+        save_streak(conn, "day", "", current, last_date)
+
+def _create_stats_delete_trigger(conn, guard=""):
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_routines_stats_delete AFTER DELETE ON routines {guard}
+        BEGIN
+            {"".join(_stats_count_sql(*t, "OLD", "-") for t in STATS_TABLES.values())}
+        END
+    """)
+
+def _migrate_stats(conn):
+    # 날짜/그룹/루틴 이름별 요약과 연속 성공 기록. 요약은 트리거가 상태 변경과 같은 트랜잭션에서
+    # 갱신하고, 연속 기록은 그룹 보고를 넣을 때 갱신하므로 통계 요청은 기본 키 조회로 끝난다
+    add_missing_columns(conn, "routines", [("late_seconds", "REAL")])
+    for table, key, _ in STATS_TABLES.values():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key} TEXT PRIMARY KEY,
+                {", ".join(f"{name} {'REAL' if name == 'late_total' else 'INTEGER'} NOT NULL DEFAULT 0" for name in STATS_COLUMNS)}
+            )
+        """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stats_streaks (
+            scope TEXT,
+            key TEXT,
+            current INTEGER NOT NULL DEFAULT 0,
+            best INTEGER NOT NULL DEFAULT 0,
+            last_date TEXT,
+            PRIMARY KEY (scope, key)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_group_progress_group_date ON group_progress (group_name, date)")
+    tables = STATS_TABLES.values()
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_routines_stats_insert AFTER INSERT ON routines
+        BEGIN
+            {"".join(_stats_ensure_sql(*t) + _stats_count_sql(*t, "NEW", "+") for t in tables)}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_routines_stats_update
+        AFTER UPDATE OF date, group_routine_name, routine_name, completed, late_seconds ON routines
+        BEGIN
+            {"".join(_stats_count_sql(*t, "OLD", "-") + _stats_ensure_sql(*t) + _stats_count_sql(*t, "NEW", "+") for t in tables)}
+        END
+    """)
+    _create_stats_delete_trigger(conn)
+    # 이미 있는 기록으로 채운다
+    for table, key, column in tables:
+        conn.execute(f"""
+            INSERT INTO {table} ({key}, {", ".join(STATS_COLUMNS)})
+            SELECT {column}, COUNT(*),
+                   {", ".join(f"SUM(completed = {status})" for name, status in GROUP_COUNTERS if status != ROUTINE_PENDING)},
+                   0, 0
+            FROM routines
+            WHERE completed != 0
+            GROUP BY {column}
+        """)
+    backfill_streaks(conn)
+
+# 반복 루틴 템플릿: 규칙(rrule)과 예외 날짜(exdates, JSON 배열)만 한 번 저장한다
+TEMPLATE_SYNC_COLUMNS = ("start_time", "routine_minutes", "icon", "routine_name", "group_routine_name",
+                         "rrule", "dtstart", "exdates")
+# 템플릿에서 그날 루틴으로 복사되는 컬럼
+OCCURRENCE_COLUMNS = ("start_time", "routine_minutes", "icon", "routine_name", "group_routine_name")
+
+def _migrate_templates(conn):
+    # 매일 같은 루틴을 날짜마다 보내는 대신 템플릿을 보내면, 그날 루틴은 조회할 때 routines 에 펼친다.
+    # 펼친 루틴은 template_id 가 있고 id 는 recurrence.occurrence_id() (음수) 이다
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS templates (
+            id INTEGER PRIMARY KEY,
+            start_time TEXT,
+            routine_minutes INTEGER,
+            icon TEXT,
+            routine_name TEXT,
+            group_routine_name TEXT,
+            rrule TEXT NOT NULL,
+            dtstart TEXT NOT NULL,
+            exdates TEXT,
+            row_version INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_templates_row_version ON templates (row_version)")
+    _create_sync_triggers(conn, "templates", TEMPLATE_SYNC_COLUMNS)
+    add_missing_columns(conn, "routines", [("template_id", "INTEGER")])
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_routines_template ON routines (template_id, date)")
+    # 날짜별로 어떤 템플릿 버전까지 펼쳤는지 (같으면 다시 펼치지 않는다)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS template_expansions (
+            date TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+
+# 보관 DB 로 옮기는 루틴 컬럼
+ARCHIVE_COLUMNS = ("id", "date", "start_time", "routine_minutes", "icon", "routine_name", "group_routine_name",
+                   "completed", "late_seconds", "template_id")
+# 보관 중(archive_state.active = 1)인 트랜잭션의 삭제는 동기화 tombstone/그룹/통계에 반영하지 않는다
+ARCHIVE_GUARD = "WHEN (SELECT active FROM archive_state WHERE id = 1) = 0"
+
+def _migrate_archive(conn):
+    # 오래된 루틴은 월별 보관 DB 로 옮긴다(archive.py). 옮기는 삭제는 휴대폰에 삭제로 알리지 않고
+    # 요약/연속 기록도 그대로 두도록 삭제 트리거에 조건을 붙인다
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            active INTEGER NOT NULL DEFAULT 0,
+            archived_before TEXT,
+            last_run TEXT
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO archive_state (id) VALUES (1)")
+    for name in ("trg_routines_sync_delete", "trg_routines_group_delete", "trg_routines_stats_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    _create_sync_delete_trigger(conn, "routines", ARCHIVE_GUARD)
+    _create_group_delete_trigger(conn, ARCHIVE_GUARD)
+    _create_stats_delete_trigger(conn, ARCHIVE_GUARD)
+
+# 템플릿에서 펼친 루틴은 휴대폰이 템플릿으로 이미 가진 내용이라 동기화로 돌려보내지 않는다
+OWN_ROUTINE_GUARD = "WHEN NEW.template_id IS NULL"
+
+def _migrate_template_sync(conn):
+    # 펼친 루틴(occurrence)의 추가/상태 변경/삭제는 동기화 버전을 올리지 않고 tombstone 도 남기지 않는다.
+    # 그 결과는 그룹 보고로 휴대폰에 간다
+    for name in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_routines_sync_{name}")
+    _create_sync_triggers(
+        conn, "routines", ROUTINE_SYNC_COLUMNS + ("completed",),
+        OWN_ROUTINE_GUARD, f"{ARCHIVE_GUARD} AND OLD.template_id IS NULL",
+    )
+    conn.execute("""
+        DELETE FROM sync_tombstones WHERE table_name = 'routines' AND row_id < 0
+    """)
+
+# 휴대폰이 올린 행에는 올린 기기(origin)를 남긴다. 전체 동기화는 그 기기가 올린 행만 지운다
+ORIGIN_TABLES = ("routines", "timers", "templates")
+
+def _migrate_origin(conn):
+    for table in ORIGIN_TABLES:
+        add_missing_columns(conn, table, [("origin", "TEXT")])
+    # 예전 행은 누가 올렸는지 모른다. 동기화한 기기가 하나뿐이면 그 기기 것으로 보고, 아니면 비워 둔다
+    devices = conn.execute("SELECT device_id FROM sync_devices").fetchall()
+    if len(devices) == 1:
+        for table in ORIGIN_TABLES:
+            owned = " AND template_id IS NULL" if table == "routines" else ""
+            conn.execute(f"UPDATE {table} SET origin = ? WHERE origin IS NULL{owned}", devices[0])
+
+MIGRATIONS = [
+    (1, _migrate_base_tables),
+    (2, _migrate_indexes),
+    (3, _migrate_legacy_columns),
+    (4, _migrate_sync_versions),
+    (5, _migrate_ble_outbox),
+    (6, _migrate_group_progress),
+    (7, _migrate_stats),
+    (8, _migrate_templates),
+    (9, _migrate_archive),
+    (10, _migrate_template_sync),
+    (11, _migrate_origin),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+
+def add_missing_columns(conn, table, columns):
+    existing = table_columns(conn, table)
+    for name, definition in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+    # 두 프로세스가 동시에 시작해도 한 번만 적용되도록 쓰기 잠금 안에서 버전을 다시 읽는다
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = get_schema_version(conn)
+        for target, step in MIGRATIONS:
+            if target > version:
+                logging.info(f"[DB] 스키마 마이그레이션 {version} -> {target}")
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                version = target
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return version
+
+def upsert_sql(table, columns):
+    # 바뀐 값이 있을 때만 UPDATE 해서 재전송된 동일한 행은 버전이 올라가지 않게 한다
+    names = ", ".join(("id",) + columns)
+    marks = ", ".join("?" * (len(columns) + 1))
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns)
+    changed = " OR ".join(f"{table}.{c} IS NOT excluded.{c}" for c in columns)
+    return f"""
+        INSERT INTO {table} ({names}) VALUES ({marks})
+        ON CONFLICT(id) DO UPDATE SET {updates}
+        WHERE {changed}
+    """
+
+UPSERT_ROUTINE_SQL = upsert_sql("routines", ROUTINE_SYNC_COLUMNS)
+UPSERT_TIMER_SQL = upsert_sql("timers", TIMER_SYNC_COLUMNS)
+UPSERT_TEMPLATE_SQL = upsert_sql("templates", TEMPLATE_SYNC_COLUMNS)
+# 펼친 루틴은 아직 처리되지 않았을 때만 템플릿 변경을 따라간다
+UPSERT_OCCURRENCE_SQL = f"""
+    INSERT INTO routines (id, template_id, date, {", ".join(OCCURRENCE_COLUMNS)})
+    VALUES (?, ?, ?, {", ".join("?" * len(OCCURRENCE_COLUMNS))})
+    ON CONFLICT(id) DO UPDATE SET {", ".join(f"{c} = excluded.{c}" for c in OCCURRENCE_COLUMNS)}
+    WHERE routines.completed = 0 AND ({" OR ".join(f"routines.{c} IS NOT excluded.{c}" for c in OCCURRENCE_COLUMNS)})
+"""
+
+def template_row(entry):
+    # 휴대폰이 보낸 템플릿을 저장할 행으로. 규칙이 잘못되면 ValueError
+    recurrence.parse_rrule(entry["rrule"])
+    recurrence.parse_date(entry["dtstart"])
+    exdates = sorted(recurrence.parse_date(d).isoformat() for d in entry.get("exdates") or ())
+    values = dict(entry, dtstart=recurrence.parse_date(entry["dtstart"]).isoformat(), exdates=json.dumps(exdates))
+    return (entry["id"],) + tuple(values[c] for c in TEMPLATE_SYNC_COLUMNS)
+
+def stats_summary(key, row):
+    values = dict(zip(STATS_COLUMNS, row))
+    late_total, late_count = values.pop("late_total"), values.pop("late_count")
+    total = values["total"]
+    return {
+        "key": key, **values,
+        "success_rate": round(values["completed"] / total, 3) if total else None,
+        "avg_lateness": round(late_total / late_count, 1) if late_count else None,
+    }
+
+def today_str():
+    return datetime.now().strftime("%Y-%m-%d")
+
+class RoutineRepository:
+    # 프로세스(스레드)마다 연결 하나를 열어 두고 모든 모듈이 같은 쿼리 메서드를 쓴다
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.local = threading.local()
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        # 새 DB 는 처음부터 증분 VACUUM 이 되게 만든다 (테이블이 이미 있으면 무시된다)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        migrate(conn)
+        logging.info(f"[DB] 연결 생성: {self.path} (pid={os.getpid()})")
+        return conn
+
+    def connection(self):
+        # fork 된 자식 프로세스는 부모의 연결을 물려받지 않고 새로 연다
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = self.connect()
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None and self.local.pid == os.getpid():
+            conn.close()
+        self.local.conn = None
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE로 쓰기 잠금을 먼저 잡아 읽기 중 잠금 승격 충돌을 피한다
+        conn = self.connection()
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            metrics.incr("db.rollback")
+            raise
+        conn.execute("COMMIT")
+        metrics.observe("db.transaction", time.perf_counter() - start)
+
+    def query(self, sql, params=()):
+        with metrics.timed("db.query"):
+            return self.connection().execute(sql, params).fetchall()
+
+    def execute(self, sql, params=()):
+        with self.transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def executemany(self, sql, rows):
+        with self.transaction() as conn:
+            return conn.executemany(sql, rows).rowcount
+
+    # ------------------ 루틴 ------------------ #
+    def get_today_routines(self, today=None):
+        self.ensure_expanded(today or today_str())
+        rows = self.query("""
+            SELECT id, start_time, icon, routine_minutes, routine_name, group_routine_name
+            FROM routines
+            WHERE date = ? AND completed = 0
+        """, (today or today_str(),))
+        return [Routine(*row) for row in rows]
+
+    def update_routine_status(self, routine_id, status, late_seconds=None):
+        return self.update_routine_statuses([(routine_id, status, late_seconds)])
+
+    def update_routine_statuses(self, updates):
+        # [(routine_id, status[, late_seconds])] 를 한 트랜잭션으로 반영한다. 그룹 카운터/통계는
+        # 트리거가 같이 갱신하고, 이번에 마지막 루틴이 끝난 그룹의 결과 보고를 같은 트랜잭션에서
+        # 송신함에 넣는다. 반환: 새로 넣은 보고 [(outbox_id, data)]
+        ids = json.dumps([update[0] for update in updates])
+        with self.transaction() as conn:
+            conn.executemany(
+                "UPDATE routines SET completed = ?, late_seconds = COALESCE(?, late_seconds) WHERE id = ?",
+                [(update[1], update[2] if len(update) > 2 else None, update[0]) for update in updates],
+            )
+            groups = conn.execute("""
+                SELECT DISTINCT date, group_routine_name FROM routines
+                WHERE id IN (SELECT value FROM json_each(?))
+            """, (ids,)).fetchall()
+            return [report for report in (self.claim_group_report(conn, *group) for group in groups) if report]
+
+    def claim_group_report(self, conn, date, group_name):
+        # 남은 루틴이 없고 아직 보고하지 않은 그룹만 한 번 보고한다
+        claimed = conn.execute("""
+            UPDATE group_progress SET reported_at = ?
+            WHERE date = ? AND group_name = ? AND pending = 0 AND reported_at IS NULL
+        """, (datetime.now().isoformat(timespec="seconds"), date, group_name)).rowcount
+        if not claimed:
+            return None
+        refresh_streaks(conn, date, group_name)
+        rows = conn.execute("""
+            SELECT id, start_time, routine_minutes, completed, routine_name
+            FROM routines
+            WHERE date = ? AND group_routine_name = ?
+            ORDER BY start_time
+        """, (date, group_name)).fetchall()
+        data = {"group": group_name, "routines": [
+            {"id": r[0], "start_time": r[1], "minutes": r[2], **wire_status(r[3]), "name": r[4]}
+            for r in rows
+        ]}
+        outbox_id = conn.execute(
+            "INSERT INTO ble_outbox (payload, created_at) VALUES (?, ?)",
+            (json.dumps(data, ensure_ascii=False), datetime.now().isoformat(timespec="seconds"))
+        ).lastrowid
+        return outbox_id, data
+
+    # ------------------ 통계 ------------------ #
+    def get_stats(self, scope, key):
+        table, column, _ = STATS_TABLES[scope]
+        rows = self.query(f"SELECT {', '.join(STATS_COLUMNS)} FROM {table} WHERE {column} = ?", (key,))
+        return stats_summary(key, rows[0] if rows else (0,) * len(STATS_COLUMNS))
+
+    def get_daily_stats(self, days, end=None):
+        # end 까지 최근 days 일 (기본 키 범위 조회)
+        end = end or today_str()
+        start = (datetime.strptime(end, "%Y-%m-%d") - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        rows = self.query(f"""
+            SELECT date, {', '.join(STATS_COLUMNS)} FROM stats_daily
+            WHERE date BETWEEN ? AND ? ORDER BY date
+        """, (start, end))
+        return [stats_summary(row[0], row[1:]) for row in rows]
+
+    def get_streak(self, scope, key=""):
+        rows = self.query("SELECT current, best, last_date FROM stats_streaks WHERE scope = ? AND key = ?", (scope, key))
+        current, best, last_date = rows[0] if rows else (0, 0, None)
+        return {"streak": current, "best_streak": best, "last_date": last_date}
+
+    def stats_report(self, scope="day", key=None, days=None):
+        # 휴대폰의 통계 요청에 대한 응답. 모두 기본 키 조회라 기록이 몇 년치여도 일정하다
+        if scope not in STATS_TABLES:
+            raise ValueError(f"unknown stats scope: {scope}")
+        report = {"type": "stats", "scope": scope}
+        if scope == "day":
+            if days:
+                report["stats"] = self.get_daily_stats(int(days), key)
+            else:
+                report["stats"] = [self.get_stats("day", key or today_str())]
+            report.update(self.get_streak("day"))
+        elif key is None:
+            raise ValueError(f"stats scope {scope} needs a key")
+        else:
+            report["stats"] = [self.get_stats(scope, key)]
+            if scope == "group":
+                report.update(self.get_streak("group", key))
+        return report
+
+    def insert_routines(self, routines):
+        self.insert_batch(routines=routines)
+
+    # ------------------ 반복 템플릿 ------------------ #
+    def templates_version(self, conn):
+        # 템플릿이 추가/수정/삭제될 때마다 커지는 값 (동기화 버전 중 템플릿 것의 최대)
+        return conn.execute("""
+            SELECT MAX(version) FROM (
+                SELECT MAX(row_version) AS version FROM templates
+                UNION ALL
+                SELECT MAX(version) FROM sync_tombstones WHERE table_name = 'templates'
+            )
+        """).fetchone()[0] or 0
+
+    def ensure_expanded(self, day):
+        # 그날 펼친 뒤로 템플릿이 바뀌지 않았으면 읽기 두 번으로 끝난다
+        conn = self.connection()
+        row = conn.execute("SELECT version FROM template_expansions WHERE date = ?", (day,)).fetchone()
+        if row is not None and row[0] == self.templates_version(conn):
+            return
+        with self.transaction() as conn:
+            self.expand_templates(conn, day)
+
+    def expand_templates(self, conn, day):
+        # day 에 발생하는 템플릿을 routines 에 펼치고, 더 이상 발생하지 않는 미처리 루틴은 지운다
+        date = recurrence.parse_date(day)
+        occurrences = []
+        for template in map(Template._make, conn.execute(f"""
+            SELECT id, {", ".join(TEMPLATE_SYNC_COLUMNS)} FROM templates WHERE dtstart <= ?
+        """, (day,))):
+            try:
+                rule = recurrence.parse_rrule(template.rrule)
+                exdates = {recurrence.parse_date(d) for d in json.loads(template.exdates or "[]")}
+                if not recurrence.occurs_on(rule, recurrence.parse_date(template.dtstart), date, exdates):
+                    continue
+            except ValueError as e:
+                logging.error(f"[DB] 템플릿 {template.id} 규칙 오류: {e}")
+                continue
+            occurrences.append(
+                (recurrence.occurrence_id(template.id, date), template.id, day)
+                + tuple(getattr(template, c) for c in OCCURRENCE_COLUMNS)
+            )
+        conn.executemany(UPSERT_OCCURRENCE_SQL, occurrences)
+        conn.execute("""
+            DELETE FROM routines
+            WHERE template_id IS NOT NULL AND date = ? AND completed = 0
+              AND id NOT IN (SELECT value FROM json_each(?))
+        """, (day, json.dumps([o[0] for o in occurrences])))
+        conn.execute("""
+            INSERT INTO template_expansions (date, version) VALUES (?, ?)
+            ON CONFLICT(date) DO UPDATE SET version = excluded.version
+        """, (day, self.templates_version(conn)))
+        logging.info(f"[DB] {day} 반복 루틴 {len(occurrences)}건 펼침")
+        return len(occurrences)
+
+    def get_templates(self):
+        rows = self.query(f"SELECT id, {', '.join(TEMPLATE_SYNC_COLUMNS)} FROM templates")
+        return [Template(*row) for row in rows]
+
+    def insert_templates(self, templates):
+        self.insert_batch(templates=templates)
+
+    # ------------------ 타이머 ------------------ #
+    def get_timers(self):
+        rows = self.query("SELECT id, timer_minutes, rest, repeat_count, icon FROM timers")
+        return [Timer(*row) for row in rows]
+
+    def update_timer_status(self, timer_id, status):
+        self.execute("UPDATE timers SET completed = ? WHERE id = ?", (status, timer_id))
+
+    def insert_timers(self, timers):
+        self.insert_batch(timers=timers)
+
+    # ------------------ 일괄 저장 / 동기화 ------------------ #
+    def insert_batch(self, routines=(), timers=(), templates=()):
+        # BLE로 받은 여러 메시지를 한 트랜잭션, 테이블당 executemany 한 번으로 저장한다.
+        # 같은 id 를 다시 보내도 오류 없이 갱신된다
+        with self.transaction() as conn:
+            self.upsert(conn, routines, timers, templates)
+
+    def upsert(self, conn, routines=(), timers=(), templates=(), origin=None):
+        if routines:
+            # 이미 보관 DB 로 옮긴 날짜의 루틴을 휴대폰이 다시 보내면 미처리로 되살리지 않는다
+            archived_before = conn.execute("SELECT archived_before FROM archive_state WHERE id = 1").fetchone()[0]
+            if archived_before:
+                routines = [r for r in routines if r["date"] >= archived_before]
+            conn.executemany(UPSERT_ROUTINE_SQL, [
+                (r["id"],) + tuple(r[c] for c in ROUTINE_SYNC_COLUMNS) for r in routines
+            ])
+        if timers:
+            conn.executemany(UPSERT_TIMER_SQL, [
+                (t["id"],) + tuple(t[c] for c in TIMER_SYNC_COLUMNS) for t in timers
+            ])
+        if templates:
+            conn.executemany(UPSERT_TEMPLATE_SQL, [template_row(t) for t in templates])
+        for table, entries in (("routines", routines), ("timers", timers), ("templates", templates)):
+            self.stamp_origin(conn, table, entries, origin)
+
+    def stamp_origin(self, conn, table, entries, origin=None):
+        # 올린 기기를 기록한다 (동기화 컬럼이 아니라 버전은 오르지 않는다). 일반 저장 메시지는 device 가 있을 때만
+        rows = [(origin or e.get("device"), e["id"]) for e in entries]
+        conn.executemany(
+            f"UPDATE {table} SET origin = ?1 WHERE id = ?2 AND origin IS NOT ?1",
+            [row for row in rows if row[0]]
+        )
+
+    def apply_sync(self, device_id, routines=(), timers=(), deleted=None, full=False, since=None, templates=()):
+        # 전체(full) 또는 변경분(delta) 스냅샷을 한 트랜잭션으로 반영하고,
+        # 이 기기가 마지막으로 받은 버전 이후 바뀐 행만 돌려준다
+        deleted = deleted or {}
+        with self.transaction() as conn:
+            if since is None:
+                row = conn.execute(
+                    "SELECT version FROM sync_devices WHERE device_id = ?", (device_id,)
+                ).fetchone()
+                since = row[0] if row else 0
+            # 이번 업로드가 올린 버전(before 이후)은 휴대폰이 이미 가진 내용이므로 되돌려 보내지 않는다
+            before = conn.execute("SELECT version FROM sync_state WHERE id = 1").fetchone()[0]
+            self.upsert(conn, routines, timers, templates, origin=device_id)
+            for table, entries in (("routines", routines), ("timers", timers), ("templates", templates)):
+                if full:
+                    # 이 기기가 올린 행 중 목록에 없는 것만 지운다. 다른 기기가 올린 행, 올린 기기를 모르는 행,
+                    # 템플릿에서 펼친 루틴(origin 없음)은 남는다 (지우려면 변경분의 deleted 로)
+                    keep = json.dumps([e["id"] for e in entries])
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE origin = ? AND id NOT IN (SELECT value FROM json_each(?))",
+                        (device_id, keep)
+                    )
+                elif deleted.get(table):
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE id IN (SELECT value FROM json_each(?))",
+                        (json.dumps(deleted[table]),)
+                    )
+            version = conn.execute("SELECT version FROM sync_state WHERE id = 1").fetchone()[0]
+            changes = self.changes_since(conn, since, before)
+            conn.execute("""
+                INSERT INTO sync_devices (device_id, version, synced_at) VALUES (?, ?, ?)
+                ON CONFLICT(device_id) DO UPDATE SET version = excluded.version, synced_at = excluded.synced_at
+            """, (device_id, version, datetime.now().isoformat(timespec="seconds")))
+        return {"type": "sync_ack", "version": version, **changes}
+
+    def changes_since(self, conn, version, until):
+        # version 초과 ~ until 이하 버전에서 바뀐 행과 삭제된 id
+        routine_columns = ("id",) + ROUTINE_SYNC_COLUMNS + ("completed", "template_id")
+        timer_columns = ("id",) + TIMER_SYNC_COLUMNS
+        template_columns = ("id",) + TEMPLATE_SYNC_COLUMNS
+        routines = conn.execute(
+            f"SELECT {', '.join(routine_columns)} FROM routines "
+            f"WHERE row_version BETWEEN ? AND ? AND template_id IS NULL",
+            (version + 1, until)
+        ).fetchall()
+        timers = conn.execute(
+            f"SELECT {', '.join(timer_columns)} FROM timers WHERE row_version BETWEEN ? AND ?",
+            (version + 1, until)
+        ).fetchall()
+        templates = conn.execute(
+            f"SELECT {', '.join(template_columns)} FROM templates WHERE row_version BETWEEN ? AND ?",
+            (version + 1, until)
+        ).fetchall()
+        deleted = {"routines": [], "timers": [], "templates": []}
+        for table, row_id in conn.execute(
+            "SELECT table_name, row_id FROM sync_tombstones WHERE version BETWEEN ? AND ?",
+            (version + 1, until)
+        ):
+            deleted[table].append(row_id)
+        return {
+            "routines": [
+                dict(zip(routine_columns, row), **wire_status(row[routine_columns.index("completed")]))
+                for row in routines
+            ],
+            "timers": [dict(zip(timer_columns, row)) for row in timers],
+            "templates": [
+                dict(zip(template_columns, row), exdates=json.loads(row[-1] or "[]")) for row in templates
+            ],
+            "deleted": deleted,
+        }
+
+    # ------------------ 보관 ------------------ #
+    def archive_months(self, before):
+        # before 이전에 결과가 확정된 루틴이 있는 달 ("YYYY-MM")
+        rows = self.query("""
+            SELECT DISTINCT substr(date, 1, 7) FROM routines
+            WHERE date < ? AND completed != 0
+            ORDER BY 1
+        """, (before,))
+        return [row[0] for row in rows]
+
+    def past_pending(self, before, limit):
+        # before 이전 날짜인데 결과 없이 남은 루틴 id (기기가 꺼져 있던 날, 예전 버전의 미완료 기록)
+        rows = self.query("SELECT id FROM routines WHERE date < ? AND completed = 0 LIMIT ?", (before, limit))
+        return [row[0] for row in rows]
+
+    def archive_candidates(self, start, end, limit):
+        return self.query(f"""
+            SELECT {", ".join(ARCHIVE_COLUMNS)} FROM routines
+            WHERE date >= ? AND date < ? AND completed != 0
+            LIMIT ?
+        """, (start, end, limit))
+
+    def remove_archived(self, ids):
+        # 보관 DB 에 쓴 뒤에 지운다. 삭제 트리거가 건너뛰도록 같은 트랜잭션 안에서만 active = 1
+        with self.transaction() as conn:
+            conn.execute("UPDATE archive_state SET active = 1 WHERE id = 1")
+            removed = conn.execute("""
+                DELETE FROM routines WHERE id IN (SELECT value FROM json_each(?)) AND completed != 0
+            """, (json.dumps(ids),)).rowcount
+            conn.execute("UPDATE archive_state SET active = 0 WHERE id = 1")
+        return removed
+
+    def get_archive_state(self):
+        return self.query("SELECT archived_before, last_run FROM archive_state WHERE id = 1")[0]
+
+    def finish_archive(self, before, last_run):
+        with self.transaction() as conn:
+            conn.execute("""
+                UPDATE archive_state SET archived_before = MAX(COALESCE(archived_before, ''), ?), last_run = ?
+                WHERE id = 1
+            """, (before, last_run))
+            conn.execute("DELETE FROM template_expansions WHERE date < ?", (before,))
+
+    def compact(self, pages, should_stop):
+        # 빈 페이지를 pages 개씩 파일에서 돌려주고 통계를 갱신한다. 다 돌려주면 True
+        conn = self.connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                if should_stop():
+                    return False
+                conn.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()
+        else:
+            # 예전에 만든 DB: 빈 페이지는 재사용만 된다. 전환은 archive.py --vacuum 으로 (vacuum())
+            logging.info("[DB] auto_vacuum 이 INCREMENTAL 이 아님 - 증분 VACUUM 건너뜀")
+        conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return True
+
+    def vacuum(self):
+        # 예전 DB 를 auto_vacuum=INCREMENTAL 로 바꾸는 전체 VACUUM. 파일을 통째로 다시 쓰며
+        # 그동안 쓰기를 막으므로 유휴 작업이 아니라 서비스를 멈추고 한 번만 돌린다
+        conn = self.connection()
+        logging.info("[DB] auto_vacuum=INCREMENTAL 전환 (전체 VACUUM)")
+        with metrics.timed("db.vacuum"):
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # ------------------ BLE 송신함 ------------------ #
+    def outbox_add(self, data):
+        with self.transaction() as conn:
+            return conn.execute(
+                "INSERT INTO ble_outbox (payload, created_at) VALUES (?, ?)",
+                (json.dumps(data, ensure_ascii=False), datetime.now().isoformat(timespec="seconds"))
+            ).lastrowid
+
+    def outbox_pending(self, limit=100):
+        rows = self.query("SELECT id, payload FROM ble_outbox ORDER BY id LIMIT ?", (limit,))
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def outbox_existing(self, ids):
+        rows = self.query(
+            "SELECT id FROM ble_outbox WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+        )
+        return {row[0] for row in rows}
+
+    def outbox_remove(self, ids):
+        self.executemany("DELETE FROM ble_outbox WHERE id = ?", [(row_id,) for row_id in ids])
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+def get_repository(path=DB_PATH):
+    with _repositories_lock:
+        repo = _repositories.get(path)
+        if repo is None:
+            repo = _repositories[path] = RoutineRepository(path)
+        return repo
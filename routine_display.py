@@ -1,14 +1,14 @@
 #!/usr/bin/python
 # -*- coding: UTF-8 -*-
-import os
 import sys
 import time
 import logging
 import sqlite3
 from datetime import datetime, time as dtime, timedelta
-from PIL import Image
-sys.path.append("../../../Downloads")
-from lib import LCD_1inch28
+import hardware
+from routine_db import get_repository
+from icon_cache import get_icon_cache
+from lcd_frame import show_frame
 
 # Raspberry Pi pin configuration
 RST = 27
@@ -20,32 +20,18 @@ logging.basicConfig(level=logging.DEBUG)
 
 # SQLite DB 경로
 DB_PATH = '/home/pi/routine_db.db'
-
-def connect_db():
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        return conn
-    except sqlite3.Error as err:
-        logging.error(f"DB connection failed: {err}")
-        return None
+repo = get_repository(DB_PATH)
+icons = get_icon_cache("/home/pi/APP_icon/")
 
 def get_routine_data():
-    conn = connect_db()
-    if not conn:
-        return None
     try:
-        cursor = conn.cursor()
         query = "SELECT date, start_time, icon FROM routines"
-        cursor.execute(query)
-        data = cursor.fetchall()
+        data = repo.query(query)
         logging.info(f"Fetched data: {data}")
         return data
     except sqlite3.Error as err:
         logging.error(f"Query failed: {err}")
         return None
-    finally:
-        cursor.close()
-        conn.close()
 
 def compare_time(date_str, time_str):
     current = datetime.now()
@@ -68,7 +54,7 @@ def compare_time(date_str, time_str):
     return is_match
 
 def main():
-    disp = LCD_1inch28.LCD_1inch28()
+    disp = hardware.create_lcd()
     disp.Init()
     disp.clear()
     disp.bl_DutyCycle(50)
@@ -85,17 +71,14 @@ def main():
             date_str, start_time, icon = routine
             logging.info(f"Processing routine: date={date_str}, start_time={start_time}, icon={icon}")
             if compare_time(date_str, start_time):
-                image_path = os.path.join("/home/pi/APP_icon/", icon)
-                logging.info(f"Attempting to load image: {image_path}")
-                if os.path.exists(image_path):
-                    image = Image.open(image_path)
-                    image = image.resize((240, 240))
-                    im_r = image.rotate(180)
-                    disp.ShowImage(im_r)
+                logging.info(f"Attempting to load image: {icons.path(icon)}")
+                frame = icons.get(icon, 180)
+                if frame is not None:
+                    show_frame(disp, frame)
                     logging.info(f"Displaying icon: {icon}")
                     found_match = True
                 else:
-                    logging.error(f"Image file not found: {image_path}")
+                    logging.error(f"Image file not found: {icons.path(icon)}")
                 break
 
         if not found_match:
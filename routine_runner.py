@@ -1,224 +1,390 @@
 import os
 import time
 import logging
-import sqlite3
 from datetime import datetime
-from PIL import Image
-from gpiozero import Button, Buzzer
-from LCD_1inch28 import LCD_1inch28
-from motor_control import run_motor_routine, run_motor_timer
-from ble_sender import send_json_via_ble
-from threading import Thread
-
-# 경로 설정
-DB_PATH = "/home/pi/LCD_final/routine_db.db"
-ICON_PATH = "/home/pi/APP_icon/"
-
-# GPIO 설정
-button1 = Button(5, pull_up=False, bounce_time=0.05)
-button2 = Button(6, pull_up=False, bounce_time=0.05)
-button3 = Button(26, pull_up=False, bounce_time=0.05)
-buzzer = Buzzer(13)
+import hardware
+import metrics
+from motor_control import DialController, get_motor_engine
+from timer_executor import Phase, TimerExecutor, TimerTask, timer_phases
+from checkpoint import get_journal
+from archive import ArchiveJob
+from ble_sender import get_sender, send_outbox_entries
+from scheduler import RoutineScheduler
+from agenda import Agenda
+from routine_db import DB_PATH, ROUTINE_COMPLETED, ROUTINE_SKIPPED, ROUTINE_FAILED, ROUTINE_TIMEOUT, get_repository
+from missed_policy import MissedRoutinePolicy
+from icon_cache import ICON_PATH, get_icon_cache
+from lcd_render import LcdRenderer, format_remaining
+from input_events import InputEvents
+
+# DB 변경 알림을 받을 수 없을 때(단독 실행) 오늘 루틴을 다시 읽는 주기(초)
+RESCAN_INTERVAL = 60
+# 타이머 선택 화면에서 입력이 없을 때 루틴 일정을 다시 확인하는 주기(초)
+TIMER_IDLE_RECHECK = 60
+# 남은 시간 표시(링/글자) 갱신 주기(초)
+COUNTDOWN_TICK = 1
+# 다음 루틴까지 이만큼(분) 비어 있을 때만 DB 보관/압축을 돌린다
+MAINTENANCE_IDLE_MINUTES = 15
+
+# GPIO 핀 설정
+BUTTON1_PIN = 5
+BUTTON2_PIN = 6
+BUTTON3_PIN = 26
+BUZZER_PIN = 13
+
+# 장치는 init_hardware() 에서 처음 실행할 때 만든다
+button1 = button2 = button3 = buzzer = None
+
+# 버튼 입력은 콜백 → 이벤트 큐로 받는다 (폴링 없음)
+events = InputEvents()
+
+scheduler = None
+renderer = None
+dial = DialController()
+timers = TimerExecutor()
+repo = get_repository(DB_PATH)
+icons = get_icon_cache(ICON_PATH)
+# 오늘 일정표: 스케줄러가 다시 읽을 때 함께 갱신되고 자정이 지나면 스스로 다시 읽는다
+agenda = Agenda(repo.get_today_routines)
+# 예정 시각이 지난 루틴을 실행/건너뜀 판정하는 정책
+policy = MissedRoutinePolicy.load()
+# 오래된 기록을 월별 보관 DB 로 옮기는 작업 (유휴 시간에 하루 한 번)
+archiver = ArchiveJob(repo)
+
+def motor_snapshot():
+    return get_motor_engine().snapshot()
+
+# 진행 중인 루틴/타이머와 다이얼 위치: 매 tick 기록하고 재부팅하면 여기서 이어 간다
+journal = get_journal(position=motor_snapshot)
 
 logging.basicConfig(level=logging.INFO)
 
+def init_hardware():
+    global button1, button2, button3, buzzer, renderer
+    button1 = hardware.button(BUTTON1_PIN)
+    button2 = hardware.button(BUTTON2_PIN)
+    button3 = hardware.button(BUTTON3_PIN)
+    buzzer = hardware.buzzer(BUZZER_PIN)
+    events.attach("button1", button1)
+    events.attach("button2", button2)
+    events.attach("button3", button3)
+    disp = hardware.create_lcd()
+    disp.Init()
+    disp.clear()
+    disp.bl_DutyCycle(50)
+    renderer = LcdRenderer(disp)
+    return disp
+
 def buzz(duration=1):
     logging.info(f"Buzzing for {duration} second(s)")
     buzzer.on()
     time.sleep(duration)
     buzzer.off()
 
-def connect_db():
-    return sqlite3.connect(DB_PATH)
-
 def get_today_routines():
-    today = datetime.now().strftime("%Y-%m-%d")
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, start_time, icon, routine_minutes, routine_name, group_routine_name
-        FROM routines
-        WHERE date = ? AND completed = 0
-    """, (today,))
-    routines = cursor.fetchall()
-    conn.close()
-    logging.info(f"Fetched {len(routines)} routines for today")
+    routines = repo.get_today_routines()
+    metrics.log_sampled("fetch_routines", f"Fetched {len(routines)} routines for today")
     return routines
 
-def get_completed_routines_by_group(group_name):
-    today = datetime.now().strftime("%Y-%m-%d")
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, start_time, routine_minutes, completed, routine_name
-        FROM routines
-        WHERE date = ? AND group_routine_name = ?
-    """, (today, group_name))
-    routines = cursor.fetchall()
-    conn.close()
-    return routines
-
-def update_routine_status(routine_id, status):
+def update_routine_status(routine_id, status, late_seconds=None):
     logging.info(f"Updating routine {routine_id} status to {status}")
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE routines SET completed = ? WHERE id = ?", (status, routine_id))
-    conn.commit()
-    conn.close()
-
-def compare_time(start_time_str):
-    now = datetime.now()
-    start_time = datetime.strptime(start_time_str, "%H:%M:%S").replace(
-        year=now.year, month=now.month, day=now.day
-    )
-    logging.info(f"Comparing now: {now.strftime('%H:%M:%S')} with start_time: {start_time.strftime('%H:%M:%S')}")
-    return now >= start_time
+    send_group_reports(repo.update_routine_status(routine_id, status, late_seconds))
+
+def send_group_reports(reports):
+    # 그룹의 마지막 루틴이 끝난 트랜잭션에서만 보고가 송신함에 들어온다 (그룹당 한 번)
+    for _, data in reports:
+        logging.info(f"Group {data['group']} finished, reporting {len(data['routines'])} routines")
+    send_outbox_entries(reports)
 
 def get_minutes_until_next_routine():
-    routines = get_today_routines()
-    now = datetime.now()
-    times = []
-    for _, start_time, *_ in routines:
-        st = datetime.strptime(start_time, "%H:%M:%S").time()
-        dt = datetime.combine(now.date(), st)
-        delta = (dt - now).total_seconds() / 60
-        if delta > 0:
-            times.append(delta)
-    remaining = min(times) if times else float('inf')
-    logging.info(f"Minutes until next routine: {remaining}")
+    # DB/strptime 없이 미리 파싱된 일정표에서 이분 탐색
+    remaining = agenda.minutes_until_next()
+    metrics.log_sampled("minutes_until_next", f"Minutes until next routine: {remaining}")
     return remaining
 
-def handle_routine(routine_id, minutes, image, disp):
-    logging.info(f"Starting routine {routine_id} for {minutes} minute(s)")
+def record_action(event):
+    # 버튼이 눌린 시각부터 그에 따른 처리(DB 반영/화면 갱신)가 끝날 때까지
+    metrics.observe("input.button_latency", time.monotonic() - event.time)
+    metrics.incr(f"input.{event.button}")
+
+def handle_routine(routine_id, minutes, frame, disp, remaining=None, late_seconds=None):
+    # remaining 을 주면 재부팅 전에 돌던 루틴을 남은 시간부터 이어 간다 (부저 없이)
     duration = minutes * 60
-    disp.ShowImage(image)
-    buzz()
-    start = time.time()
-    while time.time() - start < duration:
-        if button1.is_pressed:
-            logging.info(f"Routine {routine_id} marked as completed by button1")
-            update_routine_status(routine_id, 1)
-            disp.clear()
-            return
-        elif button2.is_pressed:
-            logging.info(f"Routine {routine_id} marked as failed by button2")
-            update_routine_status(routine_id, 0)
-            disp.clear()
-            return
-        time.sleep(0.1)
+    resumed = remaining is not None
+    remaining = remaining if resumed else duration
+    # 0분 루틴도 유효한 입력이다: 링 비율만 0 으로 나누지 않게 하고 바로 시간 초과로 끝낸다
+    duration = duration or 1
+    logging.info(f"{'Resuming' if resumed else 'Starting'} routine {routine_id} for {remaining / 60:.1f} minute(s)")
+    deadline = time.monotonic() + remaining
+    renderer.show(frame, 90, progress=remaining / duration, text=format_remaining(remaining))
+    events.clear()
+    if not resumed:
+        buzz()
+    # 1초마다 남은 시간 링/글자를 갱신하며 버튼을 기다린다
+    event = None
+    while event is None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        renderer.update(remaining / duration, format_remaining(remaining))
+        journal.tick()
+        event = events.wait_for(("button1", "button2"), timeout=remaining % COUNTDOWN_TICK or COUNTDOWN_TICK)
+    if event and event.button == "button1":
+        logging.info(f"Routine {routine_id} marked as completed by button1")
+        update_routine_status(routine_id, ROUTINE_COMPLETED, late_seconds)
+        renderer.clear()
+        record_action(event)
+        metrics.incr("routine.completed")
+        return
+    elif event and event.button == "button2":
+        logging.info(f"Routine {routine_id} marked as failed by button2")
+        update_routine_status(routine_id, ROUTINE_FAILED, late_seconds)
+        renderer.clear()
+        record_action(event)
+        metrics.incr("routine.failed")
+        return
     logging.info(f"Routine {routine_id} failed due to timeout")
-    update_routine_status(routine_id, 0)
-    disp.clear()
+    metrics.incr("routine.timeout")
+    update_routine_status(routine_id, ROUTINE_TIMEOUT, late_seconds)
+    renderer.clear()
 
 def get_timer_data():
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, timer_minutes, rest, repeat_count, icon FROM timers
-    """)
-    timers = cursor.fetchall()
-    conn.close()
-    logging.info(f"Fetched {len(timers)} timers")
+    timers = repo.get_timers()
+    metrics.log_sampled("fetch_timers", f"Fetched {len(timers)} timers")
     return timers
 
-def run_timer(timer_id, sec, disp, image):
-    logging.info(f"Running timer {timer_id} for {sec} seconds")
-    while button3.is_pressed:
-        time.sleep(0.1)
-    disp.ShowImage(image.rotate(180))
-    steps = sec // 60
-    for i in range(steps):
-        time.sleep(60)
-        minutes_left = get_minutes_until_next_routine()
-        if minutes_left <= 5:
-            logging.info("Timer stopped due to routine within 5 minutes")
-            break
-    disp.clear()
-    logging.info("Timer finished")
-
-def run_repeating_timer(timer_id, minutes, rest, count, disp, image):
+def start_timer(timer_id, minutes, rest, count, icon):
     logging.info(f"Running repeating timer {timer_id} for {count} sets of {minutes} minutes work and {rest} minutes rest")
-    run_motor_timer(minutes, rest, count)
-    for i in range(count):
-        logging.info(f"Round {i+1} - Work")
-        run_timer(timer_id, minutes * 60, disp, image)
-        logging.info(f"Round {i+1} - Rest for {rest} minutes")
-        time.sleep(rest * 60)
+    launch_timer(timer_id, icon, timer_phases(minutes, rest, count))
 
+def timer_state(task):
+    # 남은 시간을 잰 벽시계 시각도 함께 남긴다 (복구할 때 꺼져 있던 시간만큼 진행)
+    return dict(task.snapshot(), at=time.time())
+
+def launch_timer(timer_id, icon, phases, phase_index=0, remaining=None):
+    # 타이머는 별도 스레드에서 돌고, 루틴이 시작되면 멈췄다가 끝나면 이어서 간다
+    frame = icons.get(icon, 270)
+    task = None
+
+    def show(phase, remaining):
+        renderer.show(frame, 270, progress=remaining / phase.seconds, text=format_remaining(remaining))
+        journal.patch("timer", **timer_state(task))
+
+    def clear():
+        journal.update(timer=None, sync=True)
+        renderer.clear()
+
+    task = TimerTask(timer_id, phases, show, clear, dial, phase_index=phase_index, remaining=remaining)
+    journal.update(timer={"id": timer_id, "icon": icon, "phases": phases, **timer_state(task)}, sync=True)
+    timers.start(task)
+
+def wait_during_timer():
+    # 타이머가 도는 동안에도 다음 루틴 시각/동기화 알림에 바로 깨어난다. 버튼2 는 타이머 취소
+    timeout = min(scheduler.seconds_until_wakeup(), TIMER_IDLE_RECHECK)
+    event = events.wait_for(("button2", "scheduler"), timeout=timeout, kinds=("press", "changed"))
+    if event and event.button == "button2":
+        logging.info("Timer cancelled by button2")
+        timers.cancel()
+        journal.update(timer=None, sync=True)
+        record_action(event)
+
+# True: 타이머를 시작했거나 새로 반영할 것이 있어 바로 루프를 다시 돈다
+# False: 할 일이 없으니 스케줄러가 다음 루틴까지 잠든다
 def timer_loop(disp):
     if get_minutes_until_next_routine() <= 5:
         logging.info("Timer blocked due to upcoming routine")
-        return
-    timers = get_timer_data()
-    if not timers:
-        return
+        return False
+    timer_rows = get_timer_data()
+    if not timer_rows:
+        return False
     index = 0
     selected = False
+    events.clear()
     while True:
-        if button1.is_pressed:
-            timer = timers[index]
+        # 다음 루틴 5분 전까지만 입력을 기다린다
+        timeout = (get_minutes_until_next_routine() - 5) * 60
+        if timeout <= 0:
+            renderer.clear()
+            logging.info("Timer selection closed due to upcoming routine")
+            return False
+        event = events.wait_for(
+            ("button1", "button2", "button3", "scheduler"),
+            timeout=min(timeout, TIMER_IDLE_RECHECK), kinds=("press", "changed")
+        )
+        if event is None:
+            if scheduler is not None and scheduler.wake_event.is_set():
+                return True  # 새로 동기화된 루틴을 먼저 반영
+            continue
+        if event.button == "scheduler":
+            return True
+        if event.button == "button1":
+            timer = timer_rows[index]
             timer_id, minutes, rest, repeat_count, icon = timer
-            image_path = os.path.join(ICON_PATH, icon)
-            if os.path.exists(image_path):
-                image = Image.open(image_path).resize((240, 240)).rotate(90)
-                disp.ShowImage(image)
+            frame = icons.get(icon, 90)
+            if frame is not None:
+                renderer.show(frame, 90)
+                record_action(event)
                 logging.info(f"Selected timer {timer_id}")
-            index = (index + 1) % len(timers)
+            index = (index + 1) % len(timer_rows)
             selected = True
-            time.sleep(0.3)
-        elif button2.is_pressed:
-            disp.clear()
+        elif event.button == "button2":
+            renderer.clear()
             logging.info("Timer selection cancelled")
-            return
-        elif selected and button3.is_pressed:
-            timer = timers[index - 1]
+            return True
+        elif selected and event.button == "button3":
+            timer = timer_rows[index - 1]
             timer_id, minutes, rest, repeat_count, icon = timer
-            image_path = os.path.join(ICON_PATH, icon)
-            if os.path.exists(image_path):
-                image = Image.open(image_path).resize((240, 240)).rotate(90)
-                run_repeating_timer(timer_id, minutes, rest, repeat_count, disp, image)
-                return
-
-def run_routine_loop():
-    disp = LCD_1inch28()
-    disp.Init()
-    disp.clear()
-    disp.bl_DutyCycle(50)
+            if icons.exists(icon):
+                start_timer(timer_id, minutes, rest, repeat_count, icon)
+                return True
+
+def resolve_due(due, now):
+    # 밀려 있던 루틴을 한 번에 판정: 건너뛸 것은 한 트랜잭션으로 기록하고 실행할 것만 돌려준다
+    decisions = policy.resolve(due, now)
+    skipped = [d for d in decisions if d.action == "skip"]
+    if skipped:
+        reports = repo.update_routine_statuses([(d.routine[0], ROUTINE_SKIPPED) for d in skipped])
+        metrics.incr("routine.skipped", len(skipped))
+        for d in skipped:
+            logging.info(f"Routine {d.routine[0]} skipped ({d.reason}, due {d.start.strftime('%H:%M:%S')})")
+        send_group_reports(reports)
+    return [d for d in decisions if d.action == "run"]
+
+def start_routine(decision, disp):
+    routine_id, start_time, icon, _, name, group = decision.routine
+    minutes = decision.minutes
+    logging.info(f"Routine {routine_id} is due to start ({decision.reason}, {minutes} min)")
+    frame = icons.get(icon, 90)
+    if frame is None:
+        # 스케줄러는 이미 끝난 것으로 표시했으므로 여기서 결과를 확정해야 그룹 보고까지 이어진다
+        logging.warning(f"Icon file not found: {icons.path(icon)} - routine {routine_id} marked as failed")
+        metrics.incr("routine.icon_missing")
+        update_routine_status(routine_id, ROUTINE_FAILED)
+        return
+    # 예정 시각부터 화면에 띄우기 직전까지의 지연 (통계의 평균 지각으로도 남는다)
+    late_seconds = (datetime.now() - decision.start).total_seconds()
+    metrics.observe("routine.start_lateness", late_seconds)
+    run_routine(decision.routine, minutes, frame, disp, late_seconds=late_seconds)
+
+def run_routine(routine, minutes, frame, disp, remaining=None, late_seconds=None):
+    routine_id = routine[0]
+    seconds = minutes * 60 if remaining is None else remaining
+    # 끝나는 시각은 벽시계로 남긴다 (monotonic 은 재부팅하면 처음부터 다시 센다)
+    journal.update(routine={
+        "routine": list(routine), "minutes": minutes, "deadline": time.time() + seconds,
+        "late_seconds": late_seconds,
+    }, sync=True)
+    dial.start(seconds)
+    handle_routine(routine_id, minutes, frame, disp, remaining, late_seconds)
+    dial.cancel()
+    journal.update(routine=None, sync=True)
+
+def advance_phases(phases, phase_index, remaining, elapsed):
+    # 꺼져 있던 동안(elapsed 초) 돌았을 만큼 단계를 넘긴다. 모두 끝났으면 None
+    while phase_index < len(phases):
+        if elapsed < remaining:
+            return phase_index, remaining - elapsed
+        elapsed -= remaining
+        phase_index += 1
+        if phase_index < len(phases):
+            remaining = phases[phase_index].seconds
+    return None
+
+def restore_session(disp):
+    # 재부팅 전에 돌던 타이머/루틴을 체크포인트에서 이어 간다
+    started = time.perf_counter()
+    state = journal.load()
+    motor = state.get("motor")
+    if motor:
+        get_motor_engine().restore(motor["position"], motor.get("phase"))
+    timer = state.get("timer")
+    routine = state.get("routine")
+    if timer:
+        phases = [Phase(*phase) for phase in timer["phases"]]
+        progress = (timer["phase_index"], timer["remaining"])
+        if timer["state"] == "running":
+            progress = advance_phases(phases, *progress, time.time() - timer["at"])
+        if progress is None:
+            logging.info(f"[CKPT] 타이머 {timer['id']} 는 꺼져 있는 동안 끝남")
+            journal.update(timer=None, sync=True)
+        else:
+            logging.info(f"[CKPT] 타이머 {timer['id']} 복구: {progress[0] + 1}/{len(phases)}단계, {progress[1]:.0f}s 남음")
+            launch_timer(timer["id"], timer["icon"], phases, *progress)
+    if routine:
+        resume_routine(routine, disp, started)
+    elif not timer and motor:
+        get_motor_engine().move_to(0)  # 진행 중인 것이 없으면 다이얼을 원점으로
+    metrics.observe("checkpoint.restore", time.perf_counter() - started)
+
+def resume_routine(state, disp, started):
+    routine = tuple(state["routine"])
+    routine_id = routine[0]
+    scheduler.discard(routine_id)
+    if routine_id not in {r[0] for r in agenda.routines}:
+        # 결과는 이미 기록됐고 체크포인트만 지우지 못한 경우
+        journal.update(routine=None, sync=True)
+        return
+    remaining = state["deadline"] - time.time()
+    frame = icons.get(routine[2], 90)
+    if remaining <= 0 or frame is None:
+        logging.info(f"[CKPT] 루틴 {routine_id} 는 꺼져 있는 동안 시간이 끝남")
+        metrics.incr("routine.timeout")
+        update_routine_status(routine_id, ROUTINE_TIMEOUT, state.get("late_seconds"))
+        journal.update(routine=None, sync=True)
+        return
+    logging.info(f"[CKPT] 루틴 {routine_id} 복구: {remaining:.0f}s 남음 ({(time.perf_counter() - started) * 1000:.0f}ms)")
+    if timers.preempt():
+        journal.patch("timer", sync=True, **timer_state(timers.task))
+    run_routine(routine, state["minutes"], frame, disp, remaining, state.get("late_seconds"))
+
+def run_routine_loop(db_changed=None):
+    global scheduler
+    disp = init_hardware()
+    metrics.start_exporter("runner")
     logging.info("Routine runner loop started")
+    get_sender()  # 재부팅 전에 보내지 못한 그룹 보고부터 전송
+    # 수신 프로세스가 db_changed를 set 하면 즉시 깨어나 오늘 루틴을 다시 읽는다
+    scheduler = RoutineScheduler(
+        get_today_routines, db_changed,
+        max_sleep=None if db_changed is not None else RESCAN_INTERVAL, agenda=agenda
+    )
+    scheduler.reload()
+    restore_session(disp)
     while True:
-        routines = get_today_routines()
-        for routine in routines:
-            routine_id, start_time, icon, minutes, name, group = routine
-            if compare_time(start_time):
-                logging.info(f"Routine {routine_id} is due to start")
-                img_path = os.path.join(ICON_PATH, icon)
-                if os.path.exists(img_path):
-                    img = Image.open(img_path).resize((240, 240)).rotate(90)
-                    Thread(target=run_motor_routine, args=(minutes,)).start()
-                    handle_routine(routine_id, minutes, img, disp)
-                    group_routines = get_completed_routines_by_group(group)
-                    if all(r[3] in (0, 1) for r in group_routines):  # 모든 루틴이 완료/실패 처리된 경우
-                        routine_list = [
-                            {"id": r[0], "start_time": r[1], "minutes": r[2],
-                             "completed": r[3], "name": r[4]}
-                            for r in group_routines
-                        ]
-                        data = {"group": group, "routines": routine_list}
-                        send_json_via_ble(data)
-                    break
-                else:
-                    logging.warning(f"Icon file not found: {img_path}")
-        else:
-            if get_minutes_until_next_routine() > 5:
-                logging.info("Entering timer loop")
-                timer_loop(disp)
-        time.sleep(1)
+        scheduler.refresh()
+        now = datetime.now()
+        due = scheduler.pop_all_due(now)
+        if due:
+            runs = resolve_due(due, now)
+            if runs:
+                # 하나만 실행하고 나머지는 끝난 뒤 그 시각 기준으로 다시 판정한다
+                scheduler.requeue([(d.start, d.routine) for d in runs[1:]])
+                # 진행 중인 타이머는 남은 시간을 저장한 채 멈추고 루틴을 제시간에 시작한다
+                if timers.preempt():
+                    journal.patch("timer", sync=True, **timer_state(timers.task))
+                    logging.info("Timer paused for routine")
+                start_routine(runs[0], disp)
+            continue
+        if timers.resume():
+            journal.patch("timer", sync=True, **timer_state(timers.task))
+            logging.info("Timer resumed after routine")
+        if timers.active():
+            wait_during_timer()
+            continue
+        if get_minutes_until_next_routine() > MAINTENANCE_IDLE_MINUTES and archiver.due():
+            # 변경 알림이 오면 바로 멈추고 다음 유휴 시간에 이어 간다
+            archiver.run(should_stop=scheduler.wake_event.is_set, send_reports=send_group_reports)
+        if get_minutes_until_next_routine() > 5:
+            logging.info("Entering timer loop")
+            if timer_loop(disp):
+                time.sleep(1)
+                continue
+        scheduler.wait()
 
 if __name__ == "__main__":
     try:
         run_routine_loop()
     except KeyboardInterrupt:
         logging.info("Routine runner interrupted by user")
-        disp = LCD_1inch28()
-        disp.module_exit()
+        hardware.create_lcd().module_exit()
         os._exit(0)
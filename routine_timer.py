@@ -1,161 +1,120 @@
 #!/usr/bin/python
 # -*- coding: UTF-8 -*-
-import os
 import sys
 import time
 import logging
 import sqlite3
 from datetime import datetime
-from PIL import Image
-from gpiozero import Button, Buzzer
 from PIL import Image, ImageDraw, ImageFont
 
-# 라이브러리 경로 추가
-sys.path.append("/home/pi/LCD_final")
-from LCD_1inch28 import LCD_1inch28
+import hardware
+from routine_db import ROUTINE_FAILED, ROUTINE_TIMEOUT, get_repository
+from icon_cache import get_icon_cache
+from lcd_frame import LCD_WIDTH, LCD_HEIGHT, show_frame
+from input_events import InputEvents
 
 # DB 경로
 DB_PATH = '/home/pi/routine_db.db'
 ICON_PATH = '/home/pi/APP_icon/'
+# 아이콘이 없을 때 보여줄 검은 화면 (RGB565)
+BLACK_FRAME = bytes(LCD_WIDTH * LCD_HEIGHT * 2)
+repo = get_repository(DB_PATH)
+icons = get_icon_cache(ICON_PATH)
 
 # GPIO 설정
-button1 = Button(5, pull_up=False, bounce_time=0.05)
-button2 = Button(6, pull_up=False, bounce_time=0.05)
-button3 = Button(26, pull_up=False, bounce_time=0.05)
-buzzer = Buzzer(13)
+button1 = hardware.button(5)
+button2 = hardware.button(6)
+button3 = hardware.button(26)
+buzzer = hardware.buzzer(13)
 
-logging.basicConfig(level=logging.INFO)
+# 버튼 입력은 콜백 → 이벤트 큐로 받는다
+events = InputEvents()
+events.attach("button1", button1)
+events.attach("button2", button2)
+events.attach("button3", button3)
 
-# ------------------ DB 연결 ------------------ #
-def connect_db():
-    try:
-        return sqlite3.connect(DB_PATH)
-    except sqlite3.Error as err:
-        logging.error(f"DB 연결 실패: {err}")
-        return None
+logging.basicConfig(level=logging.INFO)
 
 # ------------------ 루틴 처리 ------------------ #
 def get_today_routines():
     today = datetime.now().strftime("%Y-%m-%d")
-    conn = connect_db()
-    if not conn:
-        return []
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
+        return repo.query("""
             SELECT id, start_time, icon, duration_hours, duration_minutes
             FROM routines
             WHERE completed = 0 AND date = ?
         """, (today,))
-        return cursor.fetchall()
     except sqlite3.Error as e:
         logging.error(f"루틴 쿼리 오류: {e}")
         return []
-    finally:
-        cursor.close()
-        conn.close()
 
 def update_routine_status(routine_id, status):
-    conn = connect_db()
-    if not conn:
-        return
     try:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE routines SET completed = ? WHERE id = ?", (status, routine_id))
-        conn.commit()
+        repo.update_routine_status(routine_id, status)
     except sqlite3.Error as e:
         logging.error(f"루틴 상태 업데이트 오류: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
 def compare_time(start_time):
     now = datetime.now().strftime("%H:%M")
     return now == str(start_time)[:5]
 
-def handle_routine(routine_id, h, m, image, disp):
+def handle_routine(routine_id, h, m, frame, disp):
     duration = h * 3600 + m * 60
-    disp.ShowImage(image)
-    time.sleep(1)  # 초기 입력 방지
-
-    start = time.time()
-    while time.time() - start < duration:
-        if button1.is_pressed:
-            update_routine_status(routine_id, 1)
-            logging.info("버튼1: 루틴 성공")
-            disp.clear()
-            return True
-        elif button2.is_pressed:
-            update_routine_status(routine_id, 0)
-            logging.info("버튼2: 루틴 실패")
-            disp.clear()
-            return True
-        time.sleep(0.1)
+    show_frame(disp, frame)
+    events.clear()  # 초기 입력 방지
+
+    event = events.wait_for(("button1", "button2"), timeout=duration)
+    if event and event.button == "button1":
+        update_routine_status(routine_id, 1)
+        logging.info("버튼1: 루틴 성공")
+        disp.clear()
+        return True
+    elif event and event.button == "button2":
+        update_routine_status(routine_id, ROUTINE_FAILED)
+        logging.info("버튼2: 루틴 실패")
+        disp.clear()
+        return True
 
     # 시간 초과
-    update_routine_status(routine_id, 0)
+    update_routine_status(routine_id, ROUTINE_TIMEOUT)
     logging.info("루틴 시간 초과 - 실패")
     disp.clear()
     return True
 
 # ------------------ 타이머 처리 ------------------ #
 def get_timer_data():
-    conn = connect_db()
-    if not conn:
-        return []
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
+        return repo.query("""
             SELECT id, duration_hours, duration_minutes, icon, timer_name
             FROM timers
             WHERE completed = 0
         """)
-        return cursor.fetchall()
     except sqlite3.Error as e:
         logging.error(f"타이머 쿼리 실패: {e}")
         return []
-    finally:
-        cursor.close()
-        conn.close()
 
 def update_timer_status(timer_id, status):
-    conn = connect_db()
-    if not conn:
-        return
     try:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE timers SET completed = ? WHERE id = ?", (status, timer_id))
-        conn.commit()
+        repo.update_timer_status(timer_id, status)
     except sqlite3.Error as e:
         logging.error(f"타이머 상태 업데이트 실패: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
-def run_timer(timer_id, sec, disp, background_img=None):
+def run_timer(timer_id, sec, disp, icon=None):
     # 버튼3이 눌려 있는 상태라면 손 떼기를 기다림 (중복 종료 방지)
-    while button3.is_pressed:
-        time.sleep(0.1)
+    button3.wait_for_release()
+    events.clear()
 
     # 아이콘 또는 기본 배경 표시
-    if background_img:
-        image = background_img.copy()
+    frame = icons.get(icon, 270) if icon else None
+    if frame is not None:
+        show_frame(disp, frame)
     else:
-        image = Image.new("RGB", (240, 240), "BLACK")
-
-    disp.ShowImage(image.rotate(180))
+        show_frame(disp, BLACK_FRAME)
     logging.info("타이머 실행 시작됨")
 
-    start = time.time()
-    end = start + sec
-    interrupted = False
-
-    while time.time() < end:
-        if button3.is_pressed:
-            interrupted = True
-            logging.info("타이머 조기 종료")
-            break
-        time.sleep(0.1)
+    interrupted = events.wait_for(("button3",), timeout=sec) is not None
+    if interrupted:
+        logging.info("타이머 조기 종료")
 
     if interrupted:
         update_timer_status(timer_id, 1)  # 완료 처리
@@ -176,45 +135,43 @@ def timer_loop(disp):
 
     index = 0
     selected = False
+    events.clear()
 
     while True:
-        if button1.is_pressed:
+        event = events.wait_for(("button1", "button2", "button3"))
+        if event.button == "button1":
             timer = timers[index]
             timer_id, h, m, icon, name = timer
-            image_path = os.path.join(ICON_PATH, icon)
-            if os.path.exists(image_path):
-                image = Image.open(image_path).resize((240, 240)).rotate(90)
-                disp.ShowImage(image)
+            frame = icons.get(icon, 90)
+            if frame is not None:
+                show_frame(disp, frame)
                 logging.info(f"타이머 선택됨: {name}")
             else:
                 disp.clear()
-                logging.warning(f"아이콘 없음: {image_path}")
+                logging.warning(f"아이콘 없음: {icons.path(icon)}")
             index = (index + 1) % len(timers)
             selected = True
-            time.sleep(0.3)
 
-        elif button2.is_pressed:
+        elif event.button == "button2":
             disp.clear()
             logging.info("타이머 선택 취소")
             return
 
-        elif selected and button3.is_pressed:
+        elif selected and event.button == "button3":
             timer = timers[index - 1]
             timer_id, h, m, icon, name = timer
-            image_path = os.path.join(ICON_PATH, icon)
-            if os.path.exists(image_path):
-                image = Image.open(image_path).resize((240, 240)).rotate(90)
+            if icons.exists(icon):
                 duration_sec = h * 3600 + m * 60
-                run_timer(timer_id, duration_sec, disp, image)
+                run_timer(timer_id, duration_sec, disp, icon)
                 return
             else:
                 disp.clear()
-                logging.error(f"타이머 아이콘 파일 없음: {image_path}")
+                logging.error(f"타이머 아이콘 파일 없음: {icons.path(icon)}")
                 return
 
 # ------------------ 메인 루프 ------------------ #
 def main():
-    disp = LCD_1inch28()
+    disp = hardware.create_lcd()
     disp.Init()
     disp.clear()
     disp.bl_DutyCycle(50)
@@ -226,10 +183,9 @@ def main():
         for routine in routines:
             routine_id, start_time, icon, h, m = routine
             if compare_time(start_time):
-                img_path = os.path.join(ICON_PATH, icon)
-                if os.path.exists(img_path):
-                    img = Image.open(img_path).resize((240, 240)).rotate(90)
-                    if handle_routine(routine_id, h, m, img, disp):
+                frame = icons.get(icon, 90)
+                if frame is not None:
+                    if handle_routine(routine_id, h, m, frame, disp):
                         routine_matched = True
                         break
 
@@ -243,6 +199,6 @@ if __name__ == "__main__":
         main()
     except KeyboardInterrupt:
         logging.info("사용자 종료 요청")
-        disp = LCD_1inch28()
+        disp = hardware.create_lcd()
         disp.module_exit()
         sys.exit(0)
@@ -0,0 +1,55 @@
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import routine_runner
+from ble_receiver import WriteScheduler, serve_bluetooth, write_messages
+
+# BLE 로 받은 메시지를 DB 에 쓰는 블로킹 호출을 맡길 실행기 크기
+EXECUTOR_WORKERS = 2
+
+class Runtime:
+    # 한 프로세스 안의 혼합 구조: BLE 수신/쓰기만 이벤트 루프 태스크이고, 입력 대기와 버튼/화면
+    # 상태 머신(루틴 루프), 모터 워커, 타이머, BLE 송신은 블로킹 호출이라 각자 스레드로 돈다.
+    # 둘 사이는 DB 변경 알림(db_changed) 하나로만 잇는다
+    def __init__(self):
+        self.loop = None
+        self.executor = ThreadPoolExecutor(EXECUTOR_WORKERS, thread_name_prefix="routine-io")
+        # DB 파일을 거치지 않고 스케줄러를 바로 깨우는 이벤트
+        self.db_changed = threading.Event()
+
+    def run_blocking(self, func, *args):
+        return self.loop.run_in_executor(self.executor, func, *args)
+
+    def start_thread(self, name, func, *args):
+        # 끝나지 않는 블로킹 루프는 실행기 대신 데몬 스레드로 돌리고 완료를 future 로 받는다
+        future = self.loop.create_future()
+
+        def target():
+            try:
+                result = func(*args)
+            except BaseException as e:
+                self.loop.call_soon_threadsafe(future.set_exception, e)
+            else:
+                self.loop.call_soon_threadsafe(future.set_result, result)
+        threading.Thread(target=target, name=name, daemon=True).start()
+        return future
+
+    def notify_db_changed(self):
+        # 잠든 스케줄러와 타이머 선택 화면에서 기다리는 상태 머신을 바로 깨운다
+        self.db_changed.set()
+        routine_runner.events.emit("scheduler", "changed", time.monotonic())
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        writer = WriteScheduler()
+        logging.info("[RUNTIME] 시작")
+        await asyncio.gather(
+            serve_bluetooth(writer),
+            write_messages(writer, self.run_blocking, self.notify_db_changed),
+            self.start_thread("routine-loop", routine_runner.run_routine_loop, self.db_changed),
+        )
+
+def main():
+    asyncio.run(Runtime().run())
@@ -0,0 +1,97 @@
+import heapq
+import logging
+import threading
+import metrics
+from datetime import datetime, timedelta
+from agenda import Agenda
+
+class RoutineScheduler:
+    # 오늘 루틴을 한 번만 읽어 start_time 순 우선순위 큐로 유지하고,
+    # 다음 시작 시각까지 잠들었다가 DB 변경 알림(wake_event)이 오면 일찍 깬다
+    def __init__(self, load_routines, wake_event=None, max_sleep=None, agenda=None):
+        self.load_routines = load_routines
+        # 같은 목록으로 "다음 루틴까지 남은 시간" 질의용 일정표도 함께 갱신한다
+        self.agenda = agenda if agenda is not None else Agenda(load_routines)
+        self.wake_event = wake_event if wake_event is not None else threading.Event()
+        self.max_sleep = max_sleep
+        self.queue = []
+        self.finished = set()
+        self.loaded_date = None
+
+    def reload(self):
+        now = datetime.now()
+        if self.loaded_date != now.date():
+            self.finished.clear()
+        routines = self.load_routines()
+        self.agenda.load(routines, now)
+        queue = []
+        for start, routine in zip(self.agenda.starts, self.agenda.routines):
+            if routine[0] not in self.finished:
+                queue.append((start, routine[0], routine))
+        heapq.heapify(queue)
+        self.queue = queue
+        self.loaded_date = now.date()
+        logging.info(f"[SCHED] Loaded {len(queue)} routines for today")
+
+    def ensure_today(self):
+        if self.loaded_date != datetime.now().date():
+            self.reload()
+
+    def pop_all_due(self, now=None):
+        # 예정 시각이 지난 루틴을 모두 꺼낸다 [(start, routine)]
+        now = now or datetime.now()
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            start, routine_id, routine = heapq.heappop(self.queue)
+            self.finished.add(routine_id)
+            due.append((start, routine))
+        return due
+
+    def requeue(self, entries):
+        # 판정만 하고 아직 실행하지 않은 루틴을 되돌려 놓는다
+        for start, routine in entries:
+            self.finished.discard(routine[0])
+            heapq.heappush(self.queue, (start, routine[0], routine))
+
+    def discard(self, routine_id):
+        # 다른 경로(재부팅 복구)에서 이미 처리한 루틴을 큐에서 뺀다
+        self.finished.add(routine_id)
+        self.queue = [entry for entry in self.queue if entry[1] != routine_id]
+        heapq.heapify(self.queue)
+
+    def next_start(self):
+        return self.queue[0][0] if self.queue else None
+
+    def minutes_until_next(self, now=None):
+        return self.agenda.minutes_until_next(now)
+
+    def seconds_until_wakeup(self, now=None):
+        now = now or datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        deadline = min(self.next_start() or midnight, midnight)
+        timeout = max((deadline - now).total_seconds(), 0)
+        if self.max_sleep is not None:
+            timeout = min(timeout, self.max_sleep)
+        return timeout
+
+    def refresh(self):
+        # 잠들지 않고, 그 사이 변경 알림이 왔거나 날짜가 바뀌었으면 다시 읽는다
+        if self.wake_event.is_set():
+            self.wake_event.clear()
+            self.reload()
+        else:
+            self.ensure_today()
+
+    def notify(self):
+        self.wake_event.set()
+
+    def wait(self):
+        timeout = self.seconds_until_wakeup()
+        if timeout <= 0:
+            return
+        metrics.log_sampled("sched.sleep", f"[SCHED] Sleeping up to {timeout:.0f}s until next routine")
+        if self.wake_event.wait(timeout) or self.max_sleep is not None:
+            self.wake_event.clear()
+            self.reload()
+        else:
+            self.ensure_today()
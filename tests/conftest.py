@@ -0,0 +1,16 @@
+import os
+import sys
+
+# 하드웨어 없이 저장소 루트의 모듈을 그대로 가져온다
+os.environ.setdefault("ROUTINE_HW", "sim")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from routine_db import RoutineRepository
+
+@pytest.fixture
+def repo(tmp_path):
+    # 테스트마다 새 DB (마이그레이션까지 적용된 상태)
+    repo = RoutineRepository(str(tmp_path / "routine_db.db"))
+    yield repo
+    repo.close()
@@ -0,0 +1,85 @@
+import gzip
+import sqlite3
+from datetime import date, timedelta
+from archive import ArchiveJob
+from routine_db import ROUTINE_COMPLETED, ROUTINE_PENDING, ROUTINE_SKIPPED
+
+TODAY = date(2026, 10, 16)
+
+def routine(routine_id, day, group="아침"):
+    return {
+        "id": routine_id,
+        "date": day.isoformat(),
+        "start_time": "09:00:00",
+        "routine_minutes": 10,
+        "icon": "water",
+        "routine_name": f"루틴 {routine_id}",
+        "group_routine_name": group,
+    }
+
+def status(repo, routine_id):
+    rows = repo.query("SELECT completed FROM routines WHERE id = ?", (routine_id,))
+    return rows[0][0] if rows else None
+
+def test_past_pending_routines_are_closed_and_archived(repo, tmp_path):
+    old = TODAY - timedelta(days=200)
+    yesterday = TODAY - timedelta(days=1)
+    repo.insert_batch([
+        routine(1, old), routine(2, old),
+        routine(3, yesterday, "저녁"),
+        routine(4, TODAY),
+    ])
+    repo.update_routine_status(1, ROUTINE_COMPLETED)
+
+    reports = []
+    job = ArchiveJob(repo, directory=str(tmp_path / "archive"))
+    assert job.run(today=TODAY, send_reports=reports.extend)
+
+    # 결과 없이 지난 루틴은 건너뜀으로 확정되고 그 그룹은 한 번 보고된다
+    assert sorted(data["group"] for _, data in reports) == ["아침", "저녁"]
+    # 오래된 날은 보관 DB 로 옮겨지고, 어제는 남아 있고, 오늘 루틴은 그대로다
+    assert status(repo, 1) is None and status(repo, 2) is None
+    assert status(repo, 3) == ROUTINE_SKIPPED
+    assert status(repo, 4) == ROUTINE_PENDING
+    assert repo.get_stats("group", "아침")["skipped"] == 1
+
+def read_packed(path, tmp_path):
+    unpacked = tmp_path / "unpacked.db"
+    unpacked.write_bytes(gzip.decompress(path.read_bytes()))
+    conn = sqlite3.connect(str(unpacked))
+    try:
+        return conn.execute("SELECT id, completed FROM routines ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+def test_closed_months_are_compressed(repo, tmp_path):
+    directory = tmp_path / "archive"
+    closed = date(2026, 3, 31)
+    repo.insert_batch([routine(1, closed), routine(2, closed - timedelta(days=1)), routine(3, date(2026, 7, 1))])
+    repo.update_routine_statuses([(1, ROUTINE_COMPLETED), (2, ROUTINE_COMPLETED), (3, ROUTINE_COMPLETED)])
+    stats = repo.get_stats("group", "아침")
+
+    job = ArchiveJob(repo, directory=str(directory), keep_days=100)
+    assert job.run(today=TODAY)
+
+    # 3월은 다 지나 압축되고, before(7월 8일)가 걸친 7월은 이어 쓸 수 있게 그대로 둔다
+    assert sorted(p.name for p in directory.iterdir()) == ["routines-2026-03.db.gz", "routines-2026-07.db"]
+    assert read_packed(directory / "routines-2026-03.db.gz", tmp_path) == [(1, ROUTINE_COMPLETED), (2, ROUTINE_COMPLETED)]
+    assert repo.query("SELECT COUNT(*) FROM routines") == [(0,)]
+    assert repo.get_stats("group", "아침") == stats
+
+def test_packed_month_is_reopened_for_late_rows(repo, tmp_path):
+    directory = tmp_path / "archive"
+    day = date(2026, 3, 10)
+    repo.insert_batch([routine(1, day)])
+    repo.update_routine_status(1, ROUTINE_COMPLETED)
+    job = ArchiveJob(repo, directory=str(directory))
+    assert job.run(today=TODAY)
+
+    # 압축한 달의 행이 다시 보관 대상이 되면 (예: 보관 경계를 되돌린 뒤 다시 받은 기록) 풀어서 이어 쓰고 다시 압축한다
+    repo.execute("UPDATE archive_state SET archived_before = NULL, last_run = NULL")
+    repo.insert_batch([routine(2, day)])
+    assert job.run(today=TODAY + timedelta(days=1))
+    assert read_packed(directory / "routines-2026-03.db.gz", tmp_path) == [
+        (1, ROUTINE_COMPLETED), (2, ROUTINE_SKIPPED),
+    ]
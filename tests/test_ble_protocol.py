@@ -0,0 +1,44 @@
+from ble_protocol import FrameDecoder, encode_frame
+
+MESSAGES = [
+    {"type": "routine", "id": 1, "routine_name": "물 마시기 {아침}"},
+    {"type": "timer", "id": 2, "icon": "say \"hi\" \\ [x]"},
+    [{"type": "routine", "id": 3}],
+]
+
+def feed_bytes(decoder, data, size):
+    messages = []
+    for start in range(0, len(data), size):
+        messages += decoder.feed(data[start:start + size])
+    return messages
+
+def test_framed_messages_survive_any_split():
+    data = b"".join(encode_frame(m) for m in MESSAGES)
+    # 한 바이트씩 (한글/이스케이프 중간에서 끊겨도) 와도 같은 메시지가 나온다
+    for size in (1, 2, 7, len(data)):
+        assert feed_bytes(FrameDecoder(), data, size) == MESSAGES
+
+def test_unframed_values_are_decoded_when_closed():
+    decoder = FrameDecoder()
+    data = "".join(encode_frame(m).decode("utf-8").strip() for m in MESSAGES).encode("utf-8")
+    assert feed_bytes(decoder, data, 3) == MESSAGES
+    assert decoder.buffer == bytearray()
+
+    # 닫히지 않은 값은 다음 조각이 올 때까지 기다린다
+    assert decoder.feed(b'{"id": 4, "name": "a\\') == []
+    assert decoder.feed(b'"}"}') == [{"id": 4, "name": 'a"}'}]
+
+def test_several_values_in_one_frame():
+    assert FrameDecoder().feed(b'{"id": 1} {"id": 2}\n') == [{"id": 1}, {"id": 2}]
+
+def test_bad_frame_is_dropped_and_next_is_kept():
+    decoder = FrameDecoder()
+    assert decoder.feed(b'{"id": 1, oops}\n{"id": 2}\n') == [{"id": 2}]
+    # 줄바꿈 없는 쪽에서 짝이 안 맞는 닫는 괄호도 그 부분만 버린다
+    assert decoder.feed(b'}{"id": 3}') == [{"id": 3}]
+
+def test_oversized_frame_resets_buffer():
+    decoder = FrameDecoder(max_frame_bytes=32)
+    assert decoder.feed(b'{"name": "' + b"x" * 64) == []
+    assert decoder.buffer == bytearray()
+    assert decoder.feed(b'{"id": 5}\n') == [{"id": 5}]
@@ -0,0 +1,46 @@
+import pytest
+import ble_receiver
+
+def routine(routine_id, **fields):
+    return dict({
+        "type": "routine",
+        "id": routine_id,
+        "date": "2026-10-16",
+        "start_time": "09:00:00",
+        "routine_minutes": 10,
+        "icon": "water",
+        "routine_name": f"루틴 {routine_id}",
+        "group_routine_name": "아침",
+    }, **fields)
+
+@pytest.fixture
+def receiver_repo(repo, monkeypatch):
+    monkeypatch.setattr(ble_receiver, "repo", repo)
+    return repo
+
+def test_bad_message_only_fails_its_sender(receiver_repo):
+    replies = {"a": [], "b": []}
+    batch = [
+        (routine(1), replies["a"].append),
+        (routine(4), replies["b"].append),
+        (routine(2, icon={"name": "water"}), replies["a"].append),
+        (routine(5, routine_minutes=[1]), replies["b"].append),
+        (routine(3), replies["a"].append),
+        (routine(6), replies["b"].append),
+    ]
+    assert ble_receiver.write_batch(batch)
+
+    stored = [row[0] for row in receiver_repo.query("SELECT id FROM routines ORDER BY id")]
+    assert stored == [1, 3, 4, 6]
+    assert [(r["type"], r["id"]) for r in replies["a"]] == [("save_error", 2)]
+    assert [(r["type"], r["id"]) for r in replies["b"]] == [("save_error", 5)]
+
+def test_requests_see_earlier_messages(receiver_repo):
+    replies = []
+    batch = [
+        (routine(1), replies.append),
+        ({"type": "sync", "device": "phone", "since": 0}, replies.append),
+    ]
+    assert ble_receiver.write_batch(batch)
+    # 앞서 받은 루틴이 먼저 저장되어 동기화 응답에 포함된다
+    assert [r["id"] for r in replies[0]["routines"]] == [1]
@@ -0,0 +1,45 @@
+import time
+from ble_protocol import FrameDecoder
+from ble_sender import SEND_QUEUE_SIZE, BleSender
+
+class FakeSocket:
+    def __init__(self):
+        self.decoder = FrameDecoder()
+        self.reports = []
+
+    def sendall(self, frame):
+        for message in self.decoder.feed(frame):
+            self.reports += message if isinstance(message, list) else [message]
+
+    def close(self):
+        pass
+
+def test_reload_delivers_whole_outbox(repo):
+    # 재시작 전 송신함에 대기열보다 많은 보고가 남아 있던 경우
+    stored = SEND_QUEUE_SIZE + 36
+    for i in range(stored):
+        repo.outbox_add({"type": "routine_status", "id": i})
+
+    sender = BleSender(repo)
+    sender.sock = FakeSocket()
+    sender.start()
+    deadline = time.monotonic() + 5
+    while (len(sender.sock.reports) < stored or repo.outbox_pending()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert [report["id"] for report in sender.sock.reports] == list(range(stored))
+    assert repo.outbox_pending() == []
+
+def test_report_reloaded_before_enqueue_is_sent_once(repo):
+    # submit 이 송신함에 커밋한 직후, 대기열에 올리기 전에 송신 스레드가 같은 행을 읽어 보낸 경우
+    sender = BleSender(repo)
+    sender.sock = FakeSocket()
+    data = {"type": "routine_status", "id": 1}
+    outbox_id = repo.outbox_add(data)
+    sender.reload_outbox()
+    assert sender.send_batch()
+
+    sender.enqueue(outbox_id, data)
+    sender.drain(timeout=0)
+    assert sender.pending == {}
+    assert sender.sock.reports == [data]
@@ -0,0 +1,81 @@
+from routine_db import ROUTINE_COMPLETED, ROUTINE_FAILED, ROUTINE_PENDING, ROUTINE_SKIPPED, ROUTINE_TIMEOUT
+
+DAY = "2026-10-16"
+
+def routine(routine_id, group="아침", start_time="09:00:00"):
+    return {
+        "id": routine_id,
+        "date": DAY,
+        "start_time": start_time,
+        "routine_minutes": 10,
+        "icon": "water",
+        "routine_name": f"루틴 {routine_id}",
+        "group_routine_name": group,
+    }
+
+def progress(repo, group="아침"):
+    rows = repo.query("""
+        SELECT total, pending, completed, skipped, failed, timeout FROM group_progress
+        WHERE date = ? AND group_name = ?
+    """, (DAY, group))
+    return rows[0] if rows else None
+
+def recount(repo, group="아침"):
+    # 트리거로 유지한 카운터와 비교할 값: routines 를 직접 센다
+    return repo.query(f"""
+        SELECT COUNT(*), SUM(completed = {ROUTINE_PENDING}), SUM(completed = {ROUTINE_COMPLETED}),
+               SUM(completed = {ROUTINE_SKIPPED}), SUM(completed = {ROUTINE_FAILED}), SUM(completed = {ROUTINE_TIMEOUT})
+        FROM routines WHERE date = ? AND group_routine_name = ?
+    """, (DAY, group))[0]
+
+def test_group_counters_follow_inserts_updates_and_deletes(repo):
+    repo.insert_batch([routine(i, start_time=f"09:{i:02d}:00") for i in range(1, 5)] + [routine(5, "저녁")])
+    assert progress(repo) == (4, 4, 0, 0, 0, 0)
+
+    repo.update_routine_statuses([(1, ROUTINE_COMPLETED), (2, ROUTINE_TIMEOUT), (5, ROUTINE_SKIPPED)])
+    assert progress(repo) == recount(repo) == (4, 2, 1, 0, 0, 1)
+
+    # 휴대폰이 루틴을 다른 그룹으로 옮기거나 지우면 양쪽 그룹 카운터가 같이 바뀐다
+    repo.insert_batch([dict(routine(3), group_routine_name="저녁")])
+    repo.apply_sync("phone", deleted={"routines": [4]})
+    assert progress(repo) == recount(repo) == (2, 0, 1, 0, 0, 1)
+    assert progress(repo, "저녁") == recount(repo, "저녁") == (2, 1, 0, 1, 0, 0)
+
+    # 그룹의 마지막 루틴이 지워지면 그룹 행도 없어진다
+    repo.apply_sync("phone", deleted={"routines": [3, 5]})
+    assert progress(repo, "저녁") is None
+
+def test_group_is_reported_once_when_last_routine_ends(repo):
+    repo.insert_batch([routine(1), routine(2, start_time="09:10:00")])
+    assert repo.update_routine_status(1, ROUTINE_COMPLETED) == []
+
+    (outbox_id, data), = repo.update_routine_status(2, ROUTINE_FAILED)
+    assert data["group"] == "아침"
+    assert repo.outbox_existing([outbox_id]) == {outbox_id}
+
+    # 이미 보고한 그룹은 결과가 다시 바뀌어도 또 보고하지 않는다
+    assert repo.update_routine_status(2, ROUTINE_COMPLETED) == []
+
+    # 새 루틴이 추가돼 다시 열린 그룹은 그 루틴이 끝날 때 한 번 더 보고한다
+    repo.insert_batch([routine(3, start_time="09:20:00")])
+    assert repo.update_routine_status(1, ROUTINE_SKIPPED) == []
+    (_, data), = repo.update_routine_status(3, ROUTINE_COMPLETED)
+    assert [r["id"] for r in data["routines"]] == [1, 2, 3]
+
+def test_report_keeps_completed_as_done_flag(repo):
+    repo.insert_batch([routine(1), routine(2, start_time="09:10:00"), routine(3, start_time="09:20:00")])
+    reports = repo.update_routine_statuses([
+        (1, ROUTINE_COMPLETED), (2, ROUTINE_SKIPPED), (3, ROUTINE_FAILED),
+    ])
+    (_, data), = reports
+    assert [(r["completed"], r["status"]) for r in data["routines"]] == [
+        (1, "completed"), (0, "skipped"), (0, "failed"),
+    ]
+
+def test_sync_ack_keeps_completed_as_done_flag(repo):
+    repo.insert_batch([routine(1), routine(2)])
+    repo.update_routine_statuses([(1, ROUTINE_COMPLETED), (2, ROUTINE_FAILED)])
+    ack = repo.apply_sync("phone", since=0)
+    assert {r["id"]: (r["completed"], r["status"]) for r in ack["routines"]} == {
+        1: (1, "completed"), 2: (0, "failed"),
+    }
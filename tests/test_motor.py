@@ -0,0 +1,61 @@
+import time
+from motor_control import PigpioStepper, step_masks
+
+class FakePigpio:
+    OUTPUT = 1
+
+    @staticmethod
+    def pulse(on_mask, off_mask, delay_us):
+        return (on_mask, off_mask, delay_us)
+
+class FakePi:
+    # 웨이브는 시작 뒤 duration 초 동안 busy, wave_tx_stop 으로 바로 멈춘다
+    def __init__(self, duration):
+        self.duration = duration
+        self.until = 0
+        self.stopped = False
+        self.bank = None
+
+    def set_mode(self, pin, mode):
+        pass
+
+    def wave_add_generic(self, pulses):
+        pass
+
+    def wave_create(self):
+        return 0
+
+    def wave_chain(self, chain):
+        self.until = time.monotonic() + self.duration
+
+    def wave_tx_busy(self):
+        return time.monotonic() < self.until
+
+    def wave_tx_stop(self):
+        self.stopped = True
+        self.until = 0
+
+    def clear_bank_1(self, mask):
+        pass
+
+    def set_bank_1(self, mask):
+        self.bank = mask
+
+def test_drive_runs_the_whole_wave():
+    pi = FakePi(0.02)
+    phase, done = PigpioStepper(FakePigpio, pi).drive(0, 20, 0.001, lambda: False)
+    assert (phase, done) == ((0 - 20) % 8, 20)
+    assert not pi.stopped
+
+def test_drive_stops_the_wave_when_cancelled():
+    pi = FakePi(10)
+    deadline = time.monotonic() + 0.05
+    started = time.monotonic()
+    phase, done = PigpioStepper(FakePigpio, pi).drive(0, 256, 0.001, lambda: time.monotonic() >= deadline)
+
+    # 웨이브 전체(10초)를 기다리지 않고 멈추고, 지난 시간만큼 간 스텝과 그 위상을 돌려준다
+    assert pi.stopped
+    assert time.monotonic() - started < 1
+    assert 0 < done < 256
+    assert phase == (0 - done) % 8
+    assert pi.bank == step_masks[phase][0]
@@ -0,0 +1,59 @@
+from routine_db import ROUTINE_COMPLETED, ROUTINE_FAILED, backfill_streaks
+
+def routine(routine_id, day, group="아침"):
+    return {
+        "id": routine_id,
+        "date": f"2026-10-{day:02d}",
+        "start_time": "09:00:00",
+        "routine_minutes": 10,
+        "icon": "water",
+        "routine_name": f"루틴 {routine_id}",
+        "group_routine_name": group,
+    }
+
+def finish(repo, routine_id, day, status, group="아침"):
+    repo.insert_batch([routine(routine_id, day, group)])
+    repo.update_routine_status(routine_id, status)
+
+def test_group_streak_continues_over_days_without_the_group(repo):
+    finish(repo, 1, 1, ROUTINE_COMPLETED)
+    finish(repo, 2, 2, ROUTINE_COMPLETED)
+    assert repo.get_streak("group", "아침") == {"streak": 2, "best_streak": 2, "last_date": "2026-10-02"}
+
+    finish(repo, 3, 3, ROUTINE_FAILED)
+    finish(repo, 4, 4, ROUTINE_COMPLETED)
+    # 5일에는 아침 그룹이 없으므로 4일과 6일이 이어진다
+    finish(repo, 6, 6, ROUTINE_COMPLETED)
+    assert repo.get_streak("group", "아침") == {"streak": 2, "best_streak": 2, "last_date": "2026-10-06"}
+
+def test_day_streak_waits_for_every_group(repo):
+    finish(repo, 1, 1, ROUTINE_COMPLETED)
+    finish(repo, 2, 1, ROUTINE_COMPLETED, "저녁")
+    repo.insert_batch([routine(3, 2), routine(4, 2, "저녁")])
+    repo.update_routine_status(3, ROUTINE_COMPLETED)
+
+    # 2일은 저녁 그룹이 남아 있어 하루 연속 기록에 아직 반영되지 않는다
+    assert repo.get_streak("day") == {"streak": 1, "best_streak": 1, "last_date": "2026-10-01"}
+    repo.update_routine_status(4, ROUTINE_COMPLETED)
+    assert repo.get_streak("day") == {"streak": 2, "best_streak": 2, "last_date": "2026-10-02"}
+
+def test_late_finished_past_day_does_not_change_current_streak(repo):
+    repo.insert_batch([routine(1, 1)])
+    finish(repo, 2, 2, ROUTINE_COMPLETED)
+    finish(repo, 3, 3, ROUTINE_COMPLETED)
+    repo.update_routine_status(1, ROUTINE_FAILED)
+    assert repo.get_streak("group", "아침")["streak"] == 2
+
+def test_incremental_streaks_match_backfill(repo):
+    results = [ROUTINE_COMPLETED, ROUTINE_COMPLETED, ROUTINE_FAILED, ROUTINE_COMPLETED, ROUTINE_COMPLETED, ROUTINE_COMPLETED]
+    for day, status in enumerate(results, start=1):
+        finish(repo, day, day, status)
+        finish(repo, 100 + day, day, ROUTINE_COMPLETED, "저녁")
+    incremental = repo.get_streak("group", "아침"), repo.get_streak("group", "저녁"), repo.get_streak("day")
+
+    # 처음부터 다시 센 값(마이그레이션 backfill)과 하루씩 이은 값이 같다
+    with repo.transaction() as conn:
+        conn.execute("UPDATE stats_streaks SET current = 0, last_date = NULL")
+        backfill_streaks(conn)
+    assert (repo.get_streak("group", "아침"), repo.get_streak("group", "저녁"), repo.get_streak("day")) == incremental
+    assert incremental[0]["streak"] == 3 and incremental[1]["streak"] == 6
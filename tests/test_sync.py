@@ -0,0 +1,48 @@
+def make_routine(routine_id, name="물 마시기"):
+    return {
+        "id": routine_id,
+        "date": "2026-10-16",
+        "start_time": "09:00",
+        "routine_minutes": 10,
+        "icon": "water",
+        "routine_name": name,
+        "group_routine_name": "아침",
+    }
+
+def test_own_upload_is_not_echoed(repo):
+    routines = [make_routine(i) for i in range(1, 2001)]
+    ack = repo.apply_sync("phone", routines=routines, full=True)
+    assert ack["routines"] == []
+    assert ack["deleted"] == {"routines": [], "timers": [], "templates": []}
+
+    # 같은 내용을 다시 보내도 (버전은 올라가지만) 되돌려 받지 않는다
+    again = repo.apply_sync("phone", routines=routines[:10])
+    assert again["routines"] == []
+
+def test_other_device_changes_are_returned(repo):
+    repo.apply_sync("phone", routines=[make_routine(1), make_routine(2)], full=True)
+    repo.apply_sync("tablet", routines=[make_routine(2, "스트레칭")], deleted={"routines": [1]})
+
+    ack = repo.apply_sync("phone", routines=[make_routine(3)])
+    assert [r["id"] for r in ack["routines"]] == [2]
+    assert ack["routines"][0]["routine_name"] == "스트레칭"
+    assert ack["deleted"]["routines"] == [1]
+
+def test_upload_wins_over_concurrent_change(repo):
+    repo.apply_sync("phone", routines=[make_routine(1)], full=True)
+    repo.apply_sync("tablet", routines=[make_routine(1, "스트레칭")])
+
+    # 휴대폰이 같은 행을 덮어쓰면 태블릿이 바꾼 옛 값을 돌려주지 않는다
+    ack = repo.apply_sync("phone", routines=[make_routine(1, "산책")])
+    assert ack["routines"] == []
+    assert repo.query("SELECT routine_name FROM routines WHERE id = 1") == [("산책",)]
+
+def test_full_sync_only_removes_own_rows(repo):
+    repo.apply_sync("phone", routines=[make_routine(1), make_routine(2)], full=True)
+    repo.apply_sync("tablet", routines=[make_routine(3)])
+    repo.insert_routines([make_routine(4)])
+
+    # 휴대폰의 전체 동기화는 휴대폰이 올렸다가 목록에서 뺀 2 만 지운다
+    ack = repo.apply_sync("phone", routines=[make_routine(1)], full=True)
+    assert repo.query("SELECT id FROM routines ORDER BY id") == [(1,), (3,), (4,)]
+    assert ack["deleted"]["routines"] == []
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+from recurrence import occurrence_id, occurs_on, parse_rrule
+from routine_db import ROUTINE_COMPLETED
+
+MONDAY = date(2026, 10, 12)
+
+def template(template_id=1, **fields):
+    return dict({
+        "id": template_id,
+        "start_time": "07:00:00",
+        "routine_minutes": 15,
+        "icon": "run",
+        "routine_name": "달리기",
+        "group_routine_name": "운동",
+        "rrule": "FREQ=WEEKLY;BYDAY=MO,WE,FR",
+        "dtstart": MONDAY.isoformat(),
+        "exdates": [(MONDAY + timedelta(days=2)).isoformat()],
+    }, **fields)
+
+def test_rrule_days():
+    rule = parse_rrule("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;COUNT=3")
+    days = [MONDAY + timedelta(days=n) for n in range(28) if occurs_on(rule, MONDAY, MONDAY + timedelta(days=n))]
+    # 격주 월/목, 세 번까지
+    assert days == [MONDAY, MONDAY + timedelta(days=3), MONDAY + timedelta(days=14)]
+
+def test_expands_only_on_occurring_days(repo):
+    repo.insert_templates([template()])
+    week = [(MONDAY + timedelta(days=n)).isoformat() for n in range(7)]
+    expanded = {day: [r.id for r in repo.get_today_routines(day)] for day in week}
+    # 수요일은 예외 날짜
+    assert {day for day, ids in expanded.items() if ids} == {week[0], week[4]}
+    assert expanded[week[0]] == [occurrence_id(1, MONDAY)]
+
+def test_template_edit_updates_pending_occurrence_only(repo):
+    repo.insert_templates([template()])
+    monday, friday = MONDAY.isoformat(), (MONDAY + timedelta(days=4)).isoformat()
+    repo.get_today_routines(monday)
+    repo.get_today_routines(friday)
+    repo.update_routine_status(occurrence_id(1, MONDAY), ROUTINE_COMPLETED)
+
+    repo.insert_templates([template(routine_minutes=30)])
+    assert [r.routine_minutes for r in repo.get_today_routines(friday)] == [30]
+    # 끝난 날은 기록으로 남는다
+    assert repo.query("SELECT routine_minutes FROM routines WHERE date = ?", (monday,)) == [(15,)]
+
+def test_occurrences_are_not_synced_back(repo):
+    ack = repo.apply_sync("phone", templates=[template()])
+    assert ack["templates"] == []
+    monday = MONDAY.isoformat()
+    repo.get_today_routines(monday)
+    repo.update_routine_status(occurrence_id(1, MONDAY), ROUTINE_COMPLETED)
+
+    # 펼치기/상태 변경은 동기화 버전을 올리지 않고 휴대폰에 행으로 돌아가지 않는다
+    again = repo.apply_sync("phone")
+    assert again["version"] == ack["version"]
+    assert again["routines"] == [] and again["deleted"]["routines"] == []
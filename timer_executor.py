@@ -0,0 +1,166 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+
+# 남은 시간 표시/다이얼 갱신 주기(초)
+TIMER_TICK_SECONDS = 1
+
+# kind: "work" 또는 "rest"
+Phase = namedtuple("Phase", "kind seconds")
+
+def timer_phases(minutes, rest, repeat_count):
+    # 작업 minutes 분 / 휴식 rest 분 을 repeat_count 번 (마지막 휴식은 생략)
+    phases = []
+    for i in range(repeat_count):
+        phases.append(Phase("work", minutes * 60))
+        if rest and i < repeat_count - 1:
+            phases.append(Phase("rest", rest * 60))
+    return phases
+
+class TimerTask:
+    # 반복 타이머 하나. 자기 스레드에서 단계별 마감 시각까지 화면/다이얼을 갱신하고,
+    # pause() 되면 남은 시간을 저장한 채 화면과 다이얼을 내려놓았다가 resume() 에서 이어 간다
+    # phase_index/remaining 을 주면 그 단계의 남은 시간부터 이어 간다 (재부팅 복구)
+    def __init__(self, timer_id, phases, show, clear, dial, tick=TIMER_TICK_SECONDS, phase_index=0, remaining=None):
+        self.timer_id = timer_id
+        self.phases = phases
+        self.show = show
+        self.clear = clear
+        self.dial = dial
+        self.tick = tick
+        self.cond = threading.Condition()
+        # running → (paused ↔ running) → finished / cancelled
+        self.state = "running"
+        self.parked = False
+        self.phase_index = phase_index
+        if remaining is None:
+            remaining = phases[phase_index].seconds if phase_index < len(phases) else 0
+        self.remaining = remaining
+
+    def phase(self):
+        return self.phases[self.phase_index]
+
+    def snapshot(self):
+        # 체크포인트용 진행 상태
+        return {"phase_index": self.phase_index, "remaining": round(self.remaining, 1), "state": self.state}
+
+    def is_done(self):
+        return self.state in ("finished", "cancelled")
+
+    def pause(self):
+        # 화면/다이얼을 놓을 때까지 기다렸다 반환 → 바로 루틴이 화면을 써도 된다
+        with self.cond:
+            if self.state != "running":
+                return False
+            self.state = "paused"
+            self.cond.notify_all()
+            self.cond.wait_for(lambda: self.parked or self.is_done())
+            if not self.parked:
+                return False
+        logging.info(f"[TIMER] {self.timer_id} 일시정지 ({self.phase().kind}, {self.remaining:.0f}s 남음)")
+        return True
+
+    def resume(self):
+        with self.cond:
+            if self.state != "paused":
+                return False
+            self.state = "running"
+            self.cond.notify_all()
+        logging.info(f"[TIMER] {self.timer_id} 재개")
+        return True
+
+    def cancel(self):
+        with self.cond:
+            if self.is_done():
+                return
+            self.state = "cancelled"
+            self.cond.notify_all()
+
+    def enter_phase(self, phase):
+        if phase.kind == "work":
+            self.dial.start(self.remaining)
+        else:
+            self.dial.cancel()  # 휴식 중에는 다이얼을 원점에
+
+    def run_phase(self):
+        # 현재 단계를 끝까지 돌리면 True, 일시정지/취소로 중단되면 False
+        phase = self.phase()
+        self.enter_phase(phase)
+        deadline = time.monotonic() + self.remaining
+        while True:
+            remaining = deadline - time.monotonic()
+            self.remaining = max(remaining, 0)
+            if remaining <= 0:
+                return True
+            self.show(phase, remaining)
+            with self.cond:
+                if self.cond.wait_for(lambda: self.state != "running", remaining % self.tick or self.tick):
+                    self.remaining = max(deadline - time.monotonic(), 0)
+                    return False
+
+    def run(self):
+        logging.info(f"[TIMER] {self.timer_id} 시작: {len(self.phases)}단계")
+        # 멈춘 상태에서 취소되면 화면/다이얼은 이미 다른 쪽(루틴)이 쓰고 있다
+        released = False
+        while self.phase_index < len(self.phases):
+            if self.run_phase():
+                self.phase_index += 1
+                if self.phase_index < len(self.phases):
+                    self.remaining = self.phase().seconds
+                continue
+            with self.cond:
+                if self.state == "cancelled":
+                    break
+                # 일시정지: 다이얼은 원점으로 돌리지 않고 멈춘다 (루틴이 바로 자기 위치로 옮긴다)
+                self.dial.cancel(home=False)
+                self.parked = True
+                self.cond.notify_all()
+                self.cond.wait_for(lambda: self.state != "paused")
+                self.parked = False
+                if self.state == "cancelled":
+                    released = True
+                    break
+        # 화면/다이얼을 정리한 뒤에 끝났다고 알린다 (기다리던 루틴이 그 다음에 화면을 쓴다)
+        if not released:
+            self.dial.cancel()
+            self.clear()
+        with self.cond:
+            if self.state != "cancelled":
+                self.state = "finished"
+            self.cond.notify_all()
+        logging.info(f"[TIMER] {self.timer_id} {'취소' if self.state == 'cancelled' else '완료'}")
+
+class TimerExecutor:
+    # 타이머는 스케줄러 루프와 따로 돈다. 루틴이 시작되면 preempt() 로 멈추고
+    # 루틴이 끝나면 resume() 으로 이어 간다
+    def __init__(self):
+        self.task = None
+        self.thread = None
+
+    def start(self, task):
+        self.cancel()
+        self.task = task
+        self.thread = threading.Thread(target=task.run, name=f"timer-{task.timer_id}", daemon=True)
+        self.thread.start()
+        return task
+
+    def active(self):
+        return self.task is not None and not self.task.is_done()
+
+    def paused(self):
+        return self.task is not None and self.task.state == "paused"
+
+    def preempt(self):
+        return self.active() and self.task.pause()
+
+    def resume(self):
+        return self.paused() and self.task.resume()
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+            if self.thread is not threading.current_thread():
+                self.thread.join(timeout=2)
+        self.task = None
+        self.thread = None